@@ -1,26 +1,64 @@
-from flask import Flask, jsonify, send_from_directory
-from flask_socketio import SocketIO
+from flask import Flask, Response, g, jsonify, request
 from app.config import Config
-from app.models import db
 from app.routes import api
-from app.services.weather_service import WeatherService
-from app.websockets.weather_websocket import WeatherWebSocket
 from app.models.base import db
 from app.models.weather import Weather
 from app.models.alert import VineyardAlert
+from app.models.station import Station
+from app.models.forecast import Forecast
 import os
+import threading
+import time
 
-# Instâncias globais
-socketio = SocketIO(cors_allowed_origins="*")
+# Instâncias globais (criadas no primeiro uso, ver get_*)
+socketio = None
+station_registry = None
+station_index = None
+forecast_service = None
+history_store = None
+history_archive = None
+write_queue = None
+alert_manager = None
+current_conditions = None
 weather_service = None
 weather_websocket = None
-__all__ = ['db', 'Weather', 'VineyardAlert']
+alert_websocket = None
+dashboard_service = None
+_app = None
+_services_lock = threading.RLock()
+__all__ = ['db', 'Weather', 'VineyardAlert', 'Station', 'Forecast']
+
+def create_app(start_collector=None):
+    """
+    Criar a aplicação Flask
+
+    O arranque só regista rotas, extensões e o SocketIO. Os serviços são
+    criados no primeiro uso (get_weather_service, get_dashboard_service) e
+    o esquema da BD é criado pelo comando `flask init-db`, exceto com
+    AUTO_CREATE_SCHEMA ativo.
+
+    Args:
+        start_collector (bool): Iniciar a coleta periódica; por omissão
+            segue COLLECTOR_AUTOSTART, exceto nos comandos CLI (flask
+            init-db, collect, ...), que nunca a iniciam
+
+    Returns:
+        Flask: Aplicação configurada
+    """
+    global weather_websocket, alert_websocket, _app
+
+    from app import metrics
+    from app.assets import StaticAssets
+    from app.profiling import init_profiling
+    from app.tracing import tracer
+    from app.models.pool import build_engine_options, init_pool_metrics
+    from app.websockets.weather_websocket import WeatherWebSocket
+    from app.websockets.alert_websocket import AlertWebSocket
+    from sqlalchemy.orm import Session
 
-def create_app():
-    global weather_service, weather_websocket
-    
     app = Flask(__name__, static_folder='static')
     app.config.from_object(Config)
+    _app = app
 
     # API info (JSON apenas)
     @app.route('/')
@@ -29,11 +67,21 @@ def create_app():
             "message": "🍷 WineCast API - Sistema Meteorológico para Viticultura",
             "version": "1.0",
             "documentation": {
+                "dashboard": "GET /api/dashboard",
                 "current_weather": "GET /api/weather/current",
                 "cities": "GET /api/weather/cities",
                 "analyze_city": "GET /api/weather/analyze/<city_name>",
+                "interpolate": "POST /api/weather/interpolate",
+                "forecast": "GET /api/weather/forecast/<city_name>",
+                "series": "GET /api/weather/series",
+                "growing_degree_days": "GET /api/weather/gdd/<city_name>",
                 "alerts": "GET /api/alerts",
-                "system_status": "GET /api/weather/status"
+                "stations": "GET|POST /api/stations",
+                "nearest_stations": "GET|POST /api/stations/nearest",
+                "system_status": "GET /api/weather/status",
+                "metrics": "GET /metrics",
+                "traces": "GET /api/traces",
+                "trace_latency": "GET /api/traces/latency"
             },
             "status": "🟢 Online",
             "frontend_urls": [
@@ -42,11 +90,18 @@ def create_app():
             ]
         })
 
+    # Frontend com nomes por conteúdo e variantes gzip/brotli (ver app/assets.py)
+    assets = StaticAssets(app.config['FRONTEND_DIR'], app.config['ASSETS_BUILD_DIR'])
+    try:
+        assets.build()
+    except OSError as e:
+        print(f"Erro ao gerar os ficheiros do frontend: {e}")
+
     # Servir frontend principal
     @app.route('/frontend')
     def serve_frontend():
         try:
-            return send_from_directory(app.static_folder, 'index.html')
+            return assets.send_index()
         except Exception as e:
             return jsonify({"error": f"Frontend não encontrado: {str(e)}"}), 404
     
@@ -54,10 +109,32 @@ def create_app():
     @app.route('/frontend/<path:filename>')
     def serve_frontend_static(filename):
         try:
-            return send_from_directory(app.static_folder, filename)
+            return assets.send(filename)
         except Exception as e:
             return jsonify({"error": f"Arquivo não encontrado: {filename}"}), 404
 
+    # Métricas no formato Prometheus
+    @app.route('/metrics')
+    def prometheus_metrics():
+        return Response(metrics.registry.render(), mimetype=metrics.CONTENT_TYPE)
+
+    # Latência dos pedidos por endpoint
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request_latency(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            metrics.HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                endpoint=request.url_rule.rule if request.url_rule else 'unmatched',
+                method=request.method,
+                status=response.status_code
+            )
+        return response
+
     # Rota de teste para verificar caminhos
     @app.route('/debug/paths')
     def debug_paths():
@@ -72,31 +149,347 @@ def create_app():
         })
 
     # Inicializar SocketIO
-    socketio.init_app(app)
+    get_socketio().init_app(app)
     
     # Inicializar DB
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', build_engine_options(app.config))
     db.init_app(app)
+    metrics.init_db_metrics(Session)
+    init_profiling(app)
+    tracer.configure(
+        buffer_size=app.config['TRACE_BUFFER_SIZE'],
+        file_path=app.config['TRACE_FILE'],
+        enabled=app.config['TRACING_ENABLED']
+    )
 
-    # Routes
+    # Routes (importar módulos que registam rotas no blueprint)
+    from app.routes import weather, traces, stations  # noqa: F401
     app.register_blueprint(api, url_prefix='/api')
 
-    # Create all Tables
+    # Comandos CLI (flask init-db, flask collect)
+    register_commands(app, assets)
+
     with app.app_context():
-        db.create_all()
-        
-        # IMPORTANTE: Passar a instância da app para o WeatherService
-        weather_service = WeatherService(app=app)
-        weather_websocket = WeatherWebSocket(socketio, weather_service)
-        
-        # Iniciar coleta periódica (a cada 30 minutos)
-        weather_service.start_periodic_collection(interval_minutes=30)
+        if app.config['AUTO_CREATE_SCHEMA']:
+            db.create_all()
+        init_pool_metrics(db)
+
+    # Eventos WebSocket; o serviço meteorológico é resolvido no primeiro uso
+    weather_websocket = WeatherWebSocket(get_socketio())
+    # Eventos dos alertas (criação, agravamento, reconhecimento, expiração)
+    alert_websocket = AlertWebSocket(
+        get_socketio(),
+        app=app,
+        buffer_size=app.config['ALERT_EVENT_BUFFER'],
+        min_interval=app.config['ALERT_MIN_INTERVAL_SECONDS'],
+        expiry_check_seconds=app.config['ALERT_EXPIRY_CHECK_SECONDS']
+    )
+
+    if start_collector is None:
+        start_collector = app.config['COLLECTOR_AUTOSTART'] and not _loaded_by_cli_command()
+    if start_collector:
+        get_forecast_service()
+        get_history_store()
+        get_history_archive()
+        get_write_queue()
+        get_current_conditions()
+        get_weather_service().start_periodic_collection(
+            interval_minutes=app.config['COLLECTOR_INTERVAL_MINUTES']
+        )
 
     return app
 
+def _loaded_by_cli_command():
+    """True se a app está a ser carregada por um comando flask que não é `flask run`"""
+    import click
+    ctx = click.get_current_context(silent=True)
+    return ctx is not None and ctx.command.name != 'run'
+
+def register_commands(app, assets):
+    """Registar os comandos CLI da aplicação"""
+    import click
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Gerar os ficheiros do frontend com hash e as variantes comprimidas"""
+        manifest = assets.build()
+        for logical, hashed in sorted(manifest.items()):
+            print(f"{logical} -> {hashed}")
+        print(f"Frontend gerado em {assets.build_dir}")
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Criar as tabelas da base de dados e as estações por omissão"""
+        db.create_all()
+        # Índices acrescentados a tabelas que já existiam
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(db.engine, checkfirst=True)
+        added = Station.seed_defaults()
+        print(f"Tabelas criadas ({added} estações adicionadas)")
+
+    @app.cli.command('collect')
+    def collect_command():
+        """Executar um ciclo de coleta imediatamente"""
+        get_weather_service().collect_all_cities_data()
+
+    @app.cli.command('archive-sync')
+    def archive_sync_command():
+        """Acrescentar ao arquivo em disco as observações ainda não arquivadas"""
+        from app.services.history_archive import HistoryArchive
+        archive = HistoryArchive(app.config['ARCHIVE_DIR'])
+        added = archive.sync_from_db()
+        for station, rows in added.items():
+            print(f"{station}: {rows} observações arquivadas")
+        print(f"Arquivo atualizado ({sum(added.values())} observações)")
+
+    @app.cli.command('backtest')
+    @click.option('--stations', default='', help='Estações separadas por vírgulas (por omissão todas)')
+    @click.option('--start', default=None, help='Início (timestamp Unix ou data ISO; por omissão a observação mais antiga)')
+    @click.option('--end', default=None, help='Fim (timestamp Unix ou data ISO; por omissão agora)')
+    @click.option('--workers', default=None, type=int, help='Processos (por omissão um por core)')
+    @click.option('--shard-days', default=90, type=int, help='Dias por intervalo distribuído aos workers')
+    @click.option('--rules', default=None, help='Ficheiro de regras (por omissão VINEYARD_RULES_FILE)')
+    @click.option('--output', default=None, help='Ficheiro JSON Lines com os episódios de alerta')
+    def backtest_command(stations, start, end, workers, shard_days, rules, output):
+        """Reproduzir o histórico pelas regras do analisador e contar os alertas"""
+        from datetime import datetime, timezone
+        from app.services.backtest import run_backtest
+        from app.services.rule_engine import DEFAULT_RULES_FILE
+
+        def parse_time(value):
+            if value.lstrip('-').isdigit():
+                return int(value)
+            parsed = datetime.fromisoformat(value)
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            return int(parsed.timestamp())
+
+        names = [name for name in stations.split(',') if name] or [
+            row[0] for row in db.session.execute(db.select(Weather.name).distinct())
+        ]
+        if not names:
+            print("Sem observações para reproduzir")
+            return
+        registry = get_station_registry()
+        selected = [(name, (registry.get(name) or {}).get('region')) for name in sorted(names)]
+
+        if start is None:
+            start = db.session.execute(
+                db.select(db.func.min(Weather.dt)).where(Weather.name.in_(names))
+            ).scalar() or int(time.time())
+        else:
+            start = parse_time(start)
+        end = parse_time(end) if end else int(time.time())
+        output = output or os.path.join('backtests', f"backtest-{datetime.now():%Y%m%d-%H%M%S}.jsonl")
+
+        summary = run_backtest(
+            database_uri=app.config['SQLALCHEMY_DATABASE_URI'],
+            rules_path=rules or os.getenv('VINEYARD_RULES_FILE', DEFAULT_RULES_FILE),
+            stations=selected,
+            start=start,
+            end=end,
+            output_path=output,
+            workers=workers,
+            shard_days=shard_days
+        )
+
+        print(f"{summary['evaluations']} observações de {summary['stations']} estações "
+              f"em {summary['seconds']}s ({summary['shards']} intervalos, {summary['workers']} processos)")
+        print(f"{'alerta':<32}{'avaliações':>12}{'episódios':>12}")
+        for key, hits in summary['hits'].items():
+            print(f"{key:<32}{hits:>12}{summary['episodes'].get(key, 0):>12}")
+        print(f"Episódios escritos em {summary['output']}")
+
+def get_station_registry():
+    """Obter o registo de estações (criado no primeiro uso)"""
+    global station_registry
+    if station_registry is None:
+        with _services_lock:
+            if station_registry is None:
+                from app.services.station_registry import StationRegistry
+                station_registry = StationRegistry()
+    return station_registry
+
+def get_station_index():
+    """Obter o índice espacial das estações (reconstruído a cada recarga do registo)"""
+    global station_index
+    if station_index is None:
+        with _services_lock:
+            if station_index is None:
+                from app.services.spatial_index import StationIndex
+                index = StationIndex()
+                registry = get_station_registry()
+                registry.add_listener(index.build)
+                index.build(registry.stations)
+                station_index = index
+    return station_index
+
 def get_weather_service():
-    """Obter instância do serviço meteorológico"""
+    """Obter instância do serviço meteorológico (criada no primeiro uso)"""
+    global weather_service
+    if weather_service is None:
+        with _services_lock:
+            if weather_service is None:
+                from app.services.weather_service import WeatherService
+                service = WeatherService(app=_app, station_registry=get_station_registry())
+                if weather_websocket is not None:
+                    service.add_observer(weather_websocket)
+                weather_service = service
     return weather_service
 
+def get_forecast_service():
+    """Obter instância do serviço de previsões (criada no primeiro uso)"""
+    global forecast_service
+    if forecast_service is None:
+        service = get_weather_service()
+        with _services_lock:
+            if forecast_service is None:
+                from app.services.forecast_service import ForecastService
+                forecast_service = ForecastService(
+                    service,
+                    refresh_minutes=_app.config['FORECAST_REFRESH_MINUTES'],
+                    retry_minutes=_app.config['FORECAST_RETRY_MINUTES']
+                )
+                service.forecast_service = forecast_service
+    return forecast_service
+
+def get_history_store():
+    """Obter o histórico recente em memória (carregado da BD no primeiro uso)"""
+    global history_store
+    if history_store is None:
+        service = get_weather_service()
+        with _services_lock:
+            if history_store is None:
+                from app.services.history_store import HistoryStore
+                store = HistoryStore(capacity=_app.config['HISTORY_CAPACITY'])
+                with _app.app_context():
+                    try:
+                        store.warm_from_db(hours=_app.config['HISTORY_WARM_HOURS'])
+                    except Exception as e:
+                        print(f"Erro ao carregar histórico recente: {e}")
+                # A partir daqui cada observação gravada entra no histórico
+                service.history_store = store
+                history_store = store
+    return history_store
+
+def get_history_archive():
+    """Obter o arquivo colunar em disco (None se ARCHIVE_ENABLED=false)"""
+    global history_archive
+    if history_archive is None and _app.config['ARCHIVE_ENABLED']:
+        service = get_weather_service()
+        with _services_lock:
+            if history_archive is None:
+                from app.services.history_archive import HistoryArchive
+                archive = HistoryArchive(_app.config['ARCHIVE_DIR'])
+                # Recuperar as observações gravadas desde o último arranque
+                with _app.app_context():
+                    try:
+                        archive.sync_from_db(archive.stations())
+                    except Exception as e:
+                        print(f"Erro ao atualizar o arquivo: {e}")
+                service.history_archive = archive
+                history_archive = archive
+    return history_archive
+
+def get_write_queue():
+    """Obter a fila de escrita diferida (None se WRITE_BEHIND_ENABLED=false)"""
+    global write_queue
+    if _app is None:
+        return None
+    if write_queue is None and _app.config['WRITE_BEHIND_ENABLED']:
+        service = get_weather_service()
+        with _services_lock:
+            if write_queue is None:
+                from app.services.alert_manager import AlertManager
+                from app.services.write_behind import WriteBehindQueue
+                queue = WriteBehindQueue(
+                    _app,
+                    max_size=_app.config['WRITE_BEHIND_MAX_QUEUE'],
+                    batch_size=_app.config['WRITE_BEHIND_BATCH_SIZE'],
+                    flush_interval=_app.config['WRITE_BEHIND_FLUSH_INTERVAL'],
+                    durability=_app.config['WRITE_BEHIND_DURABILITY'],
+                    journal_dir=_app.config['WRITE_BEHIND_DIR'],
+                    enqueue_timeout=_app.config['WRITE_BEHIND_ENQUEUE_TIMEOUT'],
+                    shutdown_timeout=_app.config['WRITE_BEHIND_SHUTDOWN_TIMEOUT'],
+                    max_retries=_app.config['WRITE_BEHIND_MAX_RETRIES']
+                )
+                queue.register('weather', service.apply_weather_write)
+                AlertManager(write_queue=queue).register_writes(queue)
+                # Reaplica o journal deixado por uma paragem anterior
+                queue.start()
+                service.write_queue = queue
+                write_queue = queue
+    return write_queue
+
+def get_alert_manager():
+    """Obter o gestor de alertas das rotas (com a fila de escrita diferida, se ativa)"""
+    global alert_manager
+    if alert_manager is None:
+        queue = get_write_queue()
+        with _services_lock:
+            if alert_manager is None:
+                from app.services.alert_manager import AlertManager
+                alert_manager = AlertManager(write_queue=queue)
+    return alert_manager
+
+def get_current_conditions():
+    """Obter o snapshot das condições atuais (carregado no primeiro uso)"""
+    global current_conditions
+    if current_conditions is None:
+        service = get_weather_service()
+        with _services_lock:
+            if current_conditions is None:
+                from app.services.current_conditions import CurrentConditionsCache
+                cache = CurrentConditionsCache(
+                    service.query_latest_weather,
+                    app=_app,
+                    fresh_seconds=_app.config['CURRENT_FRESH_SECONDS'],
+                    max_stale_seconds=_app.config['CURRENT_MAX_STALE_SECONDS']
+                )
+                with _app.app_context():
+                    try:
+                        cache.get()
+                    except Exception as e:
+                        print(f"Erro ao carregar condições atuais: {e}")
+                # A partir daqui get_latest_weather usa o snapshot
+                service.current_conditions = cache
+                current_conditions = cache
+    return current_conditions
+
+def get_dashboard_service():
+    """Obter instância do serviço do dashboard (criada no primeiro uso)"""
+    global dashboard_service
+    if dashboard_service is None:
+        service = get_weather_service()
+        with _services_lock:
+            if dashboard_service is None:
+                from app.services.dashboard_service import DashboardService
+                dashboard_service = DashboardService(
+                    service,
+                    get_history_store(),
+                    ttl_seconds=_app.config['DASHBOARD_CACHE_TTL']
+                )
+    return dashboard_service
+
+def get_alert_websocket():
+    """Obter o canal WebSocket dos eventos de alertas (None antes de create_app)"""
+    return alert_websocket
+
+def get_initialized_services():
+    """Serviços já criados, sem criar nenhum (None os que ainda não foram usados)"""
+    return {
+        "weather_service": weather_service,
+        "history_store": history_store,
+        "history_archive": history_archive,
+        "write_queue": write_queue,
+        "current_conditions": current_conditions
+    }
+
 def get_socketio():
     """Obter instância do SocketIO"""
-    return socketio
\ No newline at end of file
+    global socketio
+    if socketio is None:
+        from flask_socketio import SocketIO
+        socketio = SocketIO(cors_allowed_origins="*")
+    return socketio
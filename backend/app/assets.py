@@ -0,0 +1,150 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from typing import Dict, Optional, Tuple
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # Opcional: sem o módulo só há variantes gzip
+    brotli = None
+
+INDEX_FILE = 'index.html'
+MANIFEST_FILE = 'manifest.json'
+
+# Tipos comprimidos (imagens e fontes já vêm comprimidas)
+COMPRESSIBLE = {'.html', '.js', '.css', '.json', '.svg', '.txt', '.map'}
+
+# Extensão de cada codificação, por ordem de preferência
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# Referências src="..." / href="..." no index.html
+_REFERENCE = re.compile(r'(\b(?:src|href)=")([^"#?]+)(")')
+
+
+class StaticAssets:
+    """
+    Ficheiros do frontend com nomes por conteúdo e pré-comprimidos
+
+    build() copia os ficheiros de source_dir para build_dir com o hash
+    do conteúdo no nome (js/app.js -> js/app.<hash>.js), escreve ao lado
+    as variantes .gz e .br (se o módulo brotli estiver instalado) e
+    reescreve no index.html as referências aos nomes originais.
+
+    Os ficheiros com hash são servidos com Cache-Control immutable (um
+    conteúdo novo tem outro nome); o index.html é sempre revalidado. A
+    variante enviada segue o Accept-Encoding do pedido.
+    """
+
+    def __init__(self, source_dir: str, build_dir: str):
+        self.source_dir = os.path.abspath(source_dir)
+        self.build_dir = os.path.abspath(build_dir)
+        # Nome original -> nome com hash
+        self.manifest: Dict[str, str] = {}
+        self._hashed = set()
+
+    def build(self) -> Dict[str, str]:
+        """
+        Gerar os ficheiros com hash, as variantes comprimidas e o index.html
+
+        Ficheiros já gerados (mesmo hash) não são reescritos.
+
+        Returns:
+            Dict[str, str]: Manifesto (nome original -> nome com hash)
+        """
+        manifest = {}
+        for root, _, files in os.walk(self.source_dir):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                logical = os.path.relpath(path, self.source_dir).replace(os.sep, '/')
+                if logical == INDEX_FILE:
+                    continue
+                with open(path, 'rb') as f:
+                    content = f.read()
+                stem, ext = os.path.splitext(logical)
+                hashed = f"{stem}.{hashlib.sha256(content).hexdigest()[:12]}{ext}"
+                self._write(hashed, content)
+                manifest[logical] = hashed
+
+        index_path = os.path.join(self.source_dir, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, encoding='utf-8') as f:
+                html = f.read()
+            html = _REFERENCE.sub(
+                lambda match: match.group(1) + manifest.get(match.group(2), match.group(2)) + match.group(3),
+                html
+            )
+            self._write(INDEX_FILE, html.encode('utf-8'), overwrite=True)
+
+        with open(os.path.join(self.build_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+        self.manifest = manifest
+        self._hashed = set(manifest.values())
+        return manifest
+
+    def _write(self, name: str, content: bytes, overwrite: bool = False):
+        """Escrever um ficheiro e as suas variantes comprimidas (se ficarem menores)"""
+        path = os.path.join(self.build_dir, name)
+        if os.path.exists(path) and not overwrite:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        variants = {'': content}
+        if os.path.splitext(name)[1] in COMPRESSIBLE:
+            # mtime=0: o mesmo conteúdo gera sempre os mesmos bytes
+            variants['.gz'] = gzip.compress(content, compresslevel=9, mtime=0)
+            if brotli is not None:
+                variants['.br'] = brotli.compress(content, quality=11)
+
+        for suffix, data in variants.items():
+            if suffix and len(data) >= len(content):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+                continue
+            # Escrita atómica: um pedido nunca vê um ficheiro a meio
+            with open(path + suffix + '.tmp', 'wb') as f:
+                f.write(data)
+            os.replace(path + suffix + '.tmp', path + suffix)
+
+    def _variant(self, name: str) -> Tuple[str, Optional[str]]:
+        """Variante a enviar para o pedido atual (nome do ficheiro, Content-Encoding)"""
+        accepted = request.accept_encodings
+        for encoding, suffix in ENCODINGS:
+            if accepted[encoding] and os.path.exists(os.path.join(self.build_dir, name + suffix)):
+                return name + suffix, encoding
+        return name, None
+
+    def _send(self, name: str, cache_control: str):
+        filename, encoding = self._variant(name)
+        response = send_from_directory(
+            self.build_dir, filename,
+            mimetype=mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        )
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = cache_control
+        return response
+
+    def send_index(self):
+        """index.html com as referências reescritas (revalidado em cada carregamento)"""
+        return self._send(INDEX_FILE, 'no-cache')
+
+    def send(self, filename: str):
+        """
+        Servir um ficheiro do frontend
+
+        Nomes com hash têm cache permanente; os nomes originais continuam
+        a funcionar (ficheiro de source_dir, sem cache longa).
+        """
+        if filename in self._hashed:
+            return self._send(filename, IMMUTABLE)
+        response = send_from_directory(self.source_dir, filename)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
@@ -1,10 +1,60 @@
+import csv
 import random
 from datetime import datetime, timedelta
 from faker import Faker
 import json
+import numpy as np
 
 
 class WeatherDataFactory:
+    # Weather type weights per country (same order as weather_types)
+    WEATHER_WEIGHTS = {
+        "PT": [0.05, 0.05, 0.1, 0.15, 0.01, 0.05, 0.3, 0.15, 0.08, 0.04, 0.02],  # Portugal: lots of sun & some rain
+        "US": [0.1, 0.1, 0.15, 0.1, 0.05, 0.1, 0.2, 0.1, 0.05, 0.03, 0.02],     # USA: varied weather
+        "DEFAULT": [0.05, 0.05, 0.1, 0.15, 0.01, 0.05, 0.3, 0.15, 0.08, 0.04, 0.02]  # Default weights
+    }
+
+    # Temperature offset range (°C) per weather main
+    TEMP_VARIATION = {
+        "Thunderstorm": (-5, 3),
+        "Drizzle": (-2, 2),
+        "Rain": (-3, 1),
+        "Snow": (-15, -5),
+        "Mist": (-1, 1),
+        "Clear": (0, 5),
+        "Clouds": (-2, 3)
+    }
+
+    # Wind speed range (m/s) per weather main
+    WIND_SPEED = {
+        "Thunderstorm": (10, 25),
+        "Drizzle": (2, 8),
+        "Rain": (5, 15),
+        "Snow": (3, 10),
+        "Mist": (0, 3),
+        "Clear": (1, 5),
+        "Clouds": (2, 8)
+    }
+
+    # Base temperature range (°C, as the API returns with units=metric) per season:
+    # winter, spring, summer, fall
+    SEASON_TEMPS = [(-23, 7), (7, 22), (22, 37), (7, 22)]
+
+    # Hourly precipitation range (mm) per weather main
+    RAIN_1H = {
+        "Thunderstorm": (2.0, 15.0),
+        "Drizzle": (0.1, 5.0),
+        "Rain": (0.1, 5.0)
+    }
+
+    # Column order of the weather_data table used by the columnar API
+    COLUMNS = (
+        "lon", "lat", "weather_id", "weather_main", "weather_description", "weather_icon", "base",
+        "temp", "feels_like", "temp_min", "temp_max", "pressure", "humidity", "sea_level", "grnd_level",
+        "visibility", "wind_speed", "wind_deg", "wind_gust", "rain_1h", "clouds_all", "dt",
+        "sys_type", "sys_id", "country", "sunrise", "sunset", "timezone", "city_id", "name", "cod"
+    )
+
     def __init__(self):
         self.fake = Faker()
         self.weather_types = [
@@ -71,29 +121,33 @@ class WeatherDataFactory:
 
         return base_data
 
+    def generate_stations(self, count, spread=0.5):
+        """Generate synthetic stations scattered around the known cities"""
+        stations = []
+        for index in range(count):
+            base = self.cities[index % len(self.cities)]
+            if index < len(self.cities):
+                stations.append(dict(base))
+                continue
+            stations.append({
+                "id": index + 1,
+                "name": f"{base['name']} #{index + 1}",
+                "country": base["country"],
+                "lat": round(base["lat"] + random.uniform(-spread, spread), 4),
+                "lon": round(base["lon"] + random.uniform(-spread, spread), 4),
+                "wine_quality": base["wine_quality"]
+            })
+        return stations
+
     def _weighted_weather_choice(self, city):
         """Generate weather with location-appropriate weights"""
-        weights = {
-            "PT": [0.05, 0.05, 0.1, 0.15, 0.01, 0.05, 0.3, 0.15, 0.08, 0.04, 0.02],  # Portugal: lots of sun & some rain
-            "US": [0.1, 0.1, 0.15, 0.1, 0.05, 0.1, 0.2, 0.1, 0.05, 0.03, 0.02],     # USA: varied weather
-            "DEFAULT": [0.05, 0.05, 0.1, 0.15, 0.01, 0.05, 0.3, 0.15, 0.08, 0.04, 0.02]  # Default weights
-        }
-
-        country_weights = weights.get(city["country"], weights["DEFAULT"])
+        country_weights = self.WEATHER_WEIGHTS.get(city["country"], self.WEATHER_WEIGHTS["DEFAULT"])
         return random.choices(self.weather_types, weights=country_weights, k=1)[0]
     
     def _generate_main_data(self, weather_type, city):
         """Generate realistic main weather data based on location and weather type"""
         base_temp = self._get_base_temp(city)
-        temp_variation = {
-            "Thunderstorm": (-5, 3),
-            "Drizzle": (-2, 2),
-            "Rain": (-3, 1),
-            "Snow": (-15, -5),
-            "Mist": (-1, 1),
-            "Clear": (0, 5),
-            "Clouds": (-2, 3)
-        }.get(weather_type["main"], (0, 0))
+        temp_variation = self.TEMP_VARIATION.get(weather_type["main"], (0, 0))
 
         temp = base_temp + random.uniform(*temp_variation)
         return {
@@ -109,42 +163,15 @@ class WeatherDataFactory:
 
     def _get_base_temp(self, city):
         """Get base temperature based on city location and season"""
-        northern = city["lat"] > 0
-        now = datetime.now()
-        month = now.month
-
-        if northern:
-            # Northern hemisphere seasons
-            if month in [12, 1, 2]:  # Winter
-                return random.uniform(250, 280)
-            elif month in [3, 4, 5]:  # Spring
-                return random.uniform(280, 295)
-            elif month in [6, 7, 8]:  # Summer
-                return random.uniform(295, 310)
-            else:  # Fall
-                return random.uniform(280, 295)
-        else:
+        season = (datetime.now().month % 12) // 3  # 0 winter .. 3 fall (northern hemisphere)
+        if city["lat"] <= 0:
             # Southern hemisphere (reversed seasons)
-            if month in [12, 1, 2]:  # Summer
-                return random.uniform(295, 310)
-            elif month in [3, 4, 5]:  # Fall
-                return random.uniform(280, 295)
-            elif month in [6, 7, 8]:  # Winter
-                return random.uniform(250, 280)
-            else:  # Spring
-                return random.uniform(280, 295)
+            season = (season + 2) % 4
+        return random.uniform(*self.SEASON_TEMPS[season])
 
     def _generate_wind_data(self, weather_type):
         """Generate wind data based on weather type"""
-        base_speed = {
-            "Thunderstorm": random.uniform(10, 25),
-            "Drizzle": random.uniform(2, 8),
-            "Rain": random.uniform(5, 15),
-            "Snow": random.uniform(3, 10),
-            "Mist": random.uniform(0, 3),
-            "Clear": random.uniform(1, 5),
-            "Clouds": random.uniform(2, 8)
-        }.get(weather_type["main"], random.uniform(0, 5))
+        base_speed = random.uniform(*self.WIND_SPEED.get(weather_type["main"], (0, 5)))
 
         return {
             "speed": round(base_speed, 2),
@@ -183,6 +210,134 @@ class WeatherDataFactory:
                 time_offset = timedelta(days=day, hours=hour)
                 forecast.append(self.generate_weather_data(
                     city=city,
-                    days_ago=-day  # Negative for future dates
+                    days_ago=-time_offset / timedelta(days=1)  # Negative for future dates
                 ))
-        return forecast
\ No newline at end of file
+        return forecast
+
+    def generate_columns(self, stations=None, days=1, samples_per_day=24, end_time=None,
+                         timestamps=None, seed=None):
+        """
+        Generate observations for many stations and timestamps at once.
+
+        Returns a dict of NumPy arrays keyed by weather_data column (see COLUMNS),
+        station-major: all timestamps of the first station, then the next one.
+        Timestamps default to days * samples_per_day evenly spaced samples
+        ending at end_time (now). Seeded generation is reproducible.
+        """
+        stations = stations or self.cities
+        rng = np.random.default_rng(seed)
+
+        if timestamps is None:
+            end = int((end_time or datetime.utcnow()).timestamp())
+            steps = np.arange(days * samples_per_day - 1, -1, -1)
+            timestamps = end - (steps * 86400 // samples_per_day)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+
+        n_times = len(timestamps)
+        n = len(stations) * n_times
+        station_idx = np.repeat(np.arange(len(stations)), n_times)
+        dt = np.tile(timestamps, len(stations))
+
+        lat = np.array([s["lat"] for s in stations], dtype=np.float64)[station_idx]
+        lon = np.array([s["lon"] for s in stations], dtype=np.float64)[station_idx]
+
+        # Weather type per observation, weighted by the station's country
+        weights = np.array([
+            self.WEATHER_WEIGHTS.get(s["country"], self.WEATHER_WEIGHTS["DEFAULT"]) for s in stations
+        ])
+        cumulative = np.cumsum(weights, axis=1)
+        cumulative /= cumulative[:, -1:]
+        type_idx = (rng.random(n)[:, None] >= cumulative[station_idx]).sum(axis=1)
+        type_idx = np.minimum(type_idx, len(self.weather_types) - 1)
+        mains = [t["main"] for t in self.weather_types]
+
+        def by_type(table, default):
+            ranges = np.array([table.get(main, default) for main in mains], dtype=np.float64)
+            return ranges[type_idx, 0], ranges[type_idx, 1]
+
+        # Seasonal base temperature from the observation month and hemisphere
+        months = (dt.astype("datetime64[s]").astype("datetime64[M]").astype(np.int64) % 12) + 1
+        season = (months % 12) // 3
+        season = np.where(lat > 0, season, (season + 2) % 4)
+        season_temps = np.array(self.SEASON_TEMPS, dtype=np.float64)
+        base_temp = rng.uniform(season_temps[season, 0], season_temps[season, 1])
+
+        temp = base_temp + rng.uniform(*by_type(self.TEMP_VARIATION, (0, 0)))
+        wind_speed = rng.uniform(*by_type(self.WIND_SPEED, (0, 5)))
+
+        rain_low, rain_high = by_type(self.RAIN_1H, (np.nan, np.nan))
+        rain_1h = np.round(rng.uniform(np.nan_to_num(rain_low), np.nan_to_num(rain_high)), 2)
+        rain_1h[np.isnan(rain_low)] = np.nan
+
+        daylight_seconds = ((8 + 6 * (np.abs(lat) / 90)) * 3600).astype(np.int64)
+
+        def station_column(key):
+            return np.array([s[key] for s in stations])[station_idx]
+
+        return {
+            "lon": lon,
+            "lat": lat,
+            "weather_id": np.array([t["id"] for t in self.weather_types])[type_idx],
+            "weather_main": np.array(mains)[type_idx],
+            "weather_description": np.array([t["description"] for t in self.weather_types])[type_idx],
+            "weather_icon": np.array([t["icon"] for t in self.weather_types])[type_idx],
+            "base": np.full(n, "stations"),
+            "temp": np.round(temp, 2),
+            "feels_like": np.round(temp + rng.uniform(-3, 0, n), 2),
+            "temp_min": np.round(temp + rng.uniform(-5, -1, n), 2),
+            "temp_max": np.round(temp + rng.uniform(1, 5, n), 2),
+            "pressure": rng.integers(950, 1051, n),
+            "humidity": rng.integers(30, 101, n),
+            "sea_level": rng.integers(950, 1051, n),
+            "grnd_level": rng.integers(900, 1001, n),
+            "visibility": rng.integers(1000, 10001, n),
+            "wind_speed": np.round(wind_speed, 2),
+            "wind_deg": rng.integers(0, 360, n),
+            "wind_gust": np.round(wind_speed * rng.uniform(1.2, 2.0, n), 2),
+            "rain_1h": rain_1h,
+            "clouds_all": rng.integers(0, 101, n),
+            "dt": dt,
+            "sys_type": rng.integers(1, 4, n),
+            "sys_id": rng.integers(1000, 10000, n),
+            "country": station_column("country"),
+            "sunrise": dt - daylight_seconds // 2,
+            "sunset": dt + daylight_seconds // 2,
+            "timezone": np.trunc(lon / 15).astype(np.int64) * 3600,
+            "city_id": station_column("id"),
+            "name": station_column("name"),
+            "cod": np.full(n, 200)
+        }
+
+    def iter_column_batches(self, stations=None, days=1, samples_per_day=24, batch_stations=100,
+                            end_time=None, seed=None):
+        """Yield generate_columns batches of batch_stations stations each"""
+        stations = stations or self.cities
+        end_time = end_time or datetime.utcnow()
+        for batch, start in enumerate(range(0, len(stations), batch_stations)):
+            yield self.generate_columns(
+                stations=stations[start:start + batch_stations],
+                days=days,
+                samples_per_day=samples_per_day,
+                end_time=end_time,
+                seed=None if seed is None else [seed, batch]
+            )
+
+    @classmethod
+    def columns_to_rows(cls, columns, names=None):
+        """Convert a column batch into insert-ready tuples in COLUMNS (or names) order"""
+        values = []
+        for name in names or cls.COLUMNS:
+            column = columns[name]
+            if column.dtype.kind == "f":
+                # NaN (e.g. no rain) becomes NULL
+                column = np.where(np.isnan(column), None, column)
+            values.append(column.tolist())
+        return list(zip(*values))
+
+    @classmethod
+    def write_csv(cls, columns, file, header=True):
+        """Write a column batch as CSV (COLUMNS order) to an open text file"""
+        writer = csv.writer(file)
+        if header:
+            writer.writerow(cls.COLUMNS)
+        writer.writerows(cls.columns_to_rows(columns))
\ No newline at end of file
@@ -0,0 +1,320 @@
+import bisect
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+class _Metric:
+    """Base das métricas: valores indexados pelos valores das labels"""
+
+    type_name = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        # Métricas sem labels são exportadas desde o arranque
+        if not self.labelnames:
+            self._values[()] = self._initial_value()
+
+    def _initial_value(self):
+        return 0
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: labels esperadas {self.labelnames}, recebidas {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple) -> Dict:
+        return dict(zip(self.labelnames, key))
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{_format_labels(self._labels(key))} {value}"]
+
+
+class Counter(_Metric):
+    """Contador monotónico"""
+
+    type_name = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """Valor instantâneo que pode subir e descer"""
+
+    type_name = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    """Histograma com buckets cumulativos ao estilo Prometheus"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _initial_value(self):
+        return {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = self._initial_value()
+            state['counts'][bisect.bisect_left(self.buckets, value)] += 1
+            state['sum'] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Medir a duração de um bloco"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_value(self, key, state):
+        labels = self._labels(key)
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), state['counts']):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': le})} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {state['sum']}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class SlidingWindowCounter:
+    """Soma de eventos numa janela deslizante (ex.: registos da última hora)"""
+
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        self._events = deque()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def add(self, amount: int = 1):
+        with self._lock:
+            self._events.append((time.monotonic(), amount))
+            self._total += amount
+            self._expire()
+
+    def total(self) -> int:
+        with self._lock:
+            self._expire()
+            return self._total
+
+    def _expire(self):
+        threshold = time.monotonic() - self.window_seconds
+        while self._events and self._events[0][0] < threshold:
+            self._total -= self._events.popleft()[1]
+
+
+class MetricsRegistry:
+    """Registo das métricas do processo"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrica já registada: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Exportar todas as métricas no formato de texto do Prometheus"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+# Coleta OpenWeatherMap
+OWM_FETCH_SECONDS = registry.histogram(
+    'winecast_owm_fetch_seconds', 'Latência dos pedidos à OpenWeatherMap por estação', ('station',))
+OWM_FETCH_ERRORS = registry.counter(
+    'winecast_owm_fetch_errors_total', 'Erros nos pedidos à OpenWeatherMap', ('station', 'reason'))
+OWM_REQUESTS = registry.counter(
+    'winecast_owm_requests_total', 'Pedidos HTTP feitos à OpenWeatherMap por endpoint', ('endpoint',))
+OWM_CIRCUIT_STATE = registry.gauge(
+    'winecast_owm_circuit_state', 'Estado do circuito da OpenWeatherMap por endpoint (0 fechado, 1 meio-aberto, 2 aberto)',
+    ('endpoint',))
+OWM_CIRCUIT_TRANSITIONS = registry.counter(
+    'winecast_owm_circuit_transitions_total', 'Mudanças de estado do circuito da OpenWeatherMap',
+    ('endpoint', 'state'))
+OWM_SHORT_CIRCUITED = registry.counter(
+    'winecast_owm_short_circuited_total', 'Pedidos recusados com o circuito aberto', ('endpoint',))
+OWM_RETRIES = registry.counter(
+    'winecast_owm_retries_total', 'Repetições de pedidos à OpenWeatherMap (feitas ou sem orçamento)', ('endpoint', 'result'))
+OWM_HEDGES = registry.counter(
+    'winecast_owm_hedges_total', 'Pedidos em paralelo (hedging) enviados e que responderam primeiro', ('endpoint', 'outcome'))
+COLLECTION_CYCLE_SECONDS = registry.histogram(
+    'winecast_collection_cycle_seconds', 'Duração de um ciclo de coleta completo',
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0))
+COLLECTION_ROWS_LAST_CYCLE = registry.gauge(
+    'winecast_collection_rows_last_cycle', 'Registos gravados no último ciclo de coleta')
+WEATHER_ROWS_WRITTEN = registry.counter(
+    'winecast_weather_rows_written_total', 'Registos meteorológicos gravados')
+
+CURRENT_LOOKUPS = registry.counter(
+    'winecast_current_lookups_total', 'Consultas das condições atuais (fresh, stale, miss, error)', ('result',))
+CURRENT_REFRESHES = registry.counter(
+    'winecast_current_refreshes_total', 'Recargas do snapshot das condições atuais', ('result',))
+
+FORECAST_LOOKUPS = registry.counter(
+    'winecast_forecast_lookups_total', 'Consultas de previsões por origem (memory, database, api, stale)', ('source',))
+
+# Base de dados
+DB_COMMIT_SECONDS = registry.histogram(
+    'winecast_db_commit_seconds', 'Duração dos commits na base de dados')
+
+DB_POOL_WAIT_SECONDS = registry.histogram(
+    'winecast_db_pool_wait_seconds', 'Tempo de espera por uma ligação do pool', ('bind',),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0))
+DB_POOL_CHECKOUTS = registry.counter(
+    'winecast_db_pool_checkouts_total', 'Ligações retiradas do pool', ('bind',))
+DB_POOL_CHECKED_OUT = registry.gauge(
+    'winecast_db_pool_checked_out', 'Ligações do pool atualmente em uso', ('bind',))
+
+# HTTP
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'winecast_http_request_seconds', 'Latência dos pedidos HTTP por endpoint',
+    ('endpoint', 'method', 'status'))
+
+# WebSocket
+WEBSOCKET_CONNECTIONS = registry.gauge(
+    'winecast_websocket_connections', 'Ligações WebSocket ativas')
+WEBSOCKET_EMITS = registry.counter(
+    'winecast_websocket_emits_total', 'Eventos emitidos pelo servidor WebSocket', ('event',))
+
+# Análise
+ANALYZER_SECONDS = registry.histogram(
+    'winecast_analyzer_seconds', 'Duração de VineyardAnalyzer.analyze_all_conditions')
+RULE_RELOADS = registry.counter(
+    'winecast_rule_reloads_total', 'Recargas do ficheiro de regras vitícolas', ('result',))
+RULE_ERRORS = registry.counter(
+    'winecast_rule_errors_total', 'Regras vitícolas saltadas por erro na avaliação', ('rule',))
+
+# Eventos de alertas (WebSocket)
+ALERT_EVENTS = registry.counter(
+    'winecast_alert_events_total', 'Eventos de alertas entregues', ('event', 'level'))
+ALERT_EVENTS_SUPPRESSED = registry.counter(
+    'winecast_alert_events_suppressed_total', 'Eventos de alertas descartados (repetidos ou substituídos)', ('reason',))
+ALERT_EVENTS_REPLAYED = registry.counter(
+    'winecast_alert_replays_total', 'Pedidos de reenvio de eventos de alertas', ('result',))
+ALERT_EVENT_DELAY_SECONDS = registry.histogram(
+    'winecast_alert_event_delay_seconds', 'Tempo entre a publicação e a entrega de um evento de alerta')
+
+# Escrita diferida (ver app/services/write_behind.py)
+WRITE_BEHIND_QUEUE_DEPTH = registry.gauge(
+    'winecast_write_behind_queue_depth', 'Operações à espera do writer')
+WRITE_BEHIND_BATCH_SIZE = registry.histogram(
+    'winecast_write_behind_batch_size', 'Operações gravadas por commit',
+    buckets=(1, 2, 5, 10, 25, 50, 100, 200, 500, 1000))
+WRITE_BEHIND_COMMIT_SECONDS = registry.histogram(
+    'winecast_write_behind_commit_seconds', 'Duração da aplicação e commit de um lote')
+WRITE_BEHIND_LAG_SECONDS = registry.histogram(
+    'winecast_write_behind_lag_seconds', 'Tempo entre aceitar uma operação e o seu commit')
+WRITE_BEHIND_REJECTED = registry.counter(
+    'winecast_write_behind_rejected_total', 'Operações recusadas com a fila cheia', ('kind',))
+WRITE_BEHIND_FAILED = registry.counter(
+    'winecast_write_behind_failed_total', 'Operações descartadas por erro ao gravar (dead letter)', ('kind',))
+WRITE_BEHIND_RETRIES = registry.counter(
+    'winecast_write_behind_retries_total', 'Lotes repetidos por erro de ligação à BD')
+
+# Registos gravados na última hora (usado por /weather/status)
+recent_weather_rows = SlidingWindowCounter(window_seconds=3600)
+
+
+_db_metrics_installed = False
+
+
+def init_db_metrics(session_class):
+    """Medir a duração de todos os commits feitos por sessões de session_class"""
+    global _db_metrics_installed
+    if _db_metrics_installed:
+        return
+    _db_metrics_installed = True
+
+    from sqlalchemy import event
+
+    @event.listens_for(session_class, 'before_commit')
+    def _before_commit(session):
+        session.info['commit_started'] = time.perf_counter()
+
+    @event.listens_for(session_class, 'after_commit')
+    def _after_commit(session):
+        started = session.info.pop('commit_started', None)
+        if started is not None:
+            DB_COMMIT_SECONDS.observe(time.perf_counter() - started)
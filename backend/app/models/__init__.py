@@ -1,5 +1,7 @@
 from app.models.base import db
 from app.models.weather import Weather
+from app.models.station import Station
+from app.models.forecast import Forecast
 
 # Array of all models
-__all__ = ['db', 'Weather']
\ No newline at end of file
+__all__ = ['db', 'Weather', 'Station', 'Forecast']
\ No newline at end of file
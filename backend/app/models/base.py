@@ -1,4 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from app.models.routing import RoutingSession
 
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy(session_options={'class_': RoutingSession})
\ No newline at end of file
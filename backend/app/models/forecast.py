@@ -0,0 +1,30 @@
+from app.models.base import db, datetime
+
+
+class Forecast(db.Model):
+    """
+    Modelo para armazenar previsões (5 dias / 3 horas) por estação
+
+    Cada emissão é guardada numa só linha: os passos da previsão vão
+    empacotados em binário (ver app/services/forecast_service.py).
+    """
+    __tablename__ = 'forecasts'
+    __table_args__ = (
+        db.UniqueConstraint('station_name', 'issued_at', name='uq_forecast_station_issue'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    station_name = db.Column(db.String(100), nullable=False, index=True)
+
+    # Momento em que a previsão foi obtida da API
+    issued_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # Intervalo coberto (timestamps Unix do primeiro e último passo)
+    first_dt = db.Column(db.Integer, nullable=False)
+    last_dt = db.Column(db.Integer, nullable=False)
+    steps = db.Column(db.Integer, nullable=False)
+
+    payload = db.Column(db.LargeBinary, nullable=False)
+
+    def __repr__(self):
+        return f'<Forecast {self.station_name} - {self.issued_at}>'
@@ -0,0 +1,64 @@
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from app import metrics
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool que mede o tempo de espera por uma ligação"""
+
+    metrics_label = 'primary'
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started, bind=self.metrics_label)
+
+
+def build_engine_options(config) -> dict:
+    """
+    Opções do engine a partir da configuração da app
+
+    SQLite em memória usa StaticPool (definido pelo Flask-SQLAlchemy), pelo
+    que só recebe o pre-ping.
+    """
+    options = {'pool_pre_ping': config['DB_POOL_PRE_PING']}
+
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.drivername.startswith('sqlite') and url.database in (None, '', ':memory:'):
+        return options
+
+    options.update({
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE']
+    })
+    return options
+
+
+def init_pool_metrics(db):
+    """Registar métricas de checkout em todos os engines (primário e réplica)"""
+    for bind_key, engine in db.engines.items():
+        label = bind_key or 'primary'
+        pool = engine.pool
+        if isinstance(pool, InstrumentedQueuePool):
+            pool.metrics_label = label
+
+        def update_checked_out(pool=pool, label=label):
+            if hasattr(pool, 'checkedout'):
+                metrics.DB_POOL_CHECKED_OUT.set(pool.checkedout(), bind=label)
+
+        @event.listens_for(engine, 'checkout')
+        def _on_checkout(dbapi_connection, connection_record, connection_proxy,
+                         label=label, update=update_checked_out):
+            metrics.DB_POOL_CHECKOUTS.inc(bind=label)
+            update()
+
+        @event.listens_for(engine, 'checkin')
+        def _on_checkin(dbapi_connection, connection_record, update=update_checked_out):
+            update()
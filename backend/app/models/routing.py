@@ -0,0 +1,42 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND = 'replica'
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+class RoutingSession(Session):
+    """
+    Sessão que encaminha leituras para a réplica quando configurada
+
+    Dentro de read_replica() (ou de uma rota com @read_only) as queries
+    vão para o bind 'replica'. Flushes e todo o resto vão para o primário.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and _use_replica.get() and not self._flushing
+                and REPLICA_BIND in self._db.engines):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def read_replica():
+    """Encaminhar as leituras do bloco para a réplica"""
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def read_only(view):
+    """Decorator para rotas que só leem dados e podem usar a réplica"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with read_replica():
+            return view(*args, **kwargs)
+    return wrapper
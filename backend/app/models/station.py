@@ -0,0 +1,67 @@
+from app.models.base import db, datetime
+
+
+# Estações iniciais (vinhas e cidades de referência)
+DEFAULT_STATIONS = [
+    {"name": "Peso da Régua", "lat": 41.16, "lon": -7.78, "region": "Douro"},
+    {"name": "Évora", "lat": 38.57, "lon": -7.91, "region": "Alentejo"},
+    {"name": "Reguengos de Monsaraz", "lat": 38.42, "lon": -7.54, "region": "Alentejo"},
+    {"name": "Palmela", "lat": 38.57, "lon": -8.90, "region": "Setúbal"},
+    {"name": "Porto", "lat": 41.15, "lon": -8.61, "region": "Vinho Verde"},
+    {"name": "Lisbon", "lat": 38.72, "lon": -9.14, "region": "Lisboa"},
+    {"name": "Braga", "lat": 41.55, "lon": -8.42, "region": "Vinho Verde"}
+]
+
+
+class Station(db.Model):
+    """Modelo para o registo de estações monitorizadas"""
+    __tablename__ = 'stations'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+    region = db.Column(db.String(100), nullable=False)
+    lat = db.Column(db.Float, nullable=False)
+    lon = db.Column(db.Float, nullable=False)
+
+    # ID da cidade na OpenWeatherMap, definido pelo operador (permite a
+    # coleta em grupo; só para estações que coincidem com essa cidade)
+    owm_id = db.Column(db.Integer, index=True)
+
+    is_active = db.Column(db.Boolean, default=True, nullable=False)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @classmethod
+    def seed_defaults(cls) -> int:
+        """
+        Inserir as estações por omissão que ainda não existem
+
+        Returns:
+            int: Número de estações inseridas
+        """
+        existing = {name for (name,) in db.session.query(cls.name)}
+        added = 0
+        for station in DEFAULT_STATIONS:
+            if station["name"] not in existing:
+                db.session.add(cls(**station))
+                added += 1
+        db.session.commit()
+        return added
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "region": self.region,
+            "lat": self.lat,
+            "lon": self.lon,
+            "owm_id": self.owm_id,
+            "is_active": self.is_active,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    def __repr__(self):
+        return f'<Station {self.name} ({self.region})>'
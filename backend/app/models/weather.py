@@ -2,6 +2,10 @@ from app.models.base import db, datetime
 
 class Weather(db.Model):
     __tablename__ = 'weather_data'
+    __table_args__ = (
+        # Consultas por estação e intervalo de tempo (séries)
+        db.Index('ix_weather_name_dt', 'name', 'dt'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -67,6 +71,56 @@ class Weather(db.Model):
     # Internal
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    @staticmethod
+    def columns_from_api(weather_data):
+        """Converter um JSON da API OpenWeatherMap nos valores das colunas"""
+        weather_info = weather_data['weather'][0] if weather_data.get('weather') else {}
+        main_data = weather_data.get('main', {})
+        wind_data = weather_data.get('wind', {})
+        clouds_data = weather_data.get('clouds', {})
+        rain_data = weather_data.get('rain') or {}
+        sys_data = weather_data.get('sys', {})
+        coord_data = weather_data.get('coord', {})
+
+        return {
+            "lon": coord_data.get('lon'),
+            "lat": coord_data.get('lat'),
+            "weather_id": weather_info.get('id'),
+            "weather_main": weather_info.get('main'),
+            "weather_description": weather_info.get('description'),
+            "weather_icon": weather_info.get('icon'),
+            "base": weather_data.get('base'),
+            "temp": main_data.get('temp'),
+            "feels_like": main_data.get('feels_like'),
+            "temp_min": main_data.get('temp_min'),
+            "temp_max": main_data.get('temp_max'),
+            "pressure": main_data.get('pressure'),
+            "humidity": main_data.get('humidity'),
+            "sea_level": main_data.get('sea_level'),
+            "grnd_level": main_data.get('grnd_level'),
+            "visibility": weather_data.get('visibility'),
+            "wind_speed": wind_data.get('speed'),
+            "wind_deg": wind_data.get('deg'),
+            "wind_gust": wind_data.get('gust'),
+            "rain_1h": rain_data.get('1h'),
+            "clouds_all": clouds_data.get('all'),
+            "dt": weather_data.get('dt'),
+            "sys_type": sys_data.get('type'),
+            "sys_id": sys_data.get('id'),
+            "country": sys_data.get('country'),
+            "sunrise": sys_data.get('sunrise'),
+            "sunset": sys_data.get('sunset'),
+            "timezone": weather_data.get('timezone'),
+            "city_id": weather_data.get('id'),
+            "name": weather_data.get('name'),
+            "cod": weather_data.get('cod')
+        }
+
+    @classmethod
+    def from_api(cls, weather_data):
+        """Criar um registo a partir de um JSON da API OpenWeatherMap"""
+        return cls(**cls.columns_from_api(weather_data))
+
     def to_dict(self):
         return {
             "coord": {
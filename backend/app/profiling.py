@@ -0,0 +1,98 @@
+import cProfile
+import io
+import os
+import pstats
+import time
+from datetime import datetime
+from flask import Response, g, has_request_context, request
+
+PROFILE_HEADER = 'X-Profile'
+
+_sql_listeners_installed = False
+
+
+def _install_sql_listeners(slow_query_ms: float):
+    """Contar queries e tempo de BD por pedido em todos os engines"""
+    global _sql_listeners_installed
+    if _sql_listeners_installed:
+        return
+    _sql_listeners_installed = True
+
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+
+        if has_request_context() and 'sql_queries' in g:
+            g.sql_queries += 1
+            g.sql_seconds += elapsed
+
+        if elapsed * 1000 >= slow_query_ms:
+            endpoint = request.path if has_request_context() else '-'
+            print(f"Query lenta ({elapsed * 1000:.1f}ms) em {endpoint}: {' '.join(statement.split())}")
+
+
+def init_profiling(app):
+    """
+    Ativar a contabilização de queries e o profiling por pedido
+
+    Só regista hooks e listeners quando PROFILING_ENABLED está ativo;
+    caso contrário não tem qualquer custo.
+
+    Cada resposta passa a incluir X-SQL-Queries e X-SQL-Time-ms. Com o
+    header X-Profile o pedido é perfilado com cProfile:
+    X-Profile: return devolve o relatório em texto em vez da resposta,
+    X-Profile: store guarda o ficheiro .prof em PROFILE_DIR.
+    """
+    if not app.config.get('PROFILING_ENABLED'):
+        return
+
+    _install_sql_listeners(app.config.get('SLOW_QUERY_MS', 200))
+    profile_dir = app.config.get('PROFILE_DIR', 'profiles')
+
+    @app.before_request
+    def start_request_accounting():
+        g.sql_queries = 0
+        g.sql_seconds = 0.0
+        if request.headers.get(PROFILE_HEADER):
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def finish_request_accounting(response):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            response = _profile_response(profiler, response, profile_dir)
+
+        if 'sql_queries' in g:
+            response.headers['X-SQL-Queries'] = str(g.sql_queries)
+            response.headers['X-SQL-Time-ms'] = f"{g.sql_seconds * 1000:.2f}"
+        return response
+
+
+def _profile_response(profiler, response, profile_dir):
+    """Devolver ou guardar o perfil conforme o valor do header X-Profile"""
+    mode = request.headers.get(PROFILE_HEADER, '').lower()
+
+    if mode == 'store':
+        os.makedirs(profile_dir, exist_ok=True)
+        endpoint = (request.endpoint or 'unknown').replace('.', '_')
+        filename = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}_{endpoint}.prof"
+        path = os.path.join(profile_dir, filename)
+        profiler.dump_stats(path)
+        response.headers['X-Profile-File'] = path
+        return response
+
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.sort_stats('cumulative').print_stats(40)
+    profile_response = Response(output.getvalue(), mimetype='text/plain')
+    profile_response.headers['X-Profiled-Status'] = str(response.status_code)
+    return profile_response
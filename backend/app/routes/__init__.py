@@ -12,6 +12,7 @@ def home():
         "message": "WineCast API - Sistema Meteorológico para Viticultura",
         "version": "1.0",
         "endpoints": {
+            "dashboard": "/api/dashboard",
             "weather_current": "/api/weather/current",
             "weather_cities": "/api/weather/cities", 
             "weather_analyze": "/api/weather/analyze/<city_name>",
@@ -0,0 +1,229 @@
+from flask import request, jsonify
+from app.routes import api
+from app.models import db
+from app.models.station import Station
+from app import get_station_registry, get_station_index
+
+# Limites das consultas de proximidade
+MAX_NEAREST = 50
+MAX_BATCH_POINTS = 10000
+
+
+def _parse_point(lat, lon):
+    """Validar um par de coordenadas"""
+    lat, lon = float(lat), float(lon)
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError(f"Coordenadas inválidas: {lat}, {lon}")
+    return lat, lon
+
+
+def _parse_station(data, current=None):
+    """
+    Validar os campos de uma estação
+
+    Args:
+        data (Dict): Corpo do pedido
+        current (Station, optional): Estação a alterar (coordenadas em
+            falta no pedido vêm daqui)
+
+    Returns:
+        Dict: Campos validados presentes no pedido
+
+    Raises:
+        ValueError: Campo com tipo ou valor inválido
+    """
+    fields = {}
+    for field in ('name', 'region'):
+        if field in data:
+            if not isinstance(data[field], str) or not data[field].strip():
+                raise ValueError(f"{field} deve ser um texto não vazio")
+            fields[field] = data[field].strip()
+
+    if 'lat' in data or 'lon' in data:
+        lat = data.get('lat', current.lat if current else None)
+        lon = data.get('lon', current.lon if current else None)
+        try:
+            if isinstance(lat, bool) or isinstance(lon, bool):
+                raise TypeError
+            lat, lon = float(lat), float(lon)
+        except (TypeError, ValueError):
+            raise ValueError("lat e lon devem ser números")
+        fields['lat'], fields['lon'] = _parse_point(lat, lon)
+
+    if 'owm_id' in data:
+        owm_id = data['owm_id']
+        if owm_id is not None and (isinstance(owm_id, bool) or not isinstance(owm_id, int) or owm_id <= 0):
+            raise ValueError("owm_id deve ser um inteiro positivo ou null")
+        fields['owm_id'] = owm_id
+
+    if 'is_active' in data:
+        if not isinstance(data['is_active'], bool):
+            raise ValueError("is_active deve ser true ou false")
+        fields['is_active'] = data['is_active']
+
+    return fields
+
+
+@api.route('/stations', methods=['GET'])
+def get_stations():
+    """Listar as estações do registo (inativas com ?all=true)"""
+    try:
+        query = Station.query.order_by(Station.id)
+        if request.args.get('all', 'false').lower() != 'true':
+            query = query.filter_by(is_active=True)
+        stations = [station.to_dict() for station in query.all()]
+
+        return jsonify({
+            "success": True,
+            "stations": stations,
+            "count": len(stations),
+            "registry_version": get_station_registry().version
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@api.route('/stations', methods=['POST'])
+def create_station():
+    """Adicionar uma estação ao registo"""
+    try:
+        data = request.get_json(silent=True) or {}
+        missing = [field for field in ('name', 'region', 'lat', 'lon') if data.get(field) in (None, '')]
+        if missing:
+            return jsonify({"error": f"Campos obrigatórios em falta: {', '.join(missing)}"}), 400
+
+        try:
+            fields = _parse_station(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        if Station.query.filter_by(name=fields['name']).first():
+            return jsonify({"error": f"Estação já existe: {fields['name']}"}), 409
+
+        station = Station(**fields)
+        db.session.add(station)
+        db.session.commit()
+        get_station_registry().reload()
+
+        return jsonify({
+            "success": True,
+            "station": station.to_dict()
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+@api.route('/stations/<int:station_id>', methods=['PATCH'])
+def update_station(station_id):
+    """Alterar uma estação (ex.: coordenadas, owm_id ou is_active)"""
+    try:
+        station = db.session.get(Station, station_id)
+        if station is None:
+            return jsonify({"error": "Estação não encontrada"}), 404
+
+        data = request.get_json(silent=True) or {}
+        try:
+            fields = _parse_station(data, current=station)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        if 'name' in fields and Station.query.filter(
+            Station.name == fields['name'], Station.id != station_id
+        ).first():
+            return jsonify({"error": f"Estação já existe: {fields['name']}"}), 409
+
+        for field, value in fields.items():
+            setattr(station, field, value)
+        db.session.commit()
+        get_station_registry().reload()
+
+        return jsonify({
+            "success": True,
+            "station": station.to_dict()
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+@api.route('/stations/reload', methods=['POST'])
+def reload_stations():
+    """Recarregar o registo após alterações feitas diretamente na base de dados"""
+    try:
+        stations = get_station_registry().reload()
+
+        return jsonify({
+            "success": True,
+            "count": len(stations),
+            "registry_version": get_station_registry().version
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@api.route('/stations/nearest', methods=['GET'])
+def get_nearest_stations():
+    """Estações mais próximas de uma parcela (?lat=&lon=&k=&max_km=)"""
+    try:
+        try:
+            lat, lon = _parse_point(request.args['lat'], request.args['lon'])
+        except (KeyError, ValueError) as e:
+            return jsonify({"error": f"lat e lon obrigatórios e válidos: {e}"}), 400
+
+        k = min(max(request.args.get('k', 1, type=int), 1), MAX_NEAREST)
+        max_km = request.args.get('max_km', type=float)
+
+        return jsonify({
+            "success": True,
+            "lat": lat,
+            "lon": lon,
+            "stations": get_station_index().nearest(lat, lon, k, max_km)
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@api.route('/stations/nearest', methods=['POST'])
+def get_nearest_stations_batch():
+    """
+    Estações mais próximas de várias parcelas
+
+    Corpo: {"points": [{"lat": .., "lon": ..} ou [lat, lon], ...], "k": 1, "max_km": null}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        raw_points = data.get('points')
+        if not isinstance(raw_points, list) or not raw_points:
+            return jsonify({"error": "Lista 'points' obrigatória"}), 400
+        if len(raw_points) > MAX_BATCH_POINTS:
+            return jsonify({"error": f"Máximo de {MAX_BATCH_POINTS} pontos por pedido"}), 400
+
+        try:
+            points = [
+                _parse_point(point['lat'], point['lon']) if isinstance(point, dict) else _parse_point(*point)
+                for point in raw_points
+            ]
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({"error": f"Ponto inválido: {e}"}), 400
+
+        k = min(max(int(data.get('k', 1)), 1), MAX_NEAREST)
+        max_km = data.get('max_km')
+        results = get_station_index().nearest_batch(points, k, float(max_km) if max_km is not None else None)
+
+        return jsonify({
+            "success": True,
+            "results": [
+                {"lat": lat, "lon": lon, "stations": stations}
+                for (lat, lon), stations in zip(points, results)
+            ],
+            "count": len(results)
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
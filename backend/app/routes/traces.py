@@ -0,0 +1,36 @@
+from flask import request, jsonify
+from app.routes import api
+from app.tracing import tracer
+
+
+@api.route('/traces', methods=['GET'])
+def get_traces():
+    """Obter os traces mais recentes do pipeline de ingestão"""
+    try:
+        station = request.args.get('station')
+        limit = request.args.get('limit', 100, type=int)
+        traces = tracer.recent(station, limit)
+
+        return jsonify({
+            "success": True,
+            "traces": traces,
+            "count": len(traces)
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@api.route('/traces/latency', methods=['GET'])
+def get_trace_latency():
+    """Percentis de latência por estação e por etapa do pipeline"""
+    try:
+        station = request.args.get('station')
+
+        return jsonify({
+            "success": True,
+            "stations": tracer.latency_summary(station)
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -1,36 +1,87 @@
 from flask import Blueprint, request, jsonify
 from app.routes import api
 from app.models import db, Weather
+from app.models.routing import read_only
 from app.models.alert import VineyardAlert as AlertModel
 from app.services.weather_service import WeatherService
 from app.services.vineyard_analyzer import VineyardAnalyzer, WeatherAnalysis
-from app.services.alert_manager import AlertManager
-from app import get_weather_service
-from datetime import datetime, timedelta
-from sqlalchemy import desc
+from app.services.write_behind import WriteQueueFull
+from app.services.current_conditions import StaleDataError
+from app.services.series import SERIES_METRICS, METHODS, load_series, history_series, downsample
+from app.services.interpolation import (
+    IDWInterpolator, VARIABLES, latest_observations, grid_shape, regular_grid, to_json_values
+)
+from app import (
+    get_weather_service, get_dashboard_service, get_station_registry, get_forecast_service,
+    get_history_store, get_history_archive, get_write_queue, get_current_conditions,
+    get_alert_manager, get_initialized_services, metrics
+)
+from datetime import datetime, timedelta, timezone
+import math
+import numpy as np
 
 # Instâncias dos serviços
 analyzer = VineyardAnalyzer()
-alert_manager = AlertManager()
+interpolator = IDWInterpolator()
+
+# Número máximo de pontos por pedido de interpolação
+MAX_INTERPOLATION_POINTS = 250000
+
+# Limites das séries temporais
+MAX_SERIES_POINTS = 5000
+MAX_SERIES_STATIONS = 20
+
+# Prazo aceite para a coleta forçada (segundos)
+MIN_COLLECT_DEADLINE = 1.0
+MAX_COLLECT_DEADLINE = 120.0
+
+@api.route('/dashboard', methods=['GET'])
+@read_only
+def get_dashboard():
+    """Obter todos os dados do dashboard num único pedido"""
+    try:
+        dashboard_service = get_dashboard_service()
+        
+        if not dashboard_service:
+            return jsonify({"error": "Serviço do dashboard não disponível"}), 500
+        
+        snapshot = dashboard_service.get_snapshot()
+        
+        response = jsonify({
+            "success": True,
+            **snapshot
+        })
+        response.headers['Cache-Control'] = f"private, max-age={int(dashboard_service.ttl_seconds)}"
+        return response
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
 @api.route('/weather/current', methods=['GET'])
+@read_only
 def get_current_weather():
     """Obter dados meteorológicos atuais de todas as cidades"""
     try:
         city_name = request.args.get('city')
-        weather_service = get_weather_service()
-        
-        if not weather_service:
-            return jsonify({"error": "Serviço meteorológico não disponível"}), 500
         
-        latest_data = weather_service.get_latest_weather(city_name)
+        # Último snapshot bom; desatualizado é servido e recarregado em background
+        snapshot = get_current_conditions().get(city_name)
         
-        return jsonify({
+        response = jsonify({
             "success": True,
-            "data": latest_data,
+            "data": snapshot["data"],
+            "snapshot": {
+                "loaded_at": snapshot["loaded_at"],
+                "age_seconds": snapshot["age_seconds"],
+                "stale": snapshot["stale"]
+            },
             "timestamp": datetime.utcnow().isoformat()
         })
+        response.headers['Age'] = str(int(snapshot["age_seconds"]))
+        return response
         
+    except StaleDataError as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -65,55 +116,48 @@ def get_available_cities():
 def analyze_weather_conditions(city_name):
     """Analisar condições meteorológicas para viticultura"""
     try:
-        # Buscar dados atuais
-        current_weather_data = Weather.query.filter_by(name=city_name)\
-            .order_by(desc(Weather.created_at)).first()
+        history = get_history_store()
         
-        if not current_weather_data:
+        # Dados atuais: última observação gravada (histórico em memória)
+        current_record = history.latest(city_name)
+        
+        if not current_record:
             return jsonify({"error": f"Dados não encontrados para {city_name}"}), 404
         
-        # Buscar histórico recente (últimos 3 dias)
-        three_days_ago = datetime.utcnow() - timedelta(days=3)
-        recent_weather_data = Weather.query.filter_by(name=city_name)\
-            .filter(Weather.created_at >= three_days_ago)\
-            .order_by(desc(Weather.created_at)).all()
+        # Histórico recente (últimos 3 dias), por ordem cronológica
+        three_days_ago = int((datetime.now(timezone.utc) - timedelta(days=3)).timestamp())
+        recent_analyses = history.analyses(city_name, since=three_days_ago)
         
         # Converter para formato de análise
         current_analysis = WeatherAnalysis(
-            temperature=current_weather_data.temp,
-            humidity=current_weather_data.humidity,
-            precipitation=current_weather_data.rain_1h or 0.0,
-            wind_speed=current_weather_data.wind_speed,
-            weather_condition=current_weather_data.weather_main,
-            pressure=current_weather_data.pressure,
-            timestamp=current_weather_data.created_at
+            temperature=current_record["main"]["temp"],
+            humidity=current_record["main"]["humidity"],
+            precipitation=(current_record["rain"] or {}).get("1h") or 0.0,
+            wind_speed=current_record["wind"]["speed"],
+            weather_condition=current_record["weather"][0]["main"],
+            pressure=current_record["main"]["pressure"],
+            timestamp=datetime.fromisoformat(current_record["created_at"])
         )
         
-        recent_analyses = []
-        for weather_data in recent_weather_data:
-            recent_analyses.append(WeatherAnalysis(
-                temperature=weather_data.temp,
-                humidity=weather_data.humidity,
-                precipitation=weather_data.rain_1h or 0.0,
-                wind_speed=weather_data.wind_speed,
-                weather_condition=weather_data.weather_main,
-                pressure=weather_data.pressure,
-                timestamp=weather_data.created_at
-            ))
+        # Previsão diária (5 dias / 3 horas agregada por dia), em cache; expirada é
+        # atualizada em background, sem esperar pela API
+        station = get_station_registry().get(city_name)
+        forecast_analyses = get_forecast_service().get_daily_analyses(station) if station else []
         
         # Executar análises
         alerts = analyzer.analyze_all_conditions(
             current_weather=current_analysis,
             recent_weather=recent_analyses,
-            forecast_weather=recent_analyses[:5],  # Usar dados recentes como previsão
-            city_id=current_weather_data.city_id,
-            city_name=city_name
+            forecast_weather=forecast_analyses,
+            city_id=current_record["id"],
+            city_name=city_name,
+            region=station['region'] if station else None
         )
         
         # Salvar alertas na base de dados
         saved_alerts = []
         for alert in alerts:
-            saved_alert = alert_manager.save_alert(alert)
+            saved_alert = get_alert_manager().save_alert(alert)
             saved_alerts.append(saved_alert.to_dict())
         
         return jsonify({
@@ -127,19 +171,270 @@ def analyze_weather_conditions(city_name):
                 "weather_condition": current_analysis.weather_condition,
                 "timestamp": current_analysis.timestamp.isoformat()
             },
+            "forecast": [
+                {
+                    "date": day.timestamp.date().isoformat(),
+                    "temperature": day.temperature,
+                    "precipitation": day.precipitation,
+                    "wind_speed": day.wind_speed,
+                    "weather_condition": day.weather_condition
+                }
+                for day in forecast_analyses
+            ],
             "alerts": saved_alerts,
             "analysis_timestamp": datetime.utcnow().isoformat()
         })
         
+    except WriteQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@api.route('/weather/forecast/<city_name>', methods=['GET'])
+def get_weather_forecast(city_name):
+    """Obter a previsão 5 dias / 3 horas em cache de uma estação"""
+    try:
+        station = get_station_registry().get(city_name)
+        if not station:
+            return jsonify({"error": f"Estação não encontrada: {city_name}"}), 404
+        
+        forecast_service = get_forecast_service()
+        entry = forecast_service.get_cached(station)
+        if entry is None:
+            return jsonify({"error": f"Previsão indisponível para {city_name}"}), 503
+        
+        return jsonify({
+            "success": True,
+            "city": city_name,
+            **forecast_service.to_dict(entry)
+        })
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _parse_time(value, default):
+    """Timestamp Unix a partir de um inteiro ou de uma data ISO"""
+    if value in (None, ''):
+        return default
+    if value.lstrip('-').isdigit():
+        return int(value)
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)  # Datas sem fuso em UTC
+    return int(parsed.timestamp())
+
+@api.route('/weather/series', methods=['GET'])
+@read_only
+def get_weather_series():
+    """
+    Séries temporais reduzidas para gráficos
+    
+    Query: stations=Porto,Évora&metrics=temp,humidity&start=&end=
+    (timestamp Unix ou ISO; por omissão as últimas 24h), points=500 e
+    method=lttb (forma da série) ou avg (média, mínimo e máximo por bucket)
+    """
+    try:
+        stations = [name for name in request.args.get('stations', '').split(',') if name]
+        metric_names = [name for name in request.args.get('metrics', 'temp').split(',') if name]
+        method = request.args.get('method', 'lttb')
+        points = request.args.get('points', 500, type=int)
+        
+        if not stations:
+            return jsonify({"error": "Indicar pelo menos uma estação em 'stations'"}), 400
+        if len(stations) > MAX_SERIES_STATIONS:
+            return jsonify({"error": f"Máximo de {MAX_SERIES_STATIONS} estações por pedido"}), 400
+        unknown = [name for name in metric_names if name not in SERIES_METRICS]
+        if unknown:
+            return jsonify({"error": f"Métricas desconhecidas: {', '.join(unknown)}"}), 400
+        if method not in METHODS:
+            return jsonify({"error": f"Método inválido: {method} (usar {', '.join(METHODS)})"}), 400
+        if not 3 <= points <= MAX_SERIES_POINTS:
+            return jsonify({"error": f"points deve estar entre 3 e {MAX_SERIES_POINTS}"}), 400
+        
+        try:
+            end = _parse_time(request.args.get('end'), int(datetime.now(timezone.utc).timestamp()))
+            start = _parse_time(request.args.get('start'), end - 86400)
+        except ValueError as e:
+            return jsonify({"error": f"Data inválida: {e}"}), 400
+        if start >= end:
+            return jsonify({"error": "start tem de ser anterior a end"}), 400
+        
+        # Intervalos recentes vêm do histórico em memória, os longos do arquivo
+        # em disco e os restantes da BD
+        data = history_series(get_history_store(), stations, metric_names, start, end)
+        archive = get_history_archive()
+        if data is None and archive is not None:
+            data = archive.series(stations, metric_names, start, end)
+        if data is None:
+            data = load_series(stations, metric_names, start, end)
+        
+        series = []
+        for station in stations:
+            for metric in metric_names:
+                series.append({
+                    "station": station,
+                    "metric": metric,
+                    "raw_count": int(len(data[station]['t'])),
+                    **downsample(data[station]['t'], data[station][metric], start, end, points, method)
+                })
+        
+        return jsonify({
+            "success": True,
+            "start": start,
+            "end": end,
+            "points": points,
+            "method": method,
+            "series": series
+        })
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@api.route('/weather/gdd/<city_name>', methods=['GET'])
+def get_growing_degree_days(city_name):
+    """
+    Graus-dia de crescimento (GDD) diários e acumulados a partir do arquivo
+    
+    Query: start e end (timestamp Unix ou ISO; por omissão desde 1 de
+    abril, início do ciclo vegetativo) e base (°C, por omissão 10)
+    """
+    try:
+        archive = get_history_archive()
+        if archive is None:
+            return jsonify({"error": "Arquivo do histórico desativado (ARCHIVE_ENABLED)"}), 503
+        
+        now = datetime.now(timezone.utc)
+        season_start = datetime(now.year if now.month >= 4 else now.year - 1, 4, 1, tzinfo=timezone.utc)
+        try:
+            end = _parse_time(request.args.get('end'), int(now.timestamp()))
+            start = _parse_time(request.args.get('start'), int(season_start.timestamp()))
+            base = float(request.args.get('base', 10.0))
+        except ValueError as e:
+            return jsonify({"error": f"Parâmetro inválido: {e}"}), 400
+        if start >= end:
+            return jsonify({"error": "start tem de ser anterior a end"}), 400
+        
+        gdd = archive.growing_degree_days(city_name, start, end, base=base)
+        if len(gdd["day"]) == 0:
+            return jsonify({"error": f"Sem histórico arquivado para {city_name}"}), 404
+        
+        return jsonify({
+            "success": True,
+            "city": city_name,
+            "base": base,
+            "start": start,
+            "end": end,
+            "total": round(float(gdd["cumulative"][-1]), 1),
+            "days": [
+                {
+                    "date": datetime.fromtimestamp(day, timezone.utc).date().isoformat(),
+                    "gdd": value,
+                    "cumulative": cumulative
+                }
+                for day, value, cumulative in zip(
+                    gdd["day"].tolist(),
+                    np.round(gdd["gdd"], 2).tolist(),
+                    np.round(gdd["cumulative"], 1).tolist()
+                )
+            ]
+        })
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _split_rows(values, width):
+    """Lista plana para linhas da grelha"""
+    return [values[start:start + width] for start in range(0, len(values), width)]
+
+@api.route('/weather/interpolate', methods=['POST'])
+@read_only
+def interpolate_weather():
+    """
+    Interpolar as condições atuais (IDW) em parcelas ou numa grelha regular
+    
+    Corpo: {"points": [[lat, lon], ...]} ou
+    {"grid": {"lat_min", "lat_max", "lon_min", "lon_max", "step"}},
+    e opcionalmente "variables" (temperature, humidity, rain_1h)
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        variables = data.get('variables') or list(VARIABLES)
+        unknown = [name for name in variables if name not in VARIABLES]
+        if unknown:
+            return jsonify({"error": f"Variáveis desconhecidas: {', '.join(unknown)}"}), 400
+        
+        grid = data.get('grid')
+        try:
+            if grid:
+                bounds = (float(grid['lat_min']), float(grid['lat_max']),
+                          float(grid['lon_min']), float(grid['lon_max']), float(grid['step']))
+                # Tamanho calculado a partir dos limites, antes de alocar a grelha
+                rows, cols = grid_shape(*bounds)
+                if rows * cols > MAX_INTERPOLATION_POINTS:
+                    return jsonify({"error": f"Máximo de {MAX_INTERPOLATION_POINTS} pontos por pedido "
+                                             f"(grelha de {rows}x{cols})"}), 400
+                lats, lons, points = regular_grid(*bounds)
+            elif data.get('points'):
+                if len(data['points']) > MAX_INTERPOLATION_POINTS:
+                    return jsonify({"error": f"Máximo de {MAX_INTERPOLATION_POINTS} pontos por pedido"}), 400
+                points = np.array([
+                    [point['lat'], point['lon']] if isinstance(point, dict) else point
+                    for point in data['points']
+                ], dtype=np.float64)
+                if points.ndim != 2 or points.shape[1] != 2:
+                    raise ValueError("cada ponto deve ter lat e lon")
+            else:
+                return jsonify({"error": "Indicar 'points' ou 'grid'"}), 400
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({"error": f"Pontos inválidos: {e}"}), 400
+        
+        if len(points) > MAX_INTERPOLATION_POINTS:
+            return jsonify({"error": f"Máximo de {MAX_INTERPOLATION_POINTS} pontos por pedido"}), 400
+        if not (np.all(np.abs(points[:, 0]) <= 90) and np.all(np.abs(points[:, 1]) <= 180)):
+            return jsonify({"error": "Coordenadas fora dos limites"}), 400
+        
+        # Observações atuais a partir do snapshot do dashboard (em cache)
+        records = get_dashboard_service().get_snapshot()['current']
+        stations = {station['name']: station for station in get_station_registry().stations}
+        names, coords, values = latest_observations(records, stations, variables)
+        if not names:
+            return jsonify({"error": "Sem observações recentes para interpolar"}), 404
+        
+        results = interpolator.interpolate(coords, values, points)
+        
+        if grid:
+            width = len(lons)
+            body = {
+                "grid": {"lats": to_json_values(lats, 6), "lons": to_json_values(lons, 6)},
+                "values": {
+                    name: _split_rows(to_json_values(result), width)
+                    for name, result in results.items()
+                }
+            }
+        else:
+            body = {
+                "points": {"lat": points[:, 0].tolist(), "lon": points[:, 1].tolist()},
+                "values": {name: to_json_values(result) for name, result in results.items()}
+            }
+        
+        return jsonify({
+            "success": True,
+            "stations_used": names,
+            "power": interpolator.power,
+            "neighbours": interpolator.neighbours,
+            **body
+        })
+        
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @api.route('/alerts', methods=['GET'])
+@read_only
 def get_alerts():
     """Obter alertas ativos"""
     try:
         city_id = request.args.get('city_id', type=int)
-        alerts = alert_manager.get_active_alerts(city_id)
+        alerts = get_alert_manager().get_active_alerts(city_id)
         
         return jsonify({
             "success": True,
@@ -154,7 +449,7 @@ def get_alerts():
 def acknowledge_alert(alert_id):
     """Marcar alerta como reconhecido"""
     try:
-        success = alert_manager.acknowledge_alert(alert_id)
+        success = get_alert_manager().acknowledge_alert(alert_id)
         
         if success:
             return jsonify({
@@ -164,6 +459,8 @@ def acknowledge_alert(alert_id):
         else:
             return jsonify({"error": "Alerta não encontrado"}), 404
             
+    except WriteQueueFull as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -171,7 +468,7 @@ def acknowledge_alert(alert_id):
 def deactivate_alert(alert_id):
     """Desativar alerta"""
     try:
-        success = alert_manager.deactivate_alert(alert_id)
+        success = get_alert_manager().deactivate_alert(alert_id)
         
         if success:
             return jsonify({
@@ -181,6 +478,8 @@ def deactivate_alert(alert_id):
         else:
             return jsonify({"error": "Alerta não encontrado"}), 404
             
+    except WriteQueueFull as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -193,7 +492,12 @@ def trigger_collection():
         if not weather_service:
             return jsonify({"error": "Serviço meteorológico não disponível"}), 500
         
-        collected_data = weather_service.collect_all_cities_data()
+        # Prazo do pedido: estações não coletadas a tempo ficam para o ciclo seguinte
+        deadline = request.args.get('deadline', default=30.0, type=float)
+        if not math.isfinite(deadline):
+            return jsonify({"error": "deadline inválido"}), 400
+        deadline = min(max(deadline, MIN_COLLECT_DEADLINE), MAX_COLLECT_DEADLINE)
+        collected_data = weather_service.collect_all_cities_data(deadline_seconds=deadline)
         
         return jsonify({
             "success": True,
@@ -208,24 +512,32 @@ def trigger_collection():
 def get_service_status():
     """Obter status do serviço meteorológico"""
     try:
-        weather_service = get_weather_service()
+        # Só os serviços já criados: o status não cria serviços nem carrega dados
+        # (None nas secções ainda não inicializadas)
+        services = get_initialized_services()
+        weather_service = services["weather_service"]
+        history = services["history_store"]
+        archive = services["history_archive"]
+        write_queue = services["write_queue"]
+        current_conditions = services["current_conditions"]
         
-        if not weather_service:
-            return jsonify({"error": "Serviço meteorológico não disponível"}), 500
-        
-        # Contar registros recentes
-        recent_count = Weather.query.filter(
-            Weather.created_at >= datetime.utcnow() - timedelta(hours=1)
-        ).count()
+        # Registos da última hora a partir das métricas (sem consultar a tabela)
+        recent_count = metrics.recent_weather_rows.total()
         
         return jsonify({
             "success": True,
             "status": {
-                "collecting": weather_service.is_collecting,
-                "cities_monitored": len(weather_service.cities),
+                "initialized": weather_service is not None,
+                "collecting": weather_service.is_collecting if weather_service else False,
+                "cities_monitored": len(weather_service.cities) if weather_service else None,
                 "recent_records": recent_count,
-                "api_key_configured": bool(weather_service.api_key)
-            }
+                "api_key_configured": bool(weather_service.api_key) if weather_service else None
+            },
+            "history": history.memory_usage() if history is not None else None,
+            "archive": archive.disk_usage() if archive is not None else None,
+            "write_behind": write_queue.get_stats() if write_queue is not None else None,
+            "owm_client": weather_service.client.get_stats() if weather_service else None,
+            "current_conditions": current_conditions.get_stats() if current_conditions is not None else None
         })
         
     except Exception as e:
@@ -4,6 +4,9 @@ from app.models import db
 from app.models.alert import VineyardAlert as AlertModel, AlertTypeEnum, AlertLevelEnum
 from app.services.vineyard_analyzer import VineyardAlert, AlertType, AlertLevel
 
+# Ordem dos níveis (para distinguir agravamentos de outras alterações)
+LEVEL_RANK = {level.value: rank for rank, level in enumerate(AlertLevelEnum)}
+
 class AlertManager:
     """
     Gestor de alertas vitícolas
@@ -12,53 +15,139 @@ class AlertManager:
     pelo sistema de análise meteorológica.
     """
     
-    def __init__(self):
+    def __init__(self, events=None, write_queue=None):
         self.alert_history_days = 30  # Manter histórico por 30 days
+        self._events = events
+        # Fila de escrita diferida (None: commit imediato, ver get_alert_manager)
+        self.write_queue = write_queue
+    
+    @property
+    def events(self):
+        """Canal WebSocket dos eventos de alertas, resolvido no primeiro uso"""
+        if self._events is None:
+            from app import get_alert_websocket
+            self._events = get_alert_websocket()
+        return self._events
+    
+    def register_writes(self, write_queue):
+        """Registar na fila de escrita diferida as operações sobre alertas"""
+        write_queue.register('alert_save', self.apply_save)
+        write_queue.register('alert_acknowledge', self.apply_acknowledge)
+        write_queue.register('alert_deactivate', self.apply_deactivate)
+    
+    def _publish(self, event: str, alert: Dict, previous_level: Optional[str] = None):
+        """Enviar um evento do ciclo de vida do alerta aos clientes WebSocket"""
+        events = self.events
+        if events is not None:
+            events.publish(event, alert, previous_level)
+    
+    def _find_active(self, alert_type: AlertTypeEnum, city_id: int) -> Optional[AlertModel]:
+        return AlertModel.query.filter_by(
+            alert_type=alert_type,
+            city_id=city_id,
+            is_active=True
+        ).first()
     
     def save_alert(self, alert: VineyardAlert) -> AlertModel:
         """
         Guarda um alerta na base de dados
         
+        Com a escrita diferida ativa, o alerta é posto na fila e o modelo
+        devolvido mostra o alerta como ficará gravado (sem id se for
+        novo); o evento WebSocket é enviado depois do commit.
+        
         Args:
             alert: Alerta a guardar
             
         Returns:
             AlertModel: Modelo guardado na BD
         """
+        payload = {
+            "alert_type": alert.alert_type.value,
+            "level": alert.level.value,
+            "message": alert.message,
+            "recommendation": alert.recommendation,
+            "city_id": alert.city_id,
+            "city_name": alert.city_name,
+            "expires_at": alert.expires_at.isoformat() if alert.expires_at else None,
+            "created_at": datetime.utcnow().isoformat()
+        }
+        
+        write_queue = self.write_queue
+        if write_queue is not None:
+            write_queue.enqueue('alert_save', payload)
+            return self._preview(payload)
+        
+        model, after_commit = self._upsert(payload)
+        db.session.commit()
+        after_commit()
+        return model
+    
+    def _preview(self, payload: Dict) -> AlertModel:
+        """Alerta (fora da sessão) tal como ficará depois de gravado"""
+        existing = self._find_active(AlertTypeEnum(payload["alert_type"]), payload["city_id"])
+        return AlertModel(
+            id=existing.id if existing else None,
+            alert_type=AlertTypeEnum(payload["alert_type"]),
+            level=AlertLevelEnum(payload["level"]),
+            message=payload["message"],
+            recommendation=payload["recommendation"],
+            city_id=payload["city_id"],
+            city_name=payload["city_name"],
+            created_at=datetime.fromisoformat(payload["created_at"]),
+            expires_at=datetime.fromisoformat(payload["expires_at"]) if payload["expires_at"] else None,
+            is_active=True,
+            is_acknowledged=existing.is_acknowledged if existing else False,
+            acknowledged_at=existing.acknowledged_at if existing else None
+        )
+    
+    def apply_save(self, payload: Dict, replayed: bool = False):
+        """Aplicar um save_alert na sessão, sem commit (devolve as ações pós-commit)"""
+        return self._upsert(payload)[1]
+    
+    def _upsert(self, payload: Dict):
         # Converter enums
-        alert_type_enum = AlertTypeEnum(alert.alert_type.value)
-        alert_level_enum = AlertLevelEnum(alert.level.value)
+        alert_type_enum = AlertTypeEnum(payload["alert_type"])
+        alert_level_enum = AlertLevelEnum(payload["level"])
+        expires_at = datetime.fromisoformat(payload["expires_at"]) if payload["expires_at"] else None
+        created_at = datetime.fromisoformat(payload["created_at"])
         
         # Verificar se já existe alerta similar ativo
-        existing_alert = AlertModel.query.filter_by(
-            alert_type=alert_type_enum,
-            city_id=alert.city_id,
-            is_active=True
-        ).first()
+        existing_alert = self._find_active(alert_type_enum, payload["city_id"])
         
         if existing_alert:
             # Atualizar alerta existente
+            previous_level = existing_alert.level.value
+            changed = (existing_alert.level != alert_level_enum or
+                       existing_alert.message != payload["message"])
             existing_alert.level = alert_level_enum
-            existing_alert.message = alert.message
-            existing_alert.recommendation = alert.recommendation
-            existing_alert.expires_at = alert.expires_at
-            existing_alert.created_at = datetime.utcnow()
-            db.session.commit()
-            return existing_alert
+            existing_alert.message = payload["message"]
+            existing_alert.recommendation = payload["recommendation"]
+            existing_alert.expires_at = expires_at
+            existing_alert.created_at = created_at
+            data = existing_alert.to_dict()
+            
+            def after_commit():
+                if changed:
+                    event = 'escalated' if LEVEL_RANK[data['level']] > LEVEL_RANK[previous_level] else 'updated'
+                    self._publish(event, data, previous_level)
+            return existing_alert, after_commit
         else:
             # Criar novo alerta
             new_alert = AlertModel(
                 alert_type=alert_type_enum,
                 level=alert_level_enum,
-                message=alert.message,
-                recommendation=alert.recommendation,
-                city_id=alert.city_id,
-                city_name=alert.city_name,
-                expires_at=alert.expires_at
+                message=payload["message"],
+                recommendation=payload["recommendation"],
+                city_id=payload["city_id"],
+                city_name=payload["city_name"],
+                created_at=created_at,
+                expires_at=expires_at
             )
             db.session.add(new_alert)
-            db.session.commit()
-            return new_alert
+            db.session.flush()
+            data = new_alert.to_dict()
+            return new_alert, lambda: self._publish('created', data)
     
     def get_active_alerts(self, city_id: Optional[int] = None) -> List[AlertModel]:
         """
@@ -96,13 +185,22 @@ class AlertManager:
         Returns:
             True se sucesso, False caso contrário
         """
-        alert = AlertModel.query.get(alert_id)
-        if alert:
-            alert.is_acknowledged = True
-            alert.acknowledged_at = datetime.utcnow()
-            db.session.commit()
-            return True
-        return False
+        if not AlertModel.query.get(alert_id):
+            return False
+        return self._write('alert_acknowledge', self.apply_acknowledge, {
+            "alert_id": alert_id,
+            "acknowledged_at": datetime.utcnow().isoformat()
+        })
+    
+    def apply_acknowledge(self, payload: Dict, replayed: bool = False):
+        """Aplicar um acknowledge_alert na sessão, sem commit"""
+        alert = db.session.get(AlertModel, payload["alert_id"])
+        if alert is None:
+            return None
+        alert.is_acknowledged = True
+        alert.acknowledged_at = datetime.fromisoformat(payload["acknowledged_at"])
+        data = alert.to_dict()
+        return lambda: self._publish('acknowledged', data)
     
     def deactivate_alert(self, alert_id: int) -> bool:
         """
@@ -114,12 +212,31 @@ class AlertManager:
         Returns:
             True se sucesso, False caso contrário
         """
-        alert = AlertModel.query.get(alert_id)
-        if alert:
-            alert.is_active = False
-            db.session.commit()
+        if not AlertModel.query.get(alert_id):
+            return False
+        return self._write('alert_deactivate', self.apply_deactivate, {"alert_id": alert_id})
+    
+    def apply_deactivate(self, payload: Dict, replayed: bool = False):
+        """Aplicar um deactivate_alert na sessão, sem commit"""
+        alert = db.session.get(AlertModel, payload["alert_id"])
+        if alert is None:
+            return None
+        alert.is_active = False
+        data = alert.to_dict()
+        return lambda: self._publish('deactivated', data)
+    
+    def _write(self, kind: str, apply, payload: Dict) -> bool:
+        """Pôr a operação na fila de escrita diferida, ou aplicá-la e fazer commit"""
+        write_queue = self.write_queue
+        if write_queue is not None:
+            write_queue.enqueue(kind, payload)
             return True
-        return False
+        
+        after_commit = apply(payload)
+        db.session.commit()
+        if after_commit is not None:
+            after_commit()
+        return True
     
     def cleanup_expired_alerts(self):
         """Remove alertas expirados da base de dados"""
@@ -131,8 +248,10 @@ class AlertManager:
             AlertModel.is_active == True
         ).all()
         
+        expired = []
         for alert in expired_alerts:
             alert.is_active = False
+            expired.append(alert.to_dict())
         
         # Remover alertas antigos do histórico
         old_threshold = now - timedelta(days=self.alert_history_days)
@@ -142,6 +261,9 @@ class AlertManager:
         ).delete()
         
         db.session.commit()
+        
+        for data in expired:
+            self._publish('expired', data)
     
     def get_alert_statistics(self, city_id: Optional[int] = None, 
                            days: int = 7) -> Dict:
@@ -0,0 +1,274 @@
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import create_engine, select
+from app.models import Weather
+
+# Histórico visto pelo analisador (como em /weather/analyze) e dias de previsão
+RECENT_SECONDS = 3 * 86400
+FORECAST_DAYS = 5
+
+# Variáveis do processo de cada worker (ver _init_worker)
+_engine = None
+_rules = None
+
+
+@dataclass
+class Shard:
+    """Intervalo de uma estação avaliado por um worker"""
+    station: str
+    region: Optional[str]
+    start: int
+    end: int
+
+
+@dataclass
+class ShardResult:
+    shard: Shard
+    evaluations: int = 0
+    first_dt: Optional[int] = None
+    last_dt: Optional[int] = None
+    # (tipo, nível) -> avaliações com alerta
+    hits: Counter = field(default_factory=Counter)
+    # Episódios: avaliações consecutivas com o mesmo tipo e nível de alerta
+    episodes: List[Dict] = field(default_factory=list)
+    seconds: float = 0.0
+
+
+def plan_shards(stations: List[Tuple[str, Optional[str]]], start: int, end: int,
+                shard_days: int = 90) -> List[Shard]:
+    """Dividir cada estação em intervalos de shard_days dias"""
+    width = shard_days * 86400
+    return [
+        Shard(station, region, shard_start, min(shard_start + width - 1, end))
+        for station, region in stations
+        for shard_start in range(start, end + 1, width)
+    ]
+
+
+def _init_worker(database_uri: str, rules_path: str):
+    """Ligação à BD e regras compiladas, uma vez por processo"""
+    global _engine, _rules
+    from app.services.rule_engine import RuleEngine
+    _engine = create_engine(database_uri)
+    _rules = RuleEngine(rules_path)
+
+
+def _load(station: str, start: int, end: int) -> Dict[str, np.ndarray]:
+    """Observações da estação entre start e end, por ordem cronológica e sem dt repetidos"""
+    query = (
+        select(Weather.dt, Weather.temp, Weather.humidity, Weather.rain_1h, Weather.wind_speed,
+               Weather.pressure, Weather.weather_main)
+        .where(Weather.name == station, Weather.dt >= start, Weather.dt <= end)
+        .order_by(Weather.dt)
+    )
+    with _engine.connect() as connection:
+        rows = connection.execute(query).all()
+
+    if rows:
+        numeric = np.array([row[:6] for row in rows], dtype=np.float64)
+        condition = np.array([row[6] or '' for row in rows], dtype=object)
+    else:
+        numeric, condition = np.zeros((0, 6)), np.zeros(0, dtype=object)
+    dt = numeric[:, 0].astype(np.int64)
+    unique = np.concatenate([[True], dt[1:] != dt[:-1]]) if len(dt) else np.zeros(0, dtype=bool)
+    return {
+        "dt": dt[unique],
+        "temperature": numeric[unique, 1],
+        "humidity": numeric[unique, 2],
+        "precipitation": np.nan_to_num(numeric[unique, 3], nan=0.0),
+        "wind_speed": numeric[unique, 4],
+        "pressure": numeric[unique, 5],
+        "weather_condition": condition[unique]
+    }
+
+
+def _daily(data: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Agregados diários (UTC) usados como previsão "perfeita"
+
+    Mesmos agregados de ForecastService.get_daily_analyses; a chuva do
+    dia é a média de rain_1h × 24, independente do intervalo de coleta.
+    """
+    day = data["dt"] // 86400
+    starts = np.flatnonzero(np.concatenate([[True], day[1:] != day[:-1]])) if len(day) else np.zeros(0, dtype=np.int64)
+    if len(starts) == 0:
+        return {name: np.zeros(0) for name in ("day", "temperature", "humidity", "precipitation",
+                                               "wind_speed", "pressure", "weather_condition")}
+    counts = np.diff(np.append(starts, len(day)))
+    mean = lambda values: np.add.reduceat(values, starts) / counts
+    return {
+        "day": day[starts],
+        "temperature": mean(data["temperature"]),
+        "humidity": np.round(mean(data["humidity"])),
+        "precipitation": mean(data["precipitation"]) * 24,
+        "wind_speed": np.maximum.reduceat(data["wind_speed"], starts),
+        "pressure": np.round(mean(data["pressure"])),
+        "weather_condition": np.array([
+            Counter(data["weather_condition"][lo:lo + n]).most_common(1)[0][0]
+            for lo, n in zip(starts, counts)
+        ], dtype=object)
+    }
+
+
+def replay_shard(shard: Shard) -> ShardResult:
+    """
+    Reproduzir as observações de um intervalo pelo analisador
+
+    Cada observação é avaliada com os 3 dias anteriores como histórico e
+    os agregados observados dos 5 dias seguintes (a partir do próprio
+    dia) como previsão.
+    """
+    started = time.perf_counter()
+    result = ShardResult(shard=shard)
+    data = _load(shard.station, shard.start - RECENT_SECONDS, shard.end + FORECAST_DAYS * 86400)
+    daily = _daily(data)
+    dt = data["dt"]
+
+    first = int(np.searchsorted(dt, shard.start, side='left'))
+    last = int(np.searchsorted(dt, shard.end, side='right'))
+    recent_starts = np.searchsorted(dt, dt - RECENT_SECONDS, side='left')
+    day_index = np.searchsorted(daily["day"], dt // 86400, side='left')
+    names = [name for name in data if name != "dt"]
+
+    open_episodes: Dict[Tuple[str, str], Dict] = {}
+    for i in range(first, last):
+        current = {name: data[name][i].item() if name != "weather_condition" else data[name][i] for name in names}
+        for name in ("humidity", "pressure"):
+            if current[name] == current[name]:  # NaN: mantém o float
+                current[name] = int(current[name])
+        recent = SimpleNamespace(**{name: data[name][recent_starts[i]:i + 1] for name in names})
+        day = daily["day"][day_index[i]]
+        forecast_end = int(np.searchsorted(daily["day"], day + FORECAST_DAYS, side='left'))
+        forecast = SimpleNamespace(**{name: daily[name][day_index[i]:forecast_end] for name in names})
+
+        alerts = _rules.evaluate_columns(current, recent, forecast, region=shard.region)
+        result.evaluations += 1
+        observed_at = int(dt[i])
+        active = set()
+        for alert in alerts:
+            key = (alert.alert_type.value, alert.level.value)
+            active.add(key)
+            result.hits[key] += 1
+            episode = open_episodes.get(key)
+            if episode is None:
+                open_episodes[key] = {
+                    "station": shard.station,
+                    "region": shard.region,
+                    "type": key[0],
+                    "level": key[1],
+                    "start": observed_at,
+                    "end": observed_at,
+                    "evaluations": 1,
+                    "message": alert.message
+                }
+            else:
+                episode["end"] = observed_at
+                episode["evaluations"] += 1
+
+        # Episódios que não continuaram nesta observação
+        for key in [key for key in open_episodes if key not in active]:
+            result.episodes.append(open_episodes.pop(key))
+
+    result.episodes.extend(open_episodes.values())
+    if last > first:
+        result.first_dt, result.last_dt = int(dt[first]), int(dt[last - 1])
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def merge_episodes(results: List[ShardResult]) -> List[Dict]:
+    """
+    Juntar os episódios cortados na fronteira entre intervalos
+
+    Um episódio que termina na última observação de um intervalo continua
+    no seguinte se aí começar na primeira observação.
+    """
+    merged = []
+    by_station: Dict[str, List[ShardResult]] = {}
+    for result in results:
+        by_station.setdefault(result.shard.station, []).append(result)
+
+    for station_results in by_station.values():
+        station_results.sort(key=lambda result: result.shard.start)
+        carried: Dict[Tuple[str, str], Dict] = {}
+        for result in station_results:
+            if result.first_dt is None:
+                merged.extend(carried.values())
+                carried = {}
+                continue
+            next_carried = {}
+            for episode in sorted(result.episodes, key=lambda episode: episode["start"]):
+                key = (episode["type"], episode["level"])
+                previous = carried.pop(key, None) if episode["start"] == result.first_dt else None
+                if previous is not None:
+                    previous["end"] = episode["end"]
+                    previous["evaluations"] += episode["evaluations"]
+                    episode = previous
+                if episode["end"] == result.last_dt:
+                    next_carried[key] = episode
+                else:
+                    merged.append(episode)
+            # Episódios que não continuaram no intervalo seguinte
+            merged.extend(carried.values())
+            carried = next_carried
+        merged.extend(carried.values())
+
+    return sorted(merged, key=lambda episode: (episode["station"], episode["start"], episode["type"]))
+
+
+def run_backtest(database_uri: str, rules_path: str, stations: List[Tuple[str, Optional[str]]],
+                 start: int, end: int, output_path: str, workers: Optional[int] = None,
+                 shard_days: int = 90) -> Dict:
+    """
+    Reproduzir o histórico de várias estações em paralelo
+
+    Os intervalos (estação × shard_days) são distribuídos por um pool de
+    processos; cada worker lê as suas observações da BD e avalia-as com
+    as regras compiladas. Os episódios de alerta são escritos em JSON
+    Lines em output_path.
+
+    Returns:
+        Dict: Resumo (avaliações, acertos por tipo e nível, episódios, duração)
+    """
+    started = time.perf_counter()
+    shards = plan_shards(stations, start, end, shard_days)
+    workers = workers or os.cpu_count() or 1
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(database_uri, rules_path)) as pool:
+        futures = [pool.submit(replay_shard, shard) for shard in shards]
+        for future in as_completed(futures):
+            results.append(future.result())
+
+    episodes = merge_episodes(results)
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for episode in episodes:
+            f.write(json.dumps(episode, ensure_ascii=False) + '\n')
+
+    hits = Counter()
+    for result in results:
+        hits.update(result.hits)
+    episode_counts = Counter((episode["type"], episode["level"]) for episode in episodes)
+
+    return {
+        "stations": len(stations),
+        "shards": len(shards),
+        "workers": workers,
+        "evaluations": sum(result.evaluations for result in results),
+        "hits": {f"{alert_type}/{level}": count for (alert_type, level), count in sorted(hits.items())},
+        "episodes": {f"{alert_type}/{level}": count for (alert_type, level), count in sorted(episode_counts.items())},
+        "worker_seconds": round(sum(result.seconds for result in results), 2),
+        "seconds": round(time.perf_counter() - started, 2),
+        "output": output_path
+    }
@@ -0,0 +1,143 @@
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from app import metrics
+from app.models.routing import read_replica
+
+
+class StaleDataError(Exception):
+    """Sem snapshot dentro da idade máxima e a BD não respondeu"""
+
+
+class CurrentConditionsCache:
+    """
+    Snapshot das condições atuais com stale-while-revalidate
+
+    Guarda o último resultado bom do loader (observações das últimas 24
+    horas de todas as estações). Até fresh_seconds depois de carregado é
+    servido diretamente; depois disso continua a ser servido de imediato,
+    marcado como desatualizado, enquanto um único refresh corre em
+    background. Só quando o snapshot tem mais de max_stale_seconds (ou
+    não existe) o pedido espera pela BD e, se esta falhar, recebe
+    StaleDataError.
+
+    Cada observação gravada marca o snapshot como desatualizado
+    (invalidate), para aparecer no pedido seguinte sem esperar pelo TTL.
+    """
+
+    def __init__(self, loader: Callable[[], List[Dict]], app=None, fresh_seconds: float = 30.0,
+                 max_stale_seconds: float = 3600.0, retry_seconds: float = 5.0):
+        self.loader = loader
+        self.app = app
+        self.fresh_seconds = fresh_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.retry_seconds = retry_seconds
+
+        self._data: Optional[List[Dict]] = None
+        self._loaded_at = 0.0
+        self._fresh_until = 0.0
+        self._refreshing = False
+        self._next_refresh = 0.0
+        self._last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def _load(self):
+        """Carregar um novo snapshot (levanta a exceção do loader)"""
+        started = time.time()
+        try:
+            data = self.loader()
+        except Exception as e:
+            with self._lock:
+                self._last_error = str(e)
+                self._next_refresh = time.monotonic() + self.retry_seconds
+            metrics.CURRENT_REFRESHES.inc(result='error')
+            raise
+        with self._lock:
+            self._data = data
+            self._loaded_at = started
+            self._fresh_until = time.monotonic() + self.fresh_seconds
+            self._last_error = None
+        metrics.CURRENT_REFRESHES.inc(result='ok')
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing or time.monotonic() < self._next_refresh:
+                return
+            self._refreshing = True
+
+        def refresh():
+            try:
+                with self.app.app_context(), read_replica():
+                    self._load()
+            except Exception as e:
+                print(f"Erro ao atualizar condições atuais: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def get(self, city_name: Optional[str] = None) -> Dict:
+        """
+        Condições atuais, com a idade de cada observação
+
+        Args:
+            city_name (str, optional): Nome da cidade específica
+
+        Returns:
+            Dict: 'data' (observações, mais recentes primeiro, cada uma com
+            age_seconds), 'loaded_at', 'age_seconds' (do snapshot) e 'stale'
+
+        Raises:
+            StaleDataError: Snapshot inexistente ou mais antigo que
+                max_stale_seconds e a BD não respondeu
+        """
+        if self._data is not None and time.monotonic() < self._fresh_until:
+            metrics.CURRENT_LOOKUPS.inc(result='fresh')
+        elif self._data is not None and time.time() - self._loaded_at <= self.max_stale_seconds:
+            metrics.CURRENT_LOOKUPS.inc(result='stale')
+            if self.app is not None:
+                self._refresh_in_background()
+        else:
+            # Sem snapshot utilizável: um pedido carrega, os outros esperam por ele
+            with self._load_lock:
+                if self._data is None or time.time() - self._loaded_at > self.max_stale_seconds:
+                    metrics.CURRENT_LOOKUPS.inc(result='miss')
+                    try:
+                        # Depois de uma falha, não voltar à BD antes de retry_seconds
+                        if time.monotonic() < self._next_refresh:
+                            raise RuntimeError(self._last_error)
+                        self._load()
+                    except Exception as e:
+                        metrics.CURRENT_LOOKUPS.inc(result='error')
+                        age = f"{time.time() - self._loaded_at:.0f}s" if self._data is not None else "nenhum"
+                        raise StaleDataError(f"Condições atuais indisponíveis (último snapshot: {age}): {e}")
+
+        with self._lock:
+            data, loaded_at, fresh = self._data, self._loaded_at, time.monotonic() < self._fresh_until
+
+        now = time.time()
+        if city_name:
+            data = [record for record in data if record["name"] == city_name]
+        return {
+            "data": [{**record, "age_seconds": round(now - record["dt"], 1)} for record in data],
+            "loaded_at": datetime.utcfromtimestamp(loaded_at).isoformat(),
+            "age_seconds": round(now - loaded_at, 1),
+            "stale": not fresh
+        }
+
+    def invalidate(self):
+        """Marcar o snapshot como desatualizado (chamado depois de cada observação gravada)"""
+        self._fresh_until = 0.0
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "loaded": self._data is not None,
+                "age_seconds": round(time.time() - self._loaded_at, 1) if self._data is not None else None,
+                "stale": time.monotonic() >= self._fresh_until,
+                "refreshing": self._refreshing,
+                "last_error": self._last_error
+            }
@@ -0,0 +1,80 @@
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+from app import metrics
+from app.services.alert_manager import AlertManager
+
+
+class DashboardService:
+    """
+    Serviço que agrega os dados do dashboard num único snapshot
+
+    O snapshot (estado, cidades, dados atuais e alertas ativos) é guardado
+    em cache durante um TTL curto e reconstruído no máximo uma vez por TTL,
+    independentemente do número de clientes em simultâneo.
+    """
+
+    def __init__(self, weather_service, history_store, ttl_seconds: float = 5):
+        self.weather_service = weather_service
+        self.history_store = history_store
+        self.alert_manager = AlertManager()
+        self.ttl_seconds = ttl_seconds
+
+        self._snapshot: Optional[Dict] = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def get_snapshot(self) -> Dict:
+        """
+        Obter o snapshot do dashboard, reconstruindo-o se expirou
+
+        Returns:
+            Dict: Snapshot com as secções status, cities, current (última
+            observação de cada estação) e alerts
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() < self._expires_at:
+            return snapshot
+
+        # Apenas um pedido reconstrói; os restantes aguardam e reutilizam o resultado
+        with self._lock:
+            if self._snapshot is None or time.monotonic() >= self._expires_at:
+                self._snapshot = self._build_snapshot()
+                self._expires_at = time.monotonic() + self.ttl_seconds
+            return self._snapshot
+
+    def invalidate(self):
+        """Forçar a reconstrução do snapshot no próximo pedido"""
+        self._expires_at = 0.0
+
+    def _build_snapshot(self) -> Dict:
+        """Construir o snapshot a partir do histórico em memória"""
+        now = datetime.utcnow()
+        # Última observação de cada estação
+        current_data = self.history_store.latest_records()
+        alerts = self.alert_manager.get_active_alerts()
+
+        # Registos da última hora a partir das métricas (sem consultar a tabela)
+        recent_count = metrics.recent_weather_rows.total()
+
+        return {
+            "status": {
+                "collecting": self.weather_service.is_collecting,
+                "cities_monitored": len(self.weather_service.cities),
+                "recent_records": recent_count,
+                "api_key_configured": bool(self.weather_service.api_key)
+            },
+            "cities": [
+                {
+                    "name": city["name"],
+                    "region": city["region"],
+                    "lat": city["lat"],
+                    "lon": city["lon"]
+                }
+                for city in self.weather_service.cities
+            ],
+            "current": current_data,
+            "alerts": [alert.to_dict() for alert in alerts],
+            "generated_at": now.isoformat()
+        }
@@ -0,0 +1,325 @@
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import numpy as np
+import requests
+from app import metrics
+from app.models import db
+from app.models.forecast import Forecast
+from app.services.vineyard_analyzer import WeatherAnalysis
+
+# Um passo da previsão empacotado (29 bytes; 40 passos ≈ 1,2 KB por emissão)
+FORECAST_DTYPE = np.dtype([
+    ('dt', '<i8'),
+    ('temp', '<f4'),
+    ('humidity', 'u1'),
+    ('pressure', '<u2'),
+    ('wind_speed', '<f4'),
+    ('rain_3h', '<f4'),
+    ('pop', '<f4'),
+    ('weather_id', '<u2')
+])
+
+# Grupo 7xx da OpenWeatherMap (atmosfera) por código
+ATMOSPHERE = {701: 'Mist', 711: 'Smoke', 721: 'Haze', 731: 'Dust', 741: 'Fog', 751: 'Sand',
+              761: 'Dust', 762: 'Ash', 771: 'Squall', 781: 'Tornado'}
+
+
+def weather_main(weather_id: int) -> str:
+    """Campo 'main' da OpenWeatherMap a partir do código da condição"""
+    if weather_id == 800:
+        return 'Clear'
+    group = weather_id // 100
+    if group == 8:
+        return 'Clouds'
+    if group == 7:
+        return ATMOSPHERE.get(weather_id, 'Mist')
+    return {2: 'Thunderstorm', 3: 'Drizzle', 5: 'Rain', 6: 'Snow'}.get(group, 'Clear')
+
+
+def pack_forecast(items: List[Dict]) -> np.ndarray:
+    """Converter a lista da API (/forecast) num array FORECAST_DTYPE"""
+    steps = np.zeros(len(items), dtype=FORECAST_DTYPE)
+    for i, item in enumerate(items):
+        steps[i] = (
+            item['dt'],
+            item['main']['temp'],
+            item['main']['humidity'],
+            item['main']['pressure'],
+            item.get('wind', {}).get('speed', 0.0),
+            (item.get('rain') or {}).get('3h', 0.0),
+            item.get('pop', 0.0),
+            item['weather'][0]['id']
+        )
+    return steps
+
+
+def unpack_forecast(payload: bytes) -> np.ndarray:
+    return np.frombuffer(payload, dtype=FORECAST_DTYPE)
+
+
+class ForecastService:
+    """
+    Serviço de previsões meteorológicas (endpoint 5 dias / 3 horas)
+
+    As previsões ficam em cache em memória e na tabela `forecasts` e só
+    são pedidas à API quando a última emissão da estação tem mais de
+    refresh_minutes. Pedidos concorrentes para a mesma estação esperam
+    pelo mesmo fetch (uma chamada por janela, independentemente do número
+    de análises). Depois de um fetch falhado a estação não volta à BD nem
+    à API durante retry_minutes: é servida a última emissão conhecida
+    (ou None).
+
+    Os pedidos HTTP usam get_cached, que nunca chama a API: serve a
+    última emissão (ou None) e, se estiver expirada, pede-a numa thread
+    em background; a coleta periódica usa get_forecast (refresh_stale).
+    """
+
+    def __init__(self, weather_service, refresh_minutes: int = 180, retry_minutes: float = 5):
+        self.weather_service = weather_service
+        self.refresh_seconds = refresh_minutes * 60
+        self.retry_seconds = retry_minutes * 60
+        self.forecast_url = f"{weather_service.api_root}/forecast"
+        self._cache: Dict[str, Dict] = {}
+        # Estação -> instante (monotonic) a partir do qual se tenta de novo a API
+        self._retry_after: Dict[str, float] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        # Estações com um fetch em background a decorrer
+        self._refreshing = set()
+
+    def _station_lock(self, name: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def _is_fresh(self, entry: Optional[Dict]) -> bool:
+        if entry is None:
+            return False
+        age = (datetime.utcnow() - entry['issued_at']).total_seconds()
+        return age < self.refresh_seconds
+
+    def _retry_pending(self, name: str) -> bool:
+        """True se o último fetch da estação falhou há menos de retry_seconds"""
+        return time.monotonic() < self._retry_after.get(name, 0.0)
+
+    def get_forecast(self, city: Dict) -> Optional[Dict]:
+        """
+        Obter a previsão em vigor para uma estação
+
+        Args:
+            city (Dict): Estação do registo (name, lat, lon)
+
+        Returns:
+            Optional[Dict]: {'issued_at', 'steps' (array FORECAST_DTYPE)} ou None
+        """
+        name = city['name']
+        entry = self._cache.get(name)
+        if self._is_fresh(entry):
+            metrics.FORECAST_LOOKUPS.inc(source='memory')
+            return entry
+        if self._retry_pending(name):
+            metrics.FORECAST_LOOKUPS.inc(source='stale')
+            return entry
+
+        with self._station_lock(name):
+            # Outro pedido pode ter atualizado a previsão enquanto esperávamos
+            entry = self._cache.get(name)
+            if self._is_fresh(entry):
+                metrics.FORECAST_LOOKUPS.inc(source='memory')
+                return entry
+            if self._retry_pending(name):
+                metrics.FORECAST_LOOKUPS.inc(source='stale')
+                return entry
+
+            entry = self._load_latest(name)
+            if self._is_fresh(entry):
+                metrics.FORECAST_LOOKUPS.inc(source='database')
+            else:
+                fetched = self._fetch_and_store(city)
+                if fetched is not None:
+                    metrics.FORECAST_LOOKUPS.inc(source='api')
+                    self._retry_after.pop(name, None)
+                    entry = fetched
+                else:
+                    # Sem resposta da API: usar a última emissão disponível
+                    # e não repetir o pedido antes de retry_seconds
+                    self._retry_after[name] = time.monotonic() + self.retry_seconds
+                    if entry is not None:
+                        metrics.FORECAST_LOOKUPS.inc(source='stale')
+
+            if entry is not None:
+                self._cache[name] = entry
+            return entry
+
+    def get_cached(self, city: Dict) -> Optional[Dict]:
+        """
+        Última emissão conhecida, sem esperar pela API
+
+        Se não estiver em memória é lida da base de dados. Se estiver
+        expirada (ou não existir) é pedida em background.
+
+        Args:
+            city (Dict): Estação do registo (name, lat, lon)
+
+        Returns:
+            Optional[Dict]: {'issued_at', 'steps' (array FORECAST_DTYPE)} ou None
+        """
+        name = city['name']
+        entry = self._cache.get(name)
+        source = 'memory'
+        if entry is None and not self._retry_pending(name):
+            entry = self._load_latest(name)
+            source = 'database'
+            if entry is not None:
+                self._cache.setdefault(name, entry)
+
+        if self._is_fresh(entry):
+            metrics.FORECAST_LOOKUPS.inc(source=source)
+            return entry
+
+        if entry is not None:
+            metrics.FORECAST_LOOKUPS.inc(source='stale')
+        if not self._retry_pending(name):
+            self._refresh_in_background(city)
+        return entry
+
+    def _refresh_in_background(self, city: Dict):
+        """Pedir a previsão de uma estação numa thread (uma de cada vez por estação)"""
+        app = self.weather_service.app
+        if app is None:
+            return
+        name = city['name']
+        with self._locks_guard:
+            if name in self._refreshing:
+                return
+            self._refreshing.add(name)
+
+        def refresh():
+            try:
+                with app.app_context():
+                    self.get_forecast(city)
+            except Exception as e:
+                print(f"Erro ao atualizar previsão de {name}: {e}")
+            finally:
+                with self._locks_guard:
+                    self._refreshing.discard(name)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def refresh_stale(self, cities: List[Dict]) -> int:
+        """
+        Atualizar as previsões expiradas (chamado pela coleta periódica)
+
+        Returns:
+            int: Número de estações com previsão disponível
+        """
+        return sum(1 for city in cities if self.get_forecast(city) is not None)
+
+    def get_daily_analyses(self, city: Dict, days: int = 5) -> List[WeatherAnalysis]:
+        """
+        Previsão agregada por dia para o VineyardAnalyzer
+
+        Temperatura e humidade médias, vento máximo, chuva acumulada e a
+        condição mais frequente de cada dia (UTC), a partir de agora.
+        Usa get_cached: não espera pela API.
+        """
+        entry = self.get_cached(city)
+        if entry is None:
+            return []
+
+        steps = entry['steps']
+        steps = steps[steps['dt'] >= int(time.time()) - 3 * 3600]
+        if len(steps) == 0:
+            return []
+
+        day_index = steps['dt'] // 86400
+        analyses = []
+        for day in np.unique(day_index)[:days]:
+            day_steps = steps[day_index == day]
+            condition = Counter(weather_main(int(code)) for code in day_steps['weather_id']).most_common(1)[0][0]
+            analyses.append(WeatherAnalysis(
+                temperature=round(float(day_steps['temp'].mean()), 2),
+                humidity=int(round(float(day_steps['humidity'].mean()))),
+                precipitation=round(float(day_steps['rain_3h'].sum()), 2),
+                wind_speed=round(float(day_steps['wind_speed'].max()), 2),
+                weather_condition=condition,
+                pressure=int(round(float(day_steps['pressure'].mean()))),
+                timestamp=datetime.utcfromtimestamp(int(day) * 86400)
+            ))
+        return analyses
+
+    def _load_latest(self, name: str) -> Optional[Dict]:
+        """Última emissão guardada na base de dados"""
+        row = Forecast.query.filter_by(station_name=name).order_by(Forecast.issued_at.desc()).first()
+        if row is None:
+            return None
+        return {'issued_at': row.issued_at, 'steps': unpack_forecast(row.payload)}
+
+    def _fetch_and_store(self, city: Dict) -> Optional[Dict]:
+        """Pedir a previsão à API e guardar uma nova emissão"""
+        started = time.perf_counter()
+        try:
+            params = {
+                'lat': city['lat'],
+                'lon': city['lon'],
+                'appid': self.weather_service.api_key,
+                'units': 'metric',  # Celsius
+                'lang': 'pt'
+            }
+
+            response = self.weather_service.client.get(self.forecast_url, params, endpoint='forecast')
+
+            steps = pack_forecast(response.json().get('list', []))
+            if len(steps) == 0:
+                return None
+
+        except requests.exceptions.RequestException as e:
+            print(f"Erro ao buscar previsão para {city['name']}: {e}")
+            metrics.OWM_FETCH_ERRORS.inc(station=city['name'], reason=type(e).__name__)
+            return None
+        except Exception as e:
+            print(f"Erro inesperado na previsão para {city['name']}: {e}")
+            metrics.OWM_FETCH_ERRORS.inc(station=city['name'], reason='unexpected')
+            return None
+        finally:
+            metrics.OWM_FETCH_SECONDS.observe(time.perf_counter() - started, station='forecast')
+
+        issued_at = datetime.utcnow().replace(microsecond=0)
+        try:
+            db.session.add(Forecast(
+                station_name=city['name'],
+                issued_at=issued_at,
+                first_dt=int(steps['dt'][0]),
+                last_dt=int(steps['dt'][-1]),
+                steps=len(steps),
+                payload=steps.tobytes()
+            ))
+            db.session.commit()
+        except Exception as e:
+            print(f"Erro ao guardar previsão na BD: {e}")
+            db.session.rollback()
+
+        return {'issued_at': issued_at, 'steps': steps}
+
+    @staticmethod
+    def to_dict(entry: Dict) -> Dict:
+        """Previsão em JSON (passos de 3 horas)"""
+        steps = entry['steps']
+        return {
+            "issued_at": entry['issued_at'].isoformat(),
+            "steps": [
+                {
+                    "dt": int(step['dt']),
+                    "temp": round(float(step['temp']), 2),
+                    "humidity": int(step['humidity']),
+                    "pressure": int(step['pressure']),
+                    "wind_speed": round(float(step['wind_speed']), 2),
+                    "rain_3h": round(float(step['rain_3h']), 2),
+                    "pop": round(float(step['pop']), 2),
+                    "weather_main": weather_main(int(step['weather_id']))
+                }
+                for step in steps
+            ]
+        }
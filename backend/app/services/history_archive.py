@@ -0,0 +1,320 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from urllib.parse import quote, unquote
+import numpy as np
+from app.models import db, Weather
+from app.services.series import SERIES_METRICS, ZERO_WHEN_MISSING
+
+try:
+    import fcntl
+except ImportError:  # Windows: só o lock entre threads
+    fcntl = None
+
+# Campos de Weather.to_dict() guardados no arquivo (um ficheiro float32 por métrica)
+ARCHIVE_FIELDS = {
+    "temp": lambda record: record["main"]["temp"],
+    "feels_like": lambda record: record["main"]["feels_like"],
+    "humidity": lambda record: record["main"]["humidity"],
+    "pressure": lambda record: record["main"]["pressure"],
+    "wind_speed": lambda record: (record.get("wind") or {}).get("speed"),
+    "rain_1h": lambda record: (record.get("rain") or {}).get("1h"),
+    "clouds": lambda record: (record.get("clouds") or {}).get("all")
+}
+
+TIME_FILE = "dt.i64"
+LOCK_FILE = ".lock"
+TIME_DTYPE = np.dtype('<i8')
+METRIC_DTYPE = np.dtype('<f4')
+
+
+class HistoryArchive:
+    """
+    Arquivo colunar em disco do histórico completo das estações
+
+    Cada estação tem um diretório com um ficheiro por coluna, só com
+    acrescentos: dt.i64 (timestamps Unix, crescentes, que servem de
+    índice) e <métrica>.f32. As leituras são vistas np.memmap dos
+    ficheiros, pelo que um intervalo de anos de uma estação é um slice
+    sem cópia, encontrado por pesquisa binária em dt.
+
+    Os ficheiros das métricas são escritos antes de dt.i64; o número de
+    linhas válidas é sempre o de dt.i64 e linhas a mais (escrita
+    interrompida) são descartadas ao abrir a estação. Escritas e
+    reparações de uma estação correm com flock no ficheiro .lock do seu
+    diretório, pelo que o processo da coleta e `flask archive-sync`
+    podem escrever ao mesmo tempo.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._repaired = set()
+        # Vistas abertas por estação, reabertas quando o ficheiro cresce
+        self._views: Dict[str, Dict] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _station_dir(self, station: str) -> str:
+        return os.path.join(self.directory, quote(station, safe=''))
+
+    def _station_lock(self, station: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(station, threading.Lock())
+
+    @contextmanager
+    def _locked(self, station: str):
+        """Lock exclusivo da estação entre threads e entre processos"""
+        with self._station_lock(station):
+            directory = self._station_dir(station)
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, LOCK_FILE), 'a+b') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def stations(self) -> List[str]:
+        """Estações com dados no arquivo"""
+        return sorted(unquote(name) for name in os.listdir(self.directory)
+                      if os.path.isfile(os.path.join(self.directory, name, TIME_FILE)))
+
+    def _rows(self, path: str, dtype: np.dtype) -> int:
+        return os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0
+
+    def _repair(self, station: str):
+        """
+        Alinhar os ficheiros das métricas com dt.i64 (chamado com _locked)
+
+        Corre antes de cada escrita, porque outro processo pode ter
+        deixado uma escrita interrompida desde a última verificação.
+        """
+        directory = self._station_dir(station)
+        rows = self._rows(os.path.join(directory, TIME_FILE), TIME_DTYPE)
+
+        for metric in ARCHIVE_FIELDS:
+            path = os.path.join(directory, f"{metric}.f32")
+            existing = self._rows(path, METRIC_DTYPE)
+            if existing > rows:
+                with open(path, 'r+b') as f:
+                    f.truncate(rows * METRIC_DTYPE.itemsize)
+            elif existing < rows:
+                # Métrica acrescentada depois: linhas antigas sem valor
+                with open(path, 'ab') as f:
+                    f.write(np.full(rows - existing, np.nan, dtype=METRIC_DTYPE).tobytes())
+        self._repaired.add(station)
+
+    def last_dt(self, station: str) -> Optional[int]:
+        """Último timestamp arquivado da estação"""
+        path = os.path.join(self._station_dir(station), TIME_FILE)
+        rows = self._rows(path, TIME_DTYPE)
+        if rows == 0:
+            return None
+        with open(path, 'rb') as f:
+            f.seek((rows - 1) * TIME_DTYPE.itemsize)
+            return int(np.frombuffer(f.read(TIME_DTYPE.itemsize), dtype=TIME_DTYPE)[0])
+
+    def append_rows(self, station: str, dt: np.ndarray, values: Dict[str, np.ndarray]) -> int:
+        """
+        Acrescentar linhas a uma estação
+
+        Linhas com dt não posterior ao último arquivado são ignoradas.
+
+        Args:
+            station (str): Nome da estação
+            dt (np.ndarray): Timestamps Unix crescentes
+            values (Dict[str, np.ndarray]): Valores por métrica (em falta: NaN)
+
+        Returns:
+            int: Número de linhas acrescentadas
+        """
+        with self._locked(station):
+            self._repair(station)
+            dt = np.asarray(dt, dtype=TIME_DTYPE)
+            last = self.last_dt(station)
+            keep = np.ones(len(dt), dtype=bool) if last is None else dt > last
+            if not keep.any():
+                return 0
+
+            directory = self._station_dir(station)
+            for metric in ARCHIVE_FIELDS:
+                column = values.get(metric)
+                column = (np.full(len(dt), np.nan) if column is None
+                          else np.asarray(column, dtype=np.float64))
+                with open(os.path.join(directory, f"{metric}.f32"), 'ab') as f:
+                    f.write(column[keep].astype(METRIC_DTYPE).tobytes())
+
+            # dt por último: só aqui as novas linhas passam a ser visíveis
+            with open(os.path.join(directory, TIME_FILE), 'ab') as f:
+                f.write(dt[keep].tobytes())
+            return int(keep.sum())
+
+    def append(self, record: Dict) -> bool:
+        """
+        Acrescentar uma observação gravada (chamado pelo WeatherService)
+
+        Args:
+            record (Dict): Registo no formato Weather.to_dict()
+        """
+        values = {}
+        for metric, extract in ARCHIVE_FIELDS.items():
+            value = extract(record)
+            values[metric] = [np.nan if value is None else value]
+        return self.append_rows(record["name"], [record["dt"]], values) > 0
+
+    def sync_from_db(self, stations: Optional[List[str]] = None, chunk_size: int = 50000) -> Dict[str, int]:
+        """
+        Acrescentar as linhas da tabela weather_data ainda não arquivadas
+
+        Por estação, lê apenas as linhas com dt posterior ao último
+        arquivado, em blocos de chunk_size (só as colunas necessárias).
+
+        Returns:
+            Dict[str, int]: Linhas acrescentadas por estação
+        """
+        if stations is None:
+            stations = [row[0] for row in db.session.execute(db.select(Weather.name).distinct())]
+
+        metrics = list(ARCHIVE_FIELDS)
+        columns = [SERIES_METRICS[metric] for metric in metrics]
+        added = {}
+        for station in stations:
+            added[station] = 0
+            while True:
+                last = self.last_dt(station)
+                query = db.select(Weather.dt, *columns).where(Weather.name == station)
+                if last is not None:
+                    query = query.where(Weather.dt > last)
+                rows = db.session.execute(query.order_by(Weather.dt).limit(chunk_size)).all()
+                if not rows:
+                    break
+
+                data = np.array(rows, dtype=np.float64).reshape(-1, len(metrics) + 1)
+                # Linhas repetidas (mesmo dt) ficam só uma vez
+                dt = data[:, 0].astype(np.int64)
+                unique = np.concatenate([[True], dt[1:] != dt[:-1]])
+                added[station] += self.append_rows(
+                    station, dt[unique],
+                    {metric: data[unique, index] for index, metric in enumerate(metrics, start=1)}
+                )
+                if len(rows) < chunk_size:
+                    break
+        return added
+
+    def _open(self, station: str) -> Optional[Dict[str, np.ndarray]]:
+        """Vistas memmap das colunas da estação (None se não houver dados)"""
+        directory = self._station_dir(station)
+        rows = self._rows(os.path.join(directory, TIME_FILE), TIME_DTYPE)
+        if rows == 0:
+            return None
+
+        views = self._views.get(station)
+        if views is not None and len(views["dt"]) == rows:
+            return views
+
+        if station not in self._repaired:
+            with self._locked(station):
+                self._repair(station)
+        views = {"dt": np.memmap(os.path.join(directory, TIME_FILE), dtype=TIME_DTYPE, mode='r', shape=(rows,))}
+        for metric in ARCHIVE_FIELDS:
+            views[metric] = np.memmap(os.path.join(directory, f"{metric}.f32"),
+                                      dtype=METRIC_DTYPE, mode='r', shape=(rows,))
+        self._views[station] = views
+        return views
+
+    def first_dt(self, station: str) -> Optional[int]:
+        views = self._open(station)
+        return int(views["dt"][0]) if views is not None else None
+
+    def covers(self, station: str, start: int) -> bool:
+        """True se o arquivo da estação começa antes de `start`"""
+        first = self.first_dt(station)
+        return first is not None and first <= start
+
+    def window(self, station: str, start: int, end: int) -> Dict[str, np.ndarray]:
+        """
+        Colunas da estação entre start e end (inclusivos), sem cópia
+
+        Returns:
+            Dict[str, np.ndarray]: Vistas só de leitura ('dt' e uma por métrica)
+        """
+        views = self._open(station)
+        if views is None:
+            empty = {metric: np.zeros(0, dtype=METRIC_DTYPE) for metric in ARCHIVE_FIELDS}
+            return {"dt": np.zeros(0, dtype=TIME_DTYPE), **empty}
+        lo = int(np.searchsorted(views["dt"], start, side='left'))
+        hi = int(np.searchsorted(views["dt"], end, side='right'))
+        return {name: view[lo:hi] for name, view in views.items()}
+
+    def series(self, stations: List[str], metrics: List[str], start: int,
+               end: int) -> Optional[Dict[str, Dict[str, np.ndarray]]]:
+        """
+        Mesmo formato que load_series (app/services/series.py)
+
+        Returns:
+            Optional[Dict]: Séries por estação, ou None se o arquivo não
+            tem as métricas ou não cobre o início do intervalo
+        """
+        if not all(metric in ARCHIVE_FIELDS for metric in metrics):
+            return None
+        if not all(self.covers(station, start) for station in stations):
+            return None
+
+        series = {}
+        for station in stations:
+            window = self.window(station, start, end)
+            series[station] = {"t": window["dt"]}
+            for metric in metrics:
+                values = window[metric].astype(np.float64)
+                if metric in ZERO_WHEN_MISSING:
+                    values = np.nan_to_num(values, nan=0.0)
+                series[station][metric] = values
+        return series
+
+    def daily_temperatures(self, station: str, start: int, end: int) -> Dict[str, np.ndarray]:
+        """
+        Mínima, máxima e média diárias (UTC) da temperatura
+
+        Returns:
+            Dict[str, np.ndarray]: 'day' (timestamp das 00:00), 'min', 'max', 'mean'
+        """
+        window = self.window(station, start, end)
+        valid = ~np.isnan(window["temp"])
+        dt, temp = window["dt"][valid], window["temp"][valid].astype(np.float64)
+        if len(dt) == 0:
+            return {"day": np.zeros(0, dtype=np.int64), "min": np.zeros(0), "max": np.zeros(0), "mean": np.zeros(0)}
+
+        day = dt // 86400
+        # Início de cada dia no array ordenado
+        starts = np.flatnonzero(np.concatenate([[True], day[1:] != day[:-1]]))
+        counts = np.diff(np.append(starts, len(dt)))
+        return {
+            "day": day[starts] * 86400,
+            "min": np.minimum.reduceat(temp, starts),
+            "max": np.maximum.reduceat(temp, starts),
+            "mean": np.add.reduceat(temp, starts) / counts
+        }
+
+    def growing_degree_days(self, station: str, start: int, end: int, base: float = 10.0) -> Dict[str, np.ndarray]:
+        """
+        Graus-dia de crescimento: max(0, (mín + máx) / 2 - base) por dia
+
+        Returns:
+            Dict[str, np.ndarray]: 'day', 'gdd' e 'cumulative'
+        """
+        daily = self.daily_temperatures(station, start, end)
+        gdd = np.maximum((daily["min"] + daily["max"]) / 2 - base, 0.0)
+        return {"day": daily["day"], "gdd": gdd, "cumulative": np.cumsum(gdd)}
+
+    def disk_usage(self) -> Dict:
+        """Estações e bytes ocupados no disco"""
+        stations = self.stations()
+        total = 0
+        for station in stations:
+            directory = self._station_dir(station)
+            total += sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        return {"stations": len(stations), "total_bytes": total}
@@ -0,0 +1,200 @@
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+from app.models import db, Weather
+from app.services.forecast_service import weather_main
+from app.services.vineyard_analyzer import WeatherAnalysis
+
+# Colunas guardadas por observação (30 bytes)
+HISTORY_COLUMNS = {
+    "dt": np.int64,
+    "temp": np.float32,
+    "humidity": np.float32,
+    "rain_1h": np.float32,
+    "wind_speed": np.float32,
+    "pressure": np.float32,
+    "weather_id": np.uint16
+}
+
+
+class StationHistory:
+    """
+    Anel de capacidade fixa com as observações recentes de uma estação
+
+    Cada coluna é um array tipado; append() escreve na posição seguinte
+    e, com o anel cheio, substitui a observação mais antiga.
+    """
+
+    def __init__(self, capacity: int, covered_since: int):
+        self.capacity = capacity
+        self.columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in HISTORY_COLUMNS.items()}
+        self.size = 0
+        self.head = 0  # próxima posição a escrever
+        # Não há observações em falta a partir deste instante (ver HistoryStore.covers)
+        self.covered_since = covered_since
+        self.latest: Optional[Dict] = None  # último registo completo (Weather.to_dict)
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self.columns.values())
+
+    def last_dt(self) -> Optional[int]:
+        if self.size == 0:
+            return None
+        return int(self.columns["dt"][(self.head - 1) % self.capacity])
+
+    def append(self, values: Dict) -> bool:
+        """Acrescentar uma observação; ignora as que não são mais recentes que a última"""
+        with self._lock:
+            last = self.last_dt()
+            if last is not None and values["dt"] <= last:
+                return False
+            if self.size == self.capacity:
+                # A observação mais antiga sai do anel
+                self.covered_since = int(self.columns["dt"][(self.head + 1) % self.capacity])
+            for name, column in self.columns.items():
+                value = values.get(name)
+                column[self.head] = np.nan if value is None and column.dtype.kind == 'f' else (value or 0)
+            self.head = (self.head + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+            return True
+
+    def window(self, since: Optional[int] = None, until: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Cópia das observações entre since e until, por ordem cronológica"""
+        with self._lock:
+            start = (self.head - self.size) % self.capacity
+            order = (start + np.arange(self.size)) % self.capacity
+            data = {name: column[order] for name, column in self.columns.items()}
+
+        mask = np.ones(len(data["dt"]), dtype=bool)
+        if since is not None:
+            mask &= data["dt"] >= since
+        if until is not None:
+            mask &= data["dt"] <= until
+        return {name: values[mask] for name, values in data.items()}
+
+
+class HistoryStore:
+    """
+    Histórico recente em memória de todas as estações
+
+    Preenchido a partir da base de dados na primeira utilização
+    (HISTORY_WARM_HOURS) e alimentado pelo WeatherService a cada
+    observação gravada. Serve o analisador, o snapshot do dashboard e as
+    séries recentes sem consultar a base de dados.
+    """
+
+    def __init__(self, capacity: int = 160):
+        self.capacity = capacity
+        self._stations: Dict[str, StationHistory] = {}
+        self._lock = threading.Lock()
+        self._created_at = int(time.time())
+
+    def _station(self, name: str) -> StationHistory:
+        history = self._stations.get(name)
+        if history is None:
+            with self._lock:
+                history = self._stations.setdefault(
+                    name, StationHistory(self.capacity, covered_since=self._created_at)
+                )
+        return history
+
+    def append(self, record: Dict) -> bool:
+        """
+        Acrescentar uma observação gravada
+
+        Args:
+            record (Dict): Registo no formato Weather.to_dict()
+        """
+        history = self._station(record["name"])
+        appended = history.append({
+            "dt": record["dt"],
+            "temp": record["main"]["temp"],
+            "humidity": record["main"]["humidity"],
+            "rain_1h": (record.get("rain") or {}).get("1h", 0.0),
+            "wind_speed": (record.get("wind") or {}).get("speed"),
+            "pressure": record["main"]["pressure"],
+            "weather_id": (record.get("weather") or [{}])[0].get("id")
+        })
+        if appended:
+            history.latest = record
+        return appended
+
+    def warm_from_db(self, hours: int = 72):
+        """Carregar as observações das últimas `hours` horas da base de dados"""
+        since = int(time.time()) - hours * 3600
+        columns = [getattr(Weather, name) for name in HISTORY_COLUMNS]
+        rows = db.session.execute(
+            db.select(Weather.name, *columns)
+            .where(Weather.dt >= since)
+            .order_by(Weather.name, Weather.dt)
+        ).all()
+
+        for row in rows:
+            history = self._station(row[0])
+            history.append(dict(zip(HISTORY_COLUMNS, row[1:])))
+
+        # Sem observações em falta desde `since` (a menos que o anel já tenha rodado)
+        for history in self._stations.values():
+            if history.size < history.capacity:
+                history.covered_since = min(history.covered_since, since)
+
+        # Último registo completo de cada estação, para o snapshot
+        latest_ids = db.select(db.func.max(Weather.id)).where(Weather.dt >= since).group_by(Weather.name)
+        for weather in Weather.query.filter(Weather.id.in_(latest_ids)):
+            if weather.name in self._stations:
+                self._stations[weather.name].latest = weather.to_dict()
+
+        print(f"Histórico recente carregado: {len(rows)} observações de {len(self._stations)} estações")
+
+    def stations(self) -> List[str]:
+        return list(self._stations)
+
+    def latest_records(self) -> List[Dict]:
+        """Último registo completo de cada estação (mais recente primeiro)"""
+        records = [history.latest for history in self._stations.values() if history.latest]
+        return sorted(records, key=lambda record: record["dt"] or 0, reverse=True)
+
+    def latest(self, name: str) -> Optional[Dict]:
+        history = self._stations.get(name)
+        return history.latest if history else None
+
+    def window(self, name: str, since: Optional[int] = None, until: Optional[int] = None) -> Dict[str, np.ndarray]:
+        history = self._stations.get(name)
+        if history is None:
+            return {column: np.zeros(0, dtype=dtype) for column, dtype in HISTORY_COLUMNS.items()}
+        return history.window(since, until)
+
+    def covers(self, name: str, since: int) -> bool:
+        """True se o anel tem todas as observações da estação desde `since`"""
+        history = self._stations.get(name)
+        return history is not None and since >= history.covered_since
+
+    def analyses(self, name: str, since: int) -> List[WeatherAnalysis]:
+        """Observações desde `since` como WeatherAnalysis, por ordem cronológica"""
+        data = self.window(name, since)
+        return [
+            WeatherAnalysis(
+                temperature=float(data["temp"][i]),
+                humidity=int(data["humidity"][i]) if not np.isnan(data["humidity"][i]) else 0,
+                precipitation=float(np.nan_to_num(data["rain_1h"][i])),
+                wind_speed=float(np.nan_to_num(data["wind_speed"][i])),
+                weather_condition=weather_main(int(data["weather_id"][i])),
+                pressure=int(np.nan_to_num(data["pressure"][i])),
+                timestamp=datetime.utcfromtimestamp(int(data["dt"][i]))
+            )
+            for i in range(len(data["dt"]))
+        ]
+
+    def memory_usage(self) -> Dict:
+        """Memória ocupada pelos arrays do histórico"""
+        total = sum(history.nbytes for history in self._stations.values())
+        return {
+            "stations": len(self._stations),
+            "capacity": self.capacity,
+            "bytes_per_station": total // len(self._stations) if self._stations else 0,
+            "total_bytes": total
+        }
@@ -0,0 +1,223 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Variáveis interpoladas e o campo correspondente em Weather.to_dict()
+VARIABLES = {
+    "temperature": lambda record: record["main"]["temp"],
+    "humidity": lambda record: record["main"]["humidity"],
+    "rain_1h": lambda record: (record.get("rain") or {}).get("1h", 0.0)
+}
+
+
+def haversine_matrix(points: np.ndarray, stations: np.ndarray) -> np.ndarray:
+    """
+    Distâncias (km) entre cada ponto e cada estação
+
+    Args:
+        points (np.ndarray): (P, 2) lat/lon em graus
+        stations (np.ndarray): (S, 2) lat/lon em graus
+
+    Returns:
+        np.ndarray: Matriz (P, S)
+    """
+    p = np.radians(points)[:, None, :]
+    s = np.radians(stations)[None, :, :]
+    dlat = s[..., 0] - p[..., 0]
+    dlon = s[..., 1] - p[..., 1]
+    a = np.sin(dlat / 2) ** 2 + np.cos(p[..., 0]) * np.cos(s[..., 0]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def grid_shape(lat_min: float, lat_max: float, lon_min: float, lon_max: float,
+               step: float) -> Tuple[int, int]:
+    """
+    Dimensões de uma grelha regular, sem a construir
+
+    Returns:
+        Tuple: (linhas de latitude, colunas de longitude)
+
+    Raises:
+        ValueError: step não positivo ou limites invertidos/não finitos
+    """
+    bounds = (lat_min, lat_max, lon_min, lon_max, step)
+    if not all(np.isfinite(value) for value in bounds):
+        raise ValueError("limites e step têm de ser finitos")
+    if step <= 0:
+        raise ValueError("step tem de ser positivo")
+    if lat_min > lat_max or lon_min > lon_max:
+        raise ValueError("lat_min/lon_min não podem ser maiores que lat_max/lon_max")
+    # Tolerância para limites que são múltiplos exatos de step
+    rows = int(np.floor((lat_max - lat_min) / step + 1e-9)) + 1
+    cols = int(np.floor((lon_max - lon_min) / step + 1e-9)) + 1
+    return rows, cols
+
+
+def regular_grid(lat_min: float, lat_max: float, lon_min: float, lon_max: float,
+                 step: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Grelha regular de pontos (validar o tamanho antes com grid_shape)
+
+    Returns:
+        Tuple: (latitudes, longitudes, pontos (P, 2) por linhas de latitude)
+    """
+    rows, cols = grid_shape(lat_min, lat_max, lon_min, lon_max, step)
+    lats = lat_min + np.arange(rows) * step
+    lons = lon_min + np.arange(cols) * step
+    lat_grid, lon_grid = np.meshgrid(lats, lons, indexing="ij")
+    return lats, lons, np.column_stack([lat_grid.ravel(), lon_grid.ravel()])
+
+
+def _digest(array: np.ndarray) -> str:
+    return hashlib.blake2b(np.ascontiguousarray(array).tobytes(), digest_size=16).hexdigest()
+
+
+class IDWInterpolator:
+    """
+    Interpolação por inverso da distância (IDW) das observações atuais
+
+    Os pesos de cada ponto para as suas `neighbours` estações mais
+    próximas são calculados uma vez por (conjunto de estações, pontos) e
+    guardados numa cache LRU limitada a cache_size entradas e cache_bytes
+    bytes (pesos de grelhas maiores que cache_bytes não são guardados).
+    Com novas observações só é preciso um produto matriz-vetor (denso, ou
+    esparso com k < estações).
+    """
+
+    def __init__(self, power: float = 2.0, neighbours: int = 8, cache_size: int = 32,
+                 cache_bytes: int = 64 * 1024 * 1024, chunk_size: int = 4096):
+        self.power = power
+        self.neighbours = neighbours
+        self.cache_size = cache_size
+        self.cache_bytes = cache_bytes
+        self.chunk_size = chunk_size
+        self._cache: "OrderedDict[tuple, Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def weights(self, stations: np.ndarray, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Pesos normalizados (cache por conjunto de estações e pontos)
+
+        Returns:
+            Tuple: (índices das estações (P, k), pesos (P, k)); com k igual
+            ao número de estações os índices são None e os pesos uma
+            matriz densa (P, S)
+        """
+        key = (_digest(stations), _digest(points), self.power, self.neighbours)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+
+        computed = self._compute_weights(stations, points)
+        size = sum(array.nbytes for array in computed if array is not None)
+        with self._lock:
+            self.misses += 1
+            if size <= self.cache_bytes and key not in self._cache:
+                self._cache[key] = computed
+                self._cached_bytes += size
+                while len(self._cache) > self.cache_size or self._cached_bytes > self.cache_bytes:
+                    _, evicted = self._cache.popitem(last=False)
+                    self._cached_bytes -= sum(array.nbytes for array in evicted if array is not None)
+        return computed
+
+    def _compute_weights(self, stations: np.ndarray, points: np.ndarray):
+        k = min(self.neighbours, len(stations))
+        dense = k == len(stations)
+        indices = None if dense else np.empty((len(points), k), dtype=np.int32)
+        weights = np.empty((len(points), k), dtype=np.float64)
+
+        # Por blocos para limitar a memória da matriz de distâncias
+        for start in range(0, len(points), self.chunk_size):
+            block = slice(start, start + self.chunk_size)
+            distances = haversine_matrix(points[block], stations)
+            if k < len(stations):
+                nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            else:
+                nearest = np.broadcast_to(np.arange(k), (distances.shape[0], k))
+            nearest_distances = np.take_along_axis(distances, nearest, axis=1)
+
+            # Pontos sobre uma estação ficam com o valor dessa estação
+            inverse = 1.0 / np.maximum(nearest_distances, 1e-6) ** self.power
+            if not dense:
+                indices[block] = nearest
+            weights[block] = inverse / inverse.sum(axis=1, keepdims=True)
+
+        return indices, weights
+
+    def interpolate(self, stations: np.ndarray, values: Dict[str, np.ndarray],
+                    points: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Interpolar cada variável nos pontos
+
+        Estações sem valor (NaN) numa variável são ignoradas renormalizando
+        os pesos dos restantes vizinhos.
+
+        Args:
+            stations (np.ndarray): (S, 2) lat/lon das estações
+            values (Dict[str, np.ndarray]): Valores (S,) por variável
+            points (np.ndarray): (P, 2) lat/lon dos pontos
+
+        Returns:
+            Dict[str, np.ndarray]: Valores (P,) por variável
+        """
+        indices, weights = self.weights(stations, points)
+        names = list(values)
+        matrix = np.column_stack([values[name] for name in names])  # (S, V)
+        valid = ~np.isnan(matrix)
+        filled = np.where(valid, matrix, 0.0)
+
+        if indices is None:
+            # Pesos densos: produto matriz-vetor direto (BLAS)
+            numerator = weights @ filled
+            denominator = weights @ valid
+        else:
+            numerator = np.einsum("pk,pkv->pv", weights, filled[indices])
+            denominator = np.einsum("pk,pkv->pv", weights, valid[indices].astype(np.float64))
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            interpolated = np.where(denominator > 0, numerator / denominator, np.nan)
+        return {name: interpolated[:, column] for column, name in enumerate(names)}
+
+
+def latest_observations(records: List[Dict], stations: Dict[str, Dict],
+                        variables: List[str]) -> Tuple[List[str], np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Última observação de cada estação do registo
+
+    Args:
+        records (List[Dict]): Registos (Weather.to_dict) do mais recente para o mais antigo
+        stations (Dict[str, Dict]): Estações do registo por nome
+        variables (List[str]): Variáveis a extrair (chaves de VARIABLES)
+
+    Returns:
+        Tuple: (nomes, coordenadas (S, 2), valores (S,) por variável)
+    """
+    latest = {}
+    for record in records:
+        if record["name"] in stations and record["name"] not in latest:
+            latest[record["name"]] = record
+
+    # Ordem estável para que a chave da cache não dependa da ordem dos registos
+    names = sorted(latest)
+    coords = np.array([[stations[name]["lat"], stations[name]["lon"]] for name in names], dtype=np.float64)
+    values = {}
+    for variable in variables:
+        extract = VARIABLES[variable]
+        column = [extract(latest[name]) for name in names]
+        values[variable] = np.array([np.nan if value is None else value for value in column], dtype=np.float64)
+    return names, coords.reshape(-1, 2), values
+
+
+def to_json_values(array: np.ndarray, decimals: int = 2) -> List[Optional[float]]:
+    """Valores arredondados, com NaN como None"""
+    return [None if value != value else value for value in np.round(array, decimals).tolist()]
@@ -0,0 +1,271 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional
+import numpy as np
+import requests
+from app import metrics
+
+# Estados do circuito (valor exportado em winecast_owm_circuit_state)
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Pedido recusado sem contactar a API (circuito aberto)"""
+
+
+class CircuitBreaker:
+    """
+    Circuito de um endpoint da OpenWeatherMap
+
+    Abre depois de failure_threshold falhas seguidas (timeouts, erros de
+    ligação, 429 e 5xx). Aberto, recusa os pedidos durante reset_seconds;
+    depois passa a meio-aberto e deixa passar até half_open_probes
+    pedidos de teste: um sucesso fecha o circuito, uma falha volta a
+    abri-lo.
+    """
+
+    def __init__(self, endpoint: str = 'weather', failure_threshold: int = 3, reset_seconds: float = 30.0,
+                 half_open_probes: int = 1):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+        metrics.OWM_CIRCUIT_STATE.set(STATE_VALUES[CLOSED], endpoint=endpoint)
+
+    def _transition(self, state: str):
+        """Mudar de estado (chamado com o lock)"""
+        if state == self.state:
+            return
+        self.state = state
+        metrics.OWM_CIRCUIT_STATE.set(STATE_VALUES[state], endpoint=self.endpoint)
+        metrics.OWM_CIRCUIT_TRANSITIONS.inc(endpoint=self.endpoint, state=state)
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            print(f"Circuito OpenWeatherMap ({self.endpoint}) aberto durante {self.reset_seconds:.0f}s")
+        elif state == CLOSED:
+            print(f"Circuito OpenWeatherMap ({self.endpoint}) fechado")
+
+    def allow(self) -> bool:
+        """True se o pedido pode seguir para a API"""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    return False
+                self._transition(HALF_OPEN)
+                self._probes = 0
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    return False
+                self._probes += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._transition(OPEN)
+
+
+class RetryBudget:
+    """
+    Limite de pedidos extra (repetições e pedidos em paralelo)
+
+    Na janela de window_seconds, os pedidos extra não podem passar de
+    ratio vezes os pedidos originais (mais min_extra por janela, para
+    permitir repetições com pouco tráfego). Numa falha generalizada as
+    repetições não multiplicam a carga sobre a API.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_extra: int = 3, window_seconds: float = 60.0):
+        self.ratio = ratio
+        self.min_extra = min_extra
+        self._requests = metrics.SlidingWindowCounter(window_seconds)
+        self._extra = metrics.SlidingWindowCounter(window_seconds)
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        self._requests.add()
+
+    def try_spend(self) -> bool:
+        """Reservar um pedido extra (False se o orçamento está esgotado)"""
+        with self._lock:
+            if self._extra.total() >= self.min_extra + self.ratio * self._requests.total():
+                return False
+            self._extra.add()
+            return True
+
+
+class OWMClient:
+    """
+    Cliente HTTP da OpenWeatherMap com circuito, repetições e hedging
+
+    Cada endpoint (weather, group, forecast) tem o seu circuito, criado
+    por breaker_factory no primeiro pedido: uma falha de um endpoint não
+    bloqueia os outros. Cada chamada tem um prazo total de deadline
+    segundos (incluindo repetições), ou menos se o chamador passar o
+    tempo que lhe resta. Timeouts, erros de ligação, 429 e 5xx são repetidos até
+    max_retries vezes, com espera exponencial, enquanto houver orçamento
+    (RetryBudget). Com hedging ativo, se a resposta demorar mais que o
+    percentil hedge_percentile das latências recentes do endpoint, é
+    feito um segundo pedido igual e usada a primeira resposta.
+    """
+
+    def __init__(self, connect_timeout: float = 3.05, read_timeout: float = 10.0, deadline: float = 10.0,
+                 max_retries: int = 2, backoff_seconds: float = 0.2,
+                 breaker_factory: Callable[[str], CircuitBreaker] = None, budget: RetryBudget = None, hedge_enabled: bool = False, hedge_percentile: float = 95.0,
+                 hedge_min_seconds: float = 0.05, hedge_workers: int = 16):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.breaker_factory = breaker_factory or CircuitBreaker
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._breakers_lock = threading.Lock()
+        self.budget = budget or RetryBudget()
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_seconds = hedge_min_seconds
+        # Latências recentes por endpoint (base do atraso do hedging)
+        self._latencies: Dict[str, deque] = {}
+        self._pool = ThreadPoolExecutor(max_workers=hedge_workers, thread_name_prefix='owm') if hedge_enabled else None
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+            return True
+        if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+            return error.response.status_code == 429 or error.response.status_code >= 500
+        return False
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        """Circuito do endpoint (criado no primeiro pedido)"""
+        with self._breakers_lock:
+            if endpoint not in self._breakers:
+                self._breakers[endpoint] = self.breaker_factory(endpoint)
+            return self._breakers[endpoint]
+
+    def get(self, url: str, params: Dict, endpoint: str, deadline: Optional[float] = None) -> requests.Response:
+        """
+        Pedido GET com status de sucesso
+
+        Args:
+            url (str): URL do endpoint
+            params (Dict): Parâmetros da query
+            endpoint (str): Nome do endpoint (circuito, métricas e latências)
+            deadline (float, optional): Segundos que restam ao chamador;
+                o prazo da chamada é o menor entre este e self.deadline
+
+        Returns:
+            requests.Response: Resposta 2xx
+
+        Raises:
+            requests.exceptions.RequestException: Falha depois das
+                repetições permitidas, ou CircuitOpenError se o pedido
+                foi recusado sem contactar a API
+        """
+        breaker = self.breaker(endpoint)
+        budget_seconds = self.deadline if deadline is None else max(min(deadline, self.deadline), 0.0)
+        deadline = time.monotonic() + budget_seconds
+        attempt = 0
+        last_error = None
+        while True:
+            if not breaker.allow():
+                metrics.OWM_SHORT_CIRCUITED.inc(endpoint=endpoint)
+                if last_error is not None:
+                    # O circuito abriu entre tentativas: a falha é a do último pedido
+                    raise last_error
+                raise CircuitOpenError(f"Circuito aberto: pedido a {endpoint} recusado")
+            if attempt == 0:
+                self.budget.record_request()
+
+            remaining = max(deadline - time.monotonic(), 0.001)
+            timeout = (min(self.connect_timeout, remaining), min(self.read_timeout, remaining))
+            try:
+                response = self._send(url, params, endpoint, timeout, remaining)
+                breaker.record_success()
+                return response
+            except requests.exceptions.RequestException as e:
+                if not self._is_retryable(e):
+                    # Erro do pedido (ex.: 401, 404): a API está a responder
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                last_error = e
+
+                attempt += 1
+                backoff = self.backoff_seconds * 2 ** (attempt - 1) * random.uniform(0.5, 1.0)
+                if attempt > self.max_retries or time.monotonic() + backoff >= deadline:
+                    raise
+                if not self.budget.try_spend():
+                    metrics.OWM_RETRIES.inc(endpoint=endpoint, result='budget_exhausted')
+                    raise
+                metrics.OWM_RETRIES.inc(endpoint=endpoint, result='retried')
+                time.sleep(backoff)
+
+    def _request(self, url: str, params: Dict, endpoint: str, timeout) -> requests.Response:
+        """Um pedido HTTP (levanta HTTPError para status de erro)"""
+        metrics.OWM_REQUESTS.inc(endpoint=endpoint)
+        started = time.perf_counter()
+        response = requests.get(url, params=params, timeout=timeout)
+        self._latencies.setdefault(endpoint, deque(maxlen=200)).append(time.perf_counter() - started)
+        response.raise_for_status()
+        return response
+
+    def _hedge_delay(self, endpoint: str) -> Optional[float]:
+        """Atraso até ao segundo pedido (None sem hedging ou poucas amostras)"""
+        if not self.hedge_enabled:
+            return None
+        latencies = self._latencies.get(endpoint)
+        if latencies is None or len(latencies) < 20:
+            return None
+        return max(float(np.percentile(list(latencies), self.hedge_percentile)), self.hedge_min_seconds)
+
+    def _send(self, url: str, params: Dict, endpoint: str, timeout, remaining: float) -> requests.Response:
+        hedge_delay = self._hedge_delay(endpoint)
+        if hedge_delay is None or hedge_delay >= remaining:
+            return self._request(url, params, endpoint, timeout)
+
+        primary = self._pool.submit(self._request, url, params, endpoint, timeout)
+        done, _ = wait([primary], timeout=hedge_delay)
+        if done or not self.budget.try_spend():
+            return primary.result()
+
+        metrics.OWM_HEDGES.inc(endpoint=endpoint, outcome='sent')
+        hedge_timeout = tuple(max(value - hedge_delay, 0.001) for value in timeout)
+        hedge = self._pool.submit(self._request, url, params, endpoint, hedge_timeout)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except requests.exceptions.RequestException as e:
+                    error = e
+                    continue
+                if future is hedge:
+                    metrics.OWM_HEDGES.inc(endpoint=endpoint, outcome='won')
+                return response
+        raise error
+
+    def get_stats(self) -> Dict:
+        return {
+            "circuit": {endpoint: breaker.state for endpoint, breaker in list(self._breakers.items())},
+            "hedging": self.hedge_enabled,
+            "hedge_delay": {endpoint: self._hedge_delay(endpoint) for endpoint in self._latencies}
+        }
@@ -0,0 +1,418 @@
+import ast
+import os
+import string
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from types import CodeType, SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import yaml
+from app import metrics
+from app.services.vineyard_analyzer import AlertLevel, AlertType, VineyardAlert, WeatherAnalysis
+
+DEFAULT_RULES_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'rules', 'vineyard_rules.yaml')
+
+# Campos de WeatherAnalysis disponíveis nas expressões
+FIELDS = ('temperature', 'humidity', 'precipitation', 'wind_speed', 'weather_condition', 'pressure')
+SERIES = ('recent', 'forecast')
+
+
+def _last(values, n):
+    return values[max(len(values) - int(n), 0):]
+
+
+def _concat(*parts):
+    return np.concatenate([np.atleast_1d(np.asarray(part, dtype=np.float64)) for part in parts])
+
+
+FUNCTIONS = {
+    'first': lambda values, n: values[:max(int(n), 0)],
+    'last': _last,
+    'concat': _concat,
+    'count': lambda mask: int(np.count_nonzero(mask)),
+    'all': lambda mask: bool(np.all(mask)),
+    'any': lambda mask: bool(np.any(mask)),
+    'between': lambda values, low, high: (values >= low) & (values <= high),
+    'ptp': lambda values: float(np.ptp(values)) if len(values) else 0.0,
+    'min': lambda *values: float(np.min(_concat(*values))),
+    'max': lambda *values: float(np.max(_concat(*values))),
+    'abs': abs,
+    'len': len,
+    'round': round
+}
+
+# Nós permitidos nas expressões (sem atribuições, lambdas, imports, ...)
+ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd, ast.Invert,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Mod, ast.BitAnd, ast.BitOr,
+    ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.In, ast.NotIn,
+    ast.Name, ast.Load, ast.Attribute, ast.Call, ast.Constant, ast.List, ast.Tuple, ast.IfExp
+)
+
+
+class RuleError(ValueError):
+    """Ficheiro de regras inválido"""
+
+
+class _InlineParams(ast.NodeTransformer):
+    """Substituir os parâmetros da regra pelos seus valores (constantes)"""
+
+    def __init__(self, params: Dict):
+        self.params = params
+
+    def visit_Name(self, node):
+        if node.id in self.params:
+            return ast.copy_location(ast.Constant(self.params[node.id]), node)
+        return node
+
+
+def compile_expression(source: str, params: Dict, names: set, where: str) -> CodeType:
+    """
+    Validar e compilar uma expressão com os parâmetros já substituídos
+
+    Args:
+        source (str): Expressão Python (subconjunto)
+        params (Dict): Parâmetros da regra (para a região)
+        names (set): Outros nomes disponíveis (campos, let anteriores)
+        where (str): Localização no ficheiro, para as mensagens de erro
+    """
+    if not isinstance(source, (str, int, float)):
+        raise RuleError(f"{where}: a expressão tem de ser texto (usar aspas): {source}")
+    try:
+        tree = ast.parse(str(source).strip(), mode='eval')
+    except SyntaxError as e:
+        raise RuleError(f"{where}: expressão inválida ({e.msg}): {source}")
+
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise RuleError(f"{where}: '{type(node).__name__}' não é permitido: {source}")
+        if isinstance(node, ast.Name) and node.id not in params and node.id not in names \
+                and node.id not in FUNCTIONS and node.id not in SERIES:
+            raise RuleError(f"{where}: nome desconhecido '{node.id}'")
+        if isinstance(node, ast.Attribute) and not (
+                isinstance(node.value, ast.Name) and node.value.id in SERIES and node.attr in FIELDS):
+            raise RuleError(f"{where}: atributo inválido '{node.attr}' (usar recent.<campo> ou forecast.<campo>)")
+        if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS):
+            raise RuleError(f"{where}: só as funções {', '.join(FUNCTIONS)} são permitidas")
+
+    tree = ast.fix_missing_locations(_InlineParams(params).visit(tree))
+    return compile(tree, f"<{where}>", 'eval')
+
+
+@dataclass
+class CompiledLevel:
+    level: AlertLevel
+    when: Optional[CodeType]
+    message: str
+    recommendation: str
+
+
+@dataclass
+class CompiledRule:
+    name: str
+    alert_type: AlertType
+    expires_hours: float
+    lets: List[Tuple[str, CodeType]]
+    when: Optional[CodeType]
+    levels: List[CompiledLevel]
+    params: Dict
+
+    def evaluate(self, namespace: Dict) -> Optional[VineyardAlert]:
+        """Avaliar a regra; devolve o alerta do primeiro nível verdadeiro"""
+        scope = dict(namespace)
+        globals_ = {'__builtins__': {}}
+        for name, code in self.lets:
+            value = eval(code, globals_, scope)
+            scope[name] = value.item() if isinstance(value, np.generic) else value
+
+        if self.when is not None and not eval(self.when, globals_, scope):
+            return None
+
+        for level in self.levels:
+            if level.when is None or eval(level.when, globals_, scope):
+                now = datetime.now()
+                values = {**self.params, **scope}
+                return VineyardAlert(
+                    alert_type=self.alert_type,
+                    level=level.level,
+                    message=level.message.format_map(values),
+                    recommendation=level.recommendation.format_map(values),
+                    timestamp=now,
+                    city_id=0,  # Preenchido por analyze_all_conditions
+                    city_name="",
+                    expires_at=now + timedelta(hours=self.expires_hours)
+                )
+        return None
+
+
+def _check_template(text: str, names: set, where: str) -> str:
+    for _, field, _, _ in string.Formatter().parse(text):
+        if field is not None and field.split('.')[0].split('[')[0] not in names:
+            raise RuleError(f"{where}: campo desconhecido '{{{field}}}' na mensagem")
+    return text
+
+
+def _check_params(params: Dict, where: str):
+    """Parâmetros só podem ser números ou listas de textos/números (para `in`)"""
+    def is_number(value):
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+    for key, value in params.items():
+        if is_number(value):
+            continue
+        if isinstance(value, list) and all(is_number(item) or isinstance(item, str) for item in value):
+            continue
+        raise RuleError(f"{where}.params.{key}: tem de ser um número ou uma lista, não {value!r}")
+
+
+def _sample(count: int, offset: float = 0.0) -> List[WeatherAnalysis]:
+    """Observações sintéticas para o ensaio das regras compiladas"""
+    start = datetime(2000, 1, 1)
+    return [WeatherAnalysis(
+        temperature=15.0 + offset + (i % 12), humidity=40 + (i % 50), precipitation=float(i % 3),
+        wind_speed=2.0 + (i % 5), weather_condition=('Clear', 'Rain', 'Clouds')[i % 3],
+        pressure=1010 + (i % 10), timestamp=start + timedelta(hours=i)
+    ) for i in range(count)]
+
+
+def _dry_run(rule: 'CompiledRule'):
+    """
+    Avaliar a regra com dados sintéticos
+
+    Apanha erros que só aparecem na avaliação (ex.: comparar um número
+    com um texto), para que um ficheiro assim seja recusado em vez de
+    falhar em todas as análises.
+    """
+    current = {field: getattr(_sample(1, offset=10.0)[0], field) for field in FIELDS}
+    namespace = {**FUNCTIONS, **current, 'recent': _columns(_sample(72)), 'forecast': _columns(_sample(5, offset=5.0))}
+    try:
+        rule.evaluate(namespace)
+    except Exception as e:
+        raise RuleError(f"{rule.name}: erro ao avaliar a regra ({type(e).__name__}: {e})")
+
+
+def compile_rule(name: str, spec: Dict, params: Dict) -> CompiledRule:
+    """Compilar uma regra do ficheiro para os parâmetros de uma região"""
+    _check_params(params, name)
+    try:
+        alert_type = AlertType(spec['type'])
+    except (KeyError, ValueError):
+        raise RuleError(f"{name}: type deve ser um de {', '.join(t.value for t in AlertType)}")
+
+    names = set(FIELDS)
+    lets = []
+    for let_name, source in (spec.get('let') or {}).items():
+        if let_name in params or let_name in FUNCTIONS or let_name in names:
+            raise RuleError(f"{name}.let.{let_name}: nome já usado")
+        lets.append((let_name, compile_expression(source, params, names, f"{name}.let.{let_name}")))
+        names.add(let_name)
+
+    when = spec.get('when')
+    when = compile_expression(when, params, names, f"{name}.when") if when is not None else None
+
+    template_names = names | set(params)
+    levels = []
+    for index, level_spec in enumerate(spec.get('levels') or []):
+        where = f"{name}.levels[{index}]"
+        try:
+            level = AlertLevel(level_spec['level'])
+        except (KeyError, ValueError):
+            raise RuleError(f"{where}: level deve ser um de {', '.join(l.value for l in AlertLevel)}")
+        level_when = level_spec.get('when')
+        levels.append(CompiledLevel(
+            level=level,
+            when=compile_expression(level_when, params, names, f"{where}.when") if level_when is not None else None,
+            message=_check_template(str(level_spec.get('message', '')), template_names, where),
+            recommendation=_check_template(str(level_spec.get('recommendation', '')), template_names, where)
+        ))
+    if not levels:
+        raise RuleError(f"{name}: indicar pelo menos um nível em levels")
+
+    try:
+        expires_hours = float(spec.get('expires_hours', 24))
+    except (TypeError, ValueError):
+        raise RuleError(f"{name}: expires_hours tem de ser um número")
+
+    rule = CompiledRule(
+        name=name,
+        alert_type=alert_type,
+        expires_hours=expires_hours,
+        lets=lets,
+        when=when,
+        levels=levels,
+        params=params
+    )
+    _dry_run(rule)
+    return rule
+
+
+def compile_rules(document: Dict) -> Dict[Optional[str], List[CompiledRule]]:
+    """
+    Compilar o ficheiro de regras
+
+    Cada região com parâmetros próprios recebe a sua lista de regras
+    compiladas (com os parâmetros substituídos nas expressões); as
+    restantes usam a lista por omissão (chave None).
+    """
+    if not isinstance(document, dict) or not isinstance(document.get('rules'), dict):
+        raise RuleError("o ficheiro tem de ter uma secção 'rules'")
+    rules = document['rules']
+    regions = document.get('regions') or {}
+
+    compiled = {None: [compile_rule(name, spec, dict(spec.get('params') or {})) for name, spec in rules.items()]}
+    for region, overrides in regions.items():
+        region_rules = []
+        for name, spec in rules.items():
+            params = dict(spec.get('params') or {})
+            region_params = (overrides or {}).get(name) or {}
+            unknown = set(region_params) - set(params)
+            if unknown:
+                raise RuleError(f"regions.{region}.{name}: parâmetros desconhecidos {', '.join(sorted(unknown))}")
+            params.update(region_params)
+            region_rules.append(compile_rule(name, spec, params))
+        unknown_rules = set(overrides or {}) - set(rules)
+        if unknown_rules:
+            raise RuleError(f"regions.{region}: regras desconhecidas {', '.join(sorted(unknown_rules))}")
+        compiled[region] = region_rules
+    return compiled
+
+
+def _columns(analyses: List[WeatherAnalysis]) -> SimpleNamespace:
+    """Lista de WeatherAnalysis como arrays por campo (ordem cronológica)"""
+    columns = {
+        field: np.array([np.nan if getattr(a, field) is None else getattr(a, field) for a in analyses],
+                        dtype=np.float64)
+        for field in FIELDS if field != 'weather_condition'
+    }
+    columns['weather_condition'] = np.array([a.weather_condition for a in analyses], dtype=object)
+    return SimpleNamespace(**columns)
+
+
+class RuleEngine:
+    """
+    Regras vitícolas declarativas, compiladas a partir de um ficheiro YAML
+
+    O ficheiro é compilado uma vez por região (parâmetros substituídos
+    nas expressões) e a avaliação só escolhe a lista da região, pelo que
+    o custo não depende do número de regiões. Alterações ao ficheiro
+    são detetadas no máximo a cada check_interval segundos e as regras
+    novas substituem as anteriores de uma só vez; um ficheiro inválido
+    (incluindo regras que falham num ensaio com dados sintéticos) é
+    ignorado e as regras em vigor mantêm-se. Uma regra que falhe na
+    avaliação é saltada sem afetar as restantes.
+    """
+
+    def __init__(self, path: str = DEFAULT_RULES_FILE, check_interval: float = 2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._fingerprint = self._stat()
+        # Ficheiro inválido no arranque: erro imediato
+        self._rules = self._load()
+        self.version = 1
+
+    def _stat(self):
+        stat = os.stat(self.path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self) -> Dict[Optional[str], List[CompiledRule]]:
+        with open(self.path, encoding='utf-8') as f:
+            try:
+                document = yaml.safe_load(f)
+            except yaml.YAMLError as e:
+                raise RuleError(f"YAML inválido: {e}")
+        return compile_rules(document)
+
+    def refresh_if_changed(self) -> bool:
+        """Recarregar o ficheiro se mudou desde a última leitura"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+
+        with self._lock:
+            if now < self._next_check:
+                return False
+            self._next_check = now + self.check_interval
+            try:
+                fingerprint = self._stat()
+            except OSError as e:
+                print(f"Erro ao verificar regras ({self.path}): {e}")
+                return False
+            if fingerprint == self._fingerprint:
+                return False
+
+            # Não voltar a tentar o mesmo ficheiro inválido
+            self._fingerprint = fingerprint
+            try:
+                rules = self._load()
+            except (RuleError, OSError) as e:
+                print(f"Regras não recarregadas ({self.path}): {e}")
+                metrics.RULE_RELOADS.inc(result='error')
+                return False
+
+            self._rules = rules
+            self.version += 1
+            metrics.RULE_RELOADS.inc(result='ok')
+            print(f"Regras recarregadas ({self.path}, versão {self.version})")
+            return True
+
+    def rules_for(self, region: Optional[str] = None) -> List[CompiledRule]:
+        rules = self._rules
+        return rules.get(region) or rules[None]
+
+    def evaluate(self, current_weather: WeatherAnalysis, recent_weather: List[WeatherAnalysis],
+                 forecast_weather: List[WeatherAnalysis], region: Optional[str] = None,
+                 only: Optional[str] = None) -> List[VineyardAlert]:
+        """
+        Avaliar as regras da região
+
+        Args:
+            current_weather: Dados meteorológicos atuais
+            recent_weather: Histórico recente (ordem cronológica)
+            forecast_weather: Previsão meteorológica
+            region: Região vitícola da estação (None: parâmetros por omissão)
+            only: Avaliar apenas a regra com este nome
+
+        Returns:
+            Lista de alertas (sem city_id/city_name)
+        """
+        return self.evaluate_columns(
+            {field: getattr(current_weather, field) for field in FIELDS},
+            _columns(recent_weather),
+            _columns(forecast_weather),
+            region=region,
+            only=only
+        )
+
+    def evaluate_columns(self, current: Dict, recent: SimpleNamespace, forecast: SimpleNamespace,
+                         region: Optional[str] = None, only: Optional[str] = None) -> List[VineyardAlert]:
+        """
+        Avaliar as regras com o histórico e a previsão já em arrays
+
+        Usado pelo backtest, que passa vistas dos arrays de cada estação
+        em vez de listas de WeatherAnalysis.
+
+        Args:
+            current: Valores atuais por campo (FIELDS)
+            recent: Arrays por campo do histórico recente
+            forecast: Arrays por campo da previsão
+        """
+        self.refresh_if_changed()
+        namespace = {**FUNCTIONS, **current, 'recent': recent, 'forecast': forecast}
+
+        alerts = []
+        for rule in self.rules_for(region):
+            if only is not None and rule.name != only:
+                continue
+            try:
+                alert = rule.evaluate(namespace)
+            except Exception as e:
+                print(f"Erro ao avaliar a regra {rule.name}: {e}")
+                metrics.RULE_ERRORS.inc(rule=rule.name)
+                continue
+            if alert is not None:
+                alerts.append(alert)
+        return alerts
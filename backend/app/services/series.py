@@ -0,0 +1,171 @@
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.models import db, Weather
+from app.services.history_store import HISTORY_COLUMNS
+
+# Métricas disponíveis nas séries (nome público -> coluna)
+SERIES_METRICS = {
+    "temp": Weather.temp,
+    "feels_like": Weather.feels_like,
+    "humidity": Weather.humidity,
+    "pressure": Weather.pressure,
+    "wind_speed": Weather.wind_speed,
+    "rain_1h": Weather.rain_1h,
+    "clouds": Weather.clouds_all
+}
+
+# Sem registo de chuva equivale a 0 mm
+ZERO_WHEN_MISSING = {"rain_1h"}
+
+METHODS = ("lttb", "avg")
+
+
+def load_series(stations: List[str], metrics: List[str], start: int, end: int) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Ler da base de dados as colunas necessárias de um intervalo
+
+    Só são lidas as colunas pedidas (sem objetos ORM).
+
+    Args:
+        stations (List[str]): Nomes das estações
+        metrics (List[str]): Métricas (chaves de SERIES_METRICS)
+        start (int): Início (timestamp Unix, inclusivo)
+        end (int): Fim (timestamp Unix, inclusivo)
+
+    Returns:
+        Dict: {estação: {'t': array, métrica: array}} ordenado por tempo
+    """
+    columns = [SERIES_METRICS[metric] for metric in metrics]
+    query = (
+        db.select(Weather.name, Weather.dt, *columns)
+        .where(Weather.name.in_(stations), Weather.dt >= start, Weather.dt <= end)
+        .order_by(Weather.name, Weather.dt)
+    )
+    rows = db.session.execute(query).all()
+
+    grouped = {station: [] for station in stations}
+    for row in rows:
+        grouped[row[0]].append(row[1:])
+
+    series = {}
+    for station, station_rows in grouped.items():
+        data = np.array(station_rows, dtype=np.float64).reshape(-1, len(metrics) + 1)
+        series[station] = {"t": data[:, 0].astype(np.int64)}
+        for index, metric in enumerate(metrics, start=1):
+            values = data[:, index]
+            if metric in ZERO_WHEN_MISSING:
+                values = np.nan_to_num(values, nan=0.0)
+            series[station][metric] = values
+    return series
+
+
+def history_series(history, stations: List[str], metrics: List[str], start: int,
+                   end: int) -> Optional[Dict[str, Dict[str, np.ndarray]]]:
+    """
+    Mesmo formato que load_series, a partir do histórico em memória
+    (observações repetidas da API, com o mesmo dt, aparecem uma só vez)
+
+    Returns:
+        Optional[Dict]: Séries por estação, ou None se o histórico não
+        tem as métricas ou não cobre o intervalo de todas as estações
+    """
+    if not all(metric in HISTORY_COLUMNS for metric in metrics):
+        return None
+    if not all(history.covers(station, start) for station in stations):
+        return None
+
+    series = {}
+    for station in stations:
+        window = history.window(station, start, end)
+        series[station] = {"t": window["dt"]}
+        for metric in metrics:
+            values = window[metric].astype(np.float64)
+            if metric in ZERO_WHEN_MISSING:
+                values = np.nan_to_num(values, nan=0.0)
+            series[station][metric] = values
+    return series
+
+
+def lttb(t: np.ndarray, v: np.ndarray, threshold: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Largest-Triangle-Three-Buckets: escolher threshold pontos preservando a forma
+
+    O primeiro e o último ponto são mantidos; em cada bucket fica o ponto
+    que forma o maior triângulo com o ponto escolhido antes e a média do
+    bucket seguinte. A área de cada bucket é calculada vetorialmente.
+    """
+    n = len(t)
+    if threshold >= n or threshold < 3:
+        return t, v
+
+    x = t.astype(np.float64)
+    # Limites dos threshold - 2 buckets interiores (o último aponta para n - 1)
+    every = (n - 2) / (threshold - 2)
+    edges = np.minimum((np.arange(threshold) * every).astype(np.int64) + 1, n)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        next_lo, next_hi = edges[bucket + 1], max(edges[bucket + 2], edges[bucket + 1] + 1)
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = v[next_lo:next_hi].mean()
+
+        px, py = x[previous], v[previous]
+        areas = np.abs((px - avg_x) * (v[lo:hi] - py) - (px - x[lo:hi]) * (avg_y - py))
+        previous = lo + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+
+    return t[selected], v[selected]
+
+
+def bucket_aggregate(t: np.ndarray, v: np.ndarray, start: int, end: int,
+                     buckets: int) -> Dict[str, np.ndarray]:
+    """
+    Média, mínimo e máximo em buckets de tempo iguais
+
+    Buckets sem dados são omitidos. Os timestamps devolvidos são o
+    centro de cada bucket.
+    """
+    width = max((end - start + 1) / buckets, 1.0)
+    index = np.minimum(((t - start) / width).astype(np.int64), buckets - 1)
+
+    counts = np.bincount(index, minlength=buckets)
+    sums = np.bincount(index, weights=v, minlength=buckets)
+    minimum = np.full(buckets, np.inf)
+    maximum = np.full(buckets, -np.inf)
+    np.minimum.at(minimum, index, v)
+    np.maximum.at(maximum, index, v)
+
+    present = counts > 0
+    centers = (start + (np.arange(buckets) + 0.5) * width).astype(np.int64)
+    return {
+        "t": centers[present],
+        "avg": sums[present] / counts[present],
+        "min": minimum[present],
+        "max": maximum[present]
+    }
+
+
+def downsample(t: np.ndarray, v: np.ndarray, start: int, end: int, points: int, method: str) -> Dict:
+    """
+    Reduzir uma série a no máximo `points` pontos
+
+    Returns:
+        Dict: Série pronta para JSON ({t, v} ou {t, v, min, max})
+    """
+    valid = ~np.isnan(v)
+    t, v = t[valid], v[valid]
+
+    if method == "avg":
+        aggregated = bucket_aggregate(t, v, start, end, points)
+        return {
+            "t": aggregated["t"].tolist(),
+            "v": np.round(aggregated["avg"], 2).tolist(),
+            "min": np.round(aggregated["min"], 2).tolist(),
+            "max": np.round(aggregated["max"], 2).tolist()
+        }
+
+    sampled_t, sampled_v = lttb(t, v, points)
+    return {"t": sampled_t.tolist(), "v": np.round(sampled_v, 2).tolist()}
@@ -0,0 +1,127 @@
+import heapq
+import math
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def _to_unit_vector(lat: float, lon: float) -> Tuple[float, float, float]:
+    """Coordenadas geográficas para um vetor na esfera unitária"""
+    lat_rad = math.radians(lat)
+    lon_rad = math.radians(lon)
+    cos_lat = math.cos(lat_rad)
+    return (cos_lat * math.cos(lon_rad), cos_lat * math.sin(lon_rad), math.sin(lat_rad))
+
+
+def _chord_to_km(chord_squared: float) -> float:
+    """Distância ao longo da superfície a partir do quadrado da corda"""
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(chord_squared) / 2))
+
+
+def _km_to_chord_squared(distance_km: float) -> float:
+    chord = 2 * math.sin(min(distance_km / EARTH_RADIUS_KM, math.pi) / 2)
+    return chord * chord
+
+
+class StationIndex:
+    """
+    Índice espacial (KD-tree) para encontrar as estações mais próximas
+
+    As estações são guardadas como vetores 3D na esfera unitária: a
+    distância euclidiana (corda) é monótona com a distância ao longo da
+    superfície, por isso o vizinho mais próximo na árvore é o mais próximo
+    no globo, sem problemas junto ao antimeridiano.
+
+    A árvore é imutável; build() cria uma nova e troca numa só atribuição
+    o par (raiz, estações), que cada consulta lê uma única vez, pelo que
+    as consultas concorrentes não precisam de lock.
+    """
+
+    def __init__(self, leaf_size: int = 8):
+        self.leaf_size = leaf_size
+        self._snapshot: Tuple[Optional[object], List[Dict]] = (None, [])
+
+    def __len__(self):
+        return len(self._snapshot[1])
+
+    def build(self, stations: Sequence[Dict]):
+        """
+        (Re)construir o índice
+
+        Args:
+            stations (Sequence[Dict]): Estações com lat e lon
+        """
+        stations = list(stations)
+        points = [_to_unit_vector(s['lat'], s['lon']) + (i,) for i, s in enumerate(stations)]
+        root = self._build(points) if points else None
+        self._snapshot = (root, stations)
+
+    def _build(self, points: List[Tuple]):
+        if len(points) <= self.leaf_size:
+            return points
+
+        # Dividir pelo eixo com maior amplitude
+        spreads = [max(p[axis] for p in points) - min(p[axis] for p in points) for axis in range(3)]
+        axis = spreads.index(max(spreads))
+        points.sort(key=lambda p: p[axis])
+        middle = len(points) // 2
+        return (axis, points[middle][axis], self._build(points[:middle]), self._build(points[middle:]))
+
+    def nearest(self, lat: float, lon: float, k: int = 1,
+                max_distance_km: Optional[float] = None) -> List[Dict]:
+        """
+        Estações mais próximas de um ponto
+
+        Args:
+            lat (float): Latitude
+            lon (float): Longitude
+            k (int): Número de estações a devolver
+            max_distance_km (float, optional): Distância máxima
+
+        Returns:
+            List[Dict]: Estações ordenadas por distância, com distance_km
+        """
+        return self._nearest(self._snapshot, lat, lon, k, max_distance_km)
+
+    def nearest_batch(self, points: Iterable[Tuple[float, float]], k: int = 1,
+                      max_distance_km: Optional[float] = None) -> List[List[Dict]]:
+        """Estações mais próximas de cada ponto (lat, lon), todas no mesmo índice"""
+        snapshot = self._snapshot
+        return [self._nearest(snapshot, lat, lon, k, max_distance_km) for lat, lon in points]
+
+    def _nearest(self, snapshot, lat, lon, k, max_distance_km):
+        root, stations = snapshot
+        if root is None or k < 1:
+            return []
+
+        limit = _km_to_chord_squared(max_distance_km) if max_distance_km is not None else float('inf')
+        heap = []  # max-heap de (-distância², índice)
+        self._search(root, _to_unit_vector(lat, lon), k, limit, heap)
+
+        return [
+            dict(stations[index], distance_km=round(_chord_to_km(-negative), 3))
+            for negative, index in sorted(heap, reverse=True)
+        ]
+
+    def _search(self, node, query, k, limit, heap):
+        if isinstance(node, list):
+            qx, qy, qz = query
+            for x, y, z, index in node:
+                distance = (x - qx) ** 2 + (y - qy) ** 2 + (z - qz) ** 2
+                if distance > limit:
+                    continue
+                if len(heap) < k:
+                    heapq.heappush(heap, (-distance, index))
+                elif distance < -heap[0][0]:
+                    heapq.heapreplace(heap, (-distance, index))
+            return
+
+        axis, split, left, right = node
+        diff = query[axis] - split
+        near, far = (left, right) if diff < 0 else (right, left)
+        self._search(near, query, k, limit, heap)
+
+        # Visitar o outro lado só se ainda puder conter um ponto mais próximo
+        bound = diff * diff
+        if bound <= limit and (len(heap) < k or bound < -heap[0][0]):
+            self._search(far, query, k, limit, heap)
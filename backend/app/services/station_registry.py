@@ -0,0 +1,101 @@
+import threading
+from typing import Dict, List, Optional
+from sqlalchemy import func
+from app.models import db
+from app.models.station import Station, DEFAULT_STATIONS
+
+
+class StationRegistry:
+    """
+    Registo em memória das estações monitorizadas
+
+    Carrega as estações ativas da tabela `stations` e recarrega-as quando
+    a tabela muda (verificado no início de cada ciclo de coleta), sem
+    reiniciar a aplicação. Sem tabela ou sem estações usa DEFAULT_STATIONS.
+    """
+
+    def __init__(self):
+        self._stations: List[Dict] = []
+        self._fingerprint = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._listeners = []
+        self.version = 0
+
+    @property
+    def stations(self) -> List[Dict]:
+        """Estações ativas (carregadas no primeiro acesso)"""
+        if not self._loaded:
+            self.reload()
+        return self._stations
+
+    def add_listener(self, callback):
+        """Registar uma função chamada com a lista de estações após cada recarga"""
+        self._listeners.append(callback)
+
+    def _current_fingerprint(self):
+        """Número de estações e última alteração: muda quando a tabela muda"""
+        return tuple(db.session.query(func.count(Station.id), func.max(Station.updated_at)).one())
+
+    def reload(self) -> List[Dict]:
+        """
+        Recarregar as estações ativas da base de dados
+
+        Returns:
+            List[Dict]: Estações carregadas
+        """
+        with self._lock:
+            try:
+                fingerprint = self._current_fingerprint()
+                rows = Station.query.filter_by(is_active=True).order_by(Station.id).all()
+                stations = [self._to_entry(row) for row in rows]
+            except Exception as e:
+                print(f"Erro ao carregar estações (a usar as estações por omissão): {e}")
+                db.session.rollback()
+                fingerprint, stations = None, []
+
+            if fingerprint is None or not fingerprint[0]:
+                stations = [dict(station, id=None, owm_id=None) for station in DEFAULT_STATIONS]
+
+            self._stations = stations
+            self._fingerprint = fingerprint
+            self._loaded = True
+            self.version += 1
+
+        print(f"Registo de estações carregado: {len(stations)} estações")
+        for callback in self._listeners:
+            callback(stations)
+        return stations
+
+    def refresh_if_changed(self) -> bool:
+        """
+        Recarregar só se a tabela mudou desde a última carga
+
+        Returns:
+            bool: True se as estações foram recarregadas
+        """
+        try:
+            fingerprint = self._current_fingerprint()
+        except Exception:
+            db.session.rollback()
+            fingerprint = None
+
+        if self._loaded and fingerprint == self._fingerprint:
+            return False
+        self.reload()
+        return True
+
+    def get(self, name: str) -> Optional[Dict]:
+        """Obter uma estação pelo nome"""
+        return next((station for station in self.stations if station['name'] == name), None)
+
+    @staticmethod
+    def _to_entry(station: Station) -> Dict:
+        return {
+            "id": station.id,
+            "name": station.name,
+            "region": station.region,
+            "lat": station.lat,
+            "lon": station.lon,
+            "owm_id": station.owm_id
+        }
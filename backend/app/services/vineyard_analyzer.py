@@ -1,4 +1,7 @@
-from datetime import datetime, timedelta
+from datetime import datetime
+from app import metrics
+import os
+import time
 from typing import Dict, List, Optional
 from dataclasses import dataclass
 from enum import Enum
@@ -53,34 +56,10 @@ class VineyardAnalyzer:
     específicos para produtores de vinho em Portugal.
     """
     
-    def __init__(self):
-        # Configurações para análise vitícola
-        self.config = {
-            # Parâmetros para necessidade de rega
-            'irrigation': {
-                'temp_threshold': 25.0,  # °C - Temperatura limite
-                'no_rain_days': 3,       # Dias sem chuva
-                'humidity_threshold': 40  # % - Umidade baixa
-            },
-            
-            # Parâmetros para risco de fungos
-            'fungal_risk': {
-                'humidity_high': 80,     # % - Umidade alta
-                'temp_min': 15.0,        # °C - Temperatura mínima
-                'temp_max': 25.0,        # °C - Temperatura máxima
-                'consecutive_hours': 6    # Horas consecutivas
-            },
-            
-            # Parâmetros para sugestão de colheita
-            'harvest': {
-                'temp_stability': 3.0,   # °C - Variação máxima
-                'days_forecast': 5,      # Dias de previsão
-                'ideal_temp_min': 18.0,  # °C
-                'ideal_temp_max': 28.0,  # °C
-                'max_wind_speed': 15.0,  # m/s
-                'no_rain_required': True
-            }
-        }
+    def __init__(self, rules_path: str = None):
+        # Limiares e níveis de alerta definidos em app/rules/vineyard_rules.yaml
+        from app.services.rule_engine import RuleEngine, DEFAULT_RULES_FILE
+        self.rules = RuleEngine(rules_path or os.getenv('VINEYARD_RULES_FILE', DEFAULT_RULES_FILE))
     
     def analyze_weather_data(self, weather_data: Dict) -> WeatherAnalysis:
         """
@@ -93,7 +72,7 @@ class VineyardAnalyzer:
             WeatherAnalysis: Análise estruturada
         """
         return WeatherAnalysis(
-            temperature=weather_data['main']['temp'] - 273.15,  # Kelvin para Celsius
+            temperature=weather_data['main']['temp'],  # Celsius (pedidos com units=metric)
             humidity=weather_data['main']['humidity'],
             precipitation=weather_data.get('rain', {}).get('1h', 0.0),
             wind_speed=weather_data['wind']['speed'],
@@ -102,8 +81,14 @@ class VineyardAnalyzer:
             timestamp=datetime.fromtimestamp(weather_data['dt'])
         )
     
+    def _check(self, rule: str, current_weather: WeatherAnalysis, recent_weather: List[WeatherAnalysis],
+               forecast_weather: List[WeatherAnalysis], region: Optional[str]) -> Optional[VineyardAlert]:
+        alerts = self.rules.evaluate(current_weather, recent_weather, forecast_weather, region=region, only=rule)
+        return alerts[0] if alerts else None
+    
     def check_irrigation_need(self, current_weather: WeatherAnalysis, 
-                            recent_weather: List[WeatherAnalysis]) -> Optional[VineyardAlert]:
+                            recent_weather: List[WeatherAnalysis],
+                            region: Optional[str] = None) -> Optional[VineyardAlert]:
         """
         Verifica necessidade de rega
         
@@ -112,52 +97,16 @@ class VineyardAnalyzer:
         Args:
             current_weather: Dados meteorológicos atuais
             recent_weather: Histórico recente (últimos dias)
+            region: Região vitícola (parâmetros próprios, se definidos)
             
         Returns:
             VineyardAlert ou None
         """
-        config = self.config['irrigation']
-        
-        # Verificar temperatura atual
-        temp_high = current_weather.temperature > config['temp_threshold']
-        
-        # Verificar humidade baixa
-        humidity_low = current_weather.humidity < config['humidity_threshold']
-        
-        # Verificar dias sem chuva
-        days_without_rain = 0
-        for weather in recent_weather[-config['no_rain_days']:]:
-            if weather.precipitation <= 0.1:  # Menos de 0.1mm considera-se sem chuva
-                days_without_rain += 1
-        
-        no_rain_period = days_without_rain >= config['no_rain_days']
-        
-        if temp_high and humidity_low and no_rain_period:
-            # Determinar nível de alerta
-            if current_weather.temperature > 30:
-                level = AlertLevel.HIGH
-                message = f"Temperatura muito alta ({current_weather.temperature:.1f}°C) e {days_without_rain} dias sem chuva"
-                recommendation = "Rega imediata recomendada. Regar de manhã cedo ou ao final do dia."
-            else:
-                level = AlertLevel.MEDIUM
-                message = f"Condições secas: {current_weather.temperature:.1f}°C, {days_without_rain} dias sem chuva"
-                recommendation = "Considerar rega nas próximas 24h. Verificar solo antes de regar."
-            
-            return VineyardAlert(
-                alert_type=AlertType.IRRIGATION,
-                level=level,
-                message=message,
-                recommendation=recommendation,
-                timestamp=datetime.now(),
-                city_id=0,  # Será preenchido pela chamada
-                city_name="",  # Será preenchido pela chamada
-                expires_at=datetime.now() + timedelta(hours=12)
-            )
-        
-        return None
+        return self._check('irrigation', current_weather, recent_weather, [], region)
     
     def check_fungal_risk(self, current_weather: WeatherAnalysis,
-                         recent_weather: List[WeatherAnalysis]) -> Optional[VineyardAlert]:
+                         recent_weather: List[WeatherAnalysis],
+                         region: Optional[str] = None) -> Optional[VineyardAlert]:
         """
         Verifica risco de doenças fúngicas
         
@@ -166,49 +115,16 @@ class VineyardAnalyzer:
         Args:
             current_weather: Dados meteorológicos atuais
             recent_weather: Histórico recente
+            region: Região vitícola (parâmetros próprios, se definidos)
             
         Returns:
             VineyardAlert ou None
         """
-        config = self.config['fungal_risk']
-        
-        # Condições atuais favoráveis a fungos
-        humidity_high = current_weather.humidity >= config['humidity_high']
-        temp_favorable = (config['temp_min'] <= current_weather.temperature <= config['temp_max'])
-        
-        # Verificar condições prolongadas
-        favorable_hours = 0
-        for weather in recent_weather[-24:]:  # Últimas 24 horas
-            if (weather.humidity >= config['humidity_high'] and 
-                config['temp_min'] <= weather.temperature <= config['temp_max']):
-                favorable_hours += 1
-        
-        if humidity_high and temp_favorable and favorable_hours >= config['consecutive_hours']:
-            # Determinar nível de risco
-            if favorable_hours >= 12:
-                level = AlertLevel.HIGH
-                message = f"Risco alto de fungos: {favorable_hours}h de condições favoráveis"
-                recommendation = "Aplicar fungicida preventivo. Melhorar ventilação das plantas."
-            else:
-                level = AlertLevel.MEDIUM
-                message = f"Condições favoráveis a fungos: humidade {current_weather.humidity}%"
-                recommendation = "Monitorizar plantas. Preparar tratamento preventivo se necessário."
-            
-            return VineyardAlert(
-                alert_type=AlertType.FUNGAL_RISK,
-                level=level,
-                message=message,
-                recommendation=recommendation,
-                timestamp=datetime.now(),
-                city_id=0,
-                city_name="",
-                expires_at=datetime.now() + timedelta(hours=24)
-            )
-        
-        return None
+        return self._check('fungal_risk', current_weather, recent_weather, [], region)
     
     def check_harvest_conditions(self, current_weather: WeatherAnalysis,
-                               forecast_weather: List[WeatherAnalysis]) -> Optional[VineyardAlert]:
+                               forecast_weather: List[WeatherAnalysis],
+                               region: Optional[str] = None) -> Optional[VineyardAlert]:
         """
         Avalia condições para colheita
         
@@ -217,58 +133,18 @@ class VineyardAnalyzer:
         Args:
             current_weather: Dados meteorológicos atuais
             forecast_weather: Previsão meteorológica
+            region: Região vitícola (parâmetros próprios, se definidos)
             
         Returns:
             VineyardAlert ou None
         """
-        config = self.config['harvest']
-        
-        # Verificar estabilidade da temperatura
-        temps = [current_weather.temperature] + [w.temperature for w in forecast_weather[:config['days_forecast']]]
-        temp_variation = max(temps) - min(temps)
-        temp_stable = temp_variation <= config['temp_stability']
-        
-        # Verificar condições ideais
-        temp_ideal = config['ideal_temp_min'] <= current_weather.temperature <= config['ideal_temp_max']
-        wind_acceptable = current_weather.wind_speed <= config['max_wind_speed']
-        
-        # Verificar previsão de chuva
-        no_rain_forecast = all(w.precipitation <= 0.1 for w in forecast_weather[:3])  # Próximos 3 dias
-        
-        # Condições gerais favoráveis
-        good_conditions = (temp_stable and temp_ideal and wind_acceptable and 
-                          current_weather.weather_condition in ['Clear', 'Clouds'])
-        
-        if good_conditions and no_rain_forecast:
-            level = AlertLevel.HIGH
-            message = f"Condições excelentes para colheita: {current_weather.temperature:.1f}°C, tempo estável"
-            recommendation = "Janela ideal para colheita. Próximos 2-3 dias favoráveis."
-        elif good_conditions:
-            level = AlertLevel.MEDIUM
-            message = f"Condições boas, mas chuva prevista"
-            recommendation = "Considerar colheita urgente antes da chuva."
-        elif temp_ideal and wind_acceptable:
-            level = AlertLevel.LOW
-            message = f"Condições aceitáveis para colheita"
-            recommendation = "Colheita possível, mas monitorizar evolução meteorológica."
-        else:
-            return None
-        
-        return VineyardAlert(
-            alert_type=AlertType.HARVEST_SUGGESTION,
-            level=level,
-            message=message,
-            recommendation=recommendation,
-            timestamp=datetime.now(),
-            city_id=0,
-            city_name="",
-            expires_at=datetime.now() + timedelta(hours=48)
-        )
+        return self._check('harvest', current_weather, [], forecast_weather, region)
     
     def analyze_all_conditions(self, current_weather: WeatherAnalysis,
                              recent_weather: List[WeatherAnalysis],
                              forecast_weather: List[WeatherAnalysis],
-                             city_id: int, city_name: str) -> List[VineyardAlert]:
+                             city_id: int, city_name: str,
+                             region: Optional[str] = None) -> List[VineyardAlert]:
         """
         Executa todas as análises e retorna lista de alertas
         
@@ -278,31 +154,18 @@ class VineyardAnalyzer:
             forecast_weather: Previsão meteorológica
             city_id: ID da cidade
             city_name: Nome da cidade
+            region: Região vitícola (parâmetros próprios, se definidos)
             
         Returns:
             Lista de alertas ativos
         """
-        alerts = []
-        
-        # Verificar necessidade de rega
-        irrigation_alert = self.check_irrigation_need(current_weather, recent_weather)
-        if irrigation_alert:
-            irrigation_alert.city_id = city_id
-            irrigation_alert.city_name = city_name
-            alerts.append(irrigation_alert)
-        
-        # Verificar risco de fungos
-        fungal_alert = self.check_fungal_risk(current_weather, recent_weather)
-        if fungal_alert:
-            fungal_alert.city_id = city_id
-            fungal_alert.city_name = city_name
-            alerts.append(fungal_alert)
+        started = time.perf_counter()
         
-        # Verificar condições de colheita
-        harvest_alert = self.check_harvest_conditions(current_weather, forecast_weather)
-        if harvest_alert:
-            harvest_alert.city_id = city_id
-            harvest_alert.city_name = city_name
-            alerts.append(harvest_alert)
+        # Rega, risco de fungos e colheita (e outras regras do ficheiro)
+        alerts = self.rules.evaluate(current_weather, recent_weather, forecast_weather, region=region)
+        for alert in alerts:
+            alert.city_id = city_id
+            alert.city_name = city_name
         
+        metrics.ANALYZER_SECONDS.observe(time.perf_counter() - started)
         return alerts
\ No newline at end of file
@@ -2,6 +2,11 @@ import requests
 import os
 from datetime import datetime, timedelta
 from app.models import db, Weather
+from app import metrics
+from app.tracing import tracer
+from app.services.station_registry import StationRegistry
+from app.services.owm_client import OWMClient, CircuitBreaker, RetryBudget
+from contextlib import ExitStack
 import threading
 import time
 from typing import Dict, List, Optional
@@ -13,23 +18,59 @@ class WeatherService:
     e armazenar na base de dados.
     """
     
-    def __init__(self, app=None):
+    def __init__(self, app=None, station_registry=None):
         self.api_key = os.getenv('OPENWEATHER_API_KEY')
-        self.base_url = "http://api.openweathermap.org/data/2.5/weather"
+        # Permite apontar para um servidor local (ex.: loadtest/fake_owm_server.py)
+        self.api_root = os.getenv('OPENWEATHER_BASE_URL', 'http://api.openweathermap.org/data/2.5').rstrip('/')
+        self.base_url = f"{self.api_root}/weather"
+        self.request_timeout = float(os.getenv('OPENWEATHER_TIMEOUT', '10'))
+        
+        # Cliente HTTP com circuito, orçamento de repetições e hedging opcional
+        self.client = OWMClient(
+            connect_timeout=float(os.getenv('OPENWEATHER_CONNECT_TIMEOUT', '3.05')),
+            read_timeout=self.request_timeout,
+            deadline=float(os.getenv('OPENWEATHER_DEADLINE', str(self.request_timeout))),
+            max_retries=int(os.getenv('OPENWEATHER_MAX_RETRIES', '2')),
+            # Um circuito por endpoint (weather, group, forecast)
+            breaker_factory=lambda endpoint: CircuitBreaker(
+                endpoint,
+                failure_threshold=int(os.getenv('OPENWEATHER_BREAKER_FAILURES', '3')),
+                reset_seconds=float(os.getenv('OPENWEATHER_BREAKER_RESET_SECONDS', '30'))
+            ),
+            budget=RetryBudget(ratio=float(os.getenv('OPENWEATHER_RETRY_BUDGET', '0.2'))),
+            hedge_enabled=os.getenv('OPENWEATHER_HEDGE_ENABLED', 'false').lower() == 'true',
+            hedge_percentile=float(os.getenv('OPENWEATHER_HEDGE_PERCENTILE', '95'))
+        )
         self.is_collecting = False
         self._observers = []
         self.app = app
         
-        # Cidades portuguesas para vindimas
-        self.cities = [
-            {"name": "Peso da Régua", "lat": 41.16, "lon": -7.78, "region": "Douro"},
-            {"name": "Évora", "lat": 38.57, "lon": -7.91, "region": "Alentejo"},
-            {"name": "Reguengos de Monsaraz", "lat": 38.42, "lon": -7.54, "region": "Alentejo"},
-            {"name": "Palmela", "lat": 38.57, "lon": -8.90, "region": "Setúbal"},
-            {"name": "Porto", "lat": 41.15, "lon": -8.61, "region": "Vinho Verde"},
-            {"name": "Lisbon", "lat": 38.72, "lon": -9.14, "region": "Lisboa"},
-            {"name": "Braga", "lat": 41.55, "lon": -8.42, "region": "Vinho Verde"}
-        ]
+        # Coleta em grupo: até 20 IDs por pedido (limite da API)
+        self.group_url = f"{self.api_root}/group"
+        self.group_size = max(1, min(int(os.getenv('OPENWEATHER_GROUP_SIZE', '20')), 20))
+        
+        # Estações monitorizadas (tabela stations, recarregada sem reiniciar)
+        self.station_registry = station_registry or StationRegistry()
+        
+        # Previsões atualizadas na coleta periódica (ver get_forecast_service)
+        self.forecast_service = None
+        
+        # Histórico recente em memória (ver get_history_store)
+        self.history_store = None
+        
+        # Arquivo colunar em disco (ver get_history_archive)
+        self.history_archive = None
+        
+        # Escrita diferida das observações (ver get_write_queue)
+        self.write_queue = None
+        
+        # Snapshot das condições atuais (ver get_current_conditions)
+        self.current_conditions = None
+    
+    @property
+    def cities(self) -> List[Dict]:
+        """Estações ativas do registo"""
+        return self.station_registry.stations
     
     def add_observer(self, observer):
         """Adicionar observador para notificações (Observer Pattern)"""
@@ -45,16 +86,18 @@ class WeatherService:
         for observer in self._observers:
             observer.update(data)
     
-    def fetch_weather_data(self, city: Dict) -> Optional[Dict]:
+    def fetch_weather_data(self, city: Dict, deadline: Optional[float] = None) -> Optional[Dict]:
         """
         Buscar dados meteorológicos para uma cidade específica
         
         Args:
             city (Dict): Dicionário com informações da cidade
+            deadline (float, optional): Segundos máximos para o pedido
             
         Returns:
             Optional[Dict]: Dados meteorológicos ou None se erro
         """
+        started = time.perf_counter()
         try:
             params = {
                 'lat': city['lat'],
@@ -64,25 +107,69 @@ class WeatherService:
                 'lang': 'pt'
             }
             
-            response = requests.get(self.base_url, params=params, timeout=10)
-            response.raise_for_status()
+            response = self.client.get(self.base_url, params, endpoint='weather', deadline=deadline)
             
             data = response.json()
+            data['name'] = city['name']  # Nome da estação no registo
             data['region'] = city['region']  # Adicionar região
             
             return data
             
         except requests.exceptions.RequestException as e:
             print(f"Erro ao buscar dados para {city['name']}: {e}")
+            metrics.OWM_FETCH_ERRORS.inc(station=city['name'], reason=type(e).__name__)
             return None
         except Exception as e:
             print(f"Erro inesperado para {city['name']}: {e}")
+            metrics.OWM_FETCH_ERRORS.inc(station=city['name'], reason='unexpected')
             return None
+        finally:
+            metrics.OWM_FETCH_SECONDS.observe(time.perf_counter() - started, station=city['name'])
+    
+    def fetch_group_weather(self, cities: List[Dict], deadline: Optional[float] = None) -> Dict[int, Dict]:
+        """
+        Buscar dados de várias estações num só pedido (endpoint /group)
+        
+        Args:
+            cities (List[Dict]): Estações com owm_id (no máximo group_size)
+            deadline (float, optional): Segundos máximos para o pedido
+            
+        Returns:
+            Dict[int, Dict]: Dados meteorológicos indexados pelo owm_id
+        """
+        started = time.perf_counter()
+        ids = sorted({city['owm_id'] for city in cities})
+        try:
+            params = {
+                'id': ','.join(str(owm_id) for owm_id in ids),
+                'appid': self.api_key,
+                'units': 'metric',  # Celsius
+                'lang': 'pt'
+            }
+            
+            response = self.client.get(self.group_url, params, endpoint='group', deadline=deadline)
+            
+            return {item['id']: item for item in response.json().get('list', [])}
+            
+        except requests.exceptions.RequestException as e:
+            print(f"Erro ao buscar dados do grupo ({len(ids)} IDs): {e}")
+            metrics.OWM_FETCH_ERRORS.inc(station='group', reason=type(e).__name__)
+            return {}
+        except Exception as e:
+            print(f"Erro inesperado no grupo ({len(ids)} IDs): {e}")
+            metrics.OWM_FETCH_ERRORS.inc(station='group', reason='unexpected')
+            return {}
+        finally:
+            metrics.OWM_FETCH_SECONDS.observe(time.perf_counter() - started, station='group')
     
     def save_weather_to_db(self, weather_data: Dict) -> bool:
         """
         Salvar dados meteorológicos na base de dados
         
+        Com a escrita diferida ativa, a observação é posta na fila e
+        gravada pelo writer (o histórico em memória e o arquivo são
+        atualizados depois do commit).
+        
         Args:
             weather_data (Dict): Dados da API OpenWeatherMap
             
@@ -90,78 +177,13 @@ class WeatherService:
             bool: True se salvou com sucesso, False caso contrário
         """
         try:
-            # Extrair dados do JSON da API
-            weather_info = weather_data['weather'][0] if weather_data.get('weather') else {}
-            main_data = weather_data.get('main', {})
-            wind_data = weather_data.get('wind', {})
-            clouds_data = weather_data.get('clouds', {})
-            rain_data = weather_data.get('rain', {})
-            sys_data = weather_data.get('sys', {})
-            coord_data = weather_data.get('coord', {})
+            if self.write_queue is not None:
+                self.write_queue.enqueue('weather', weather_data)
+                return True
             
-            weather = Weather(
-                # Coordenadas
-                lon=coord_data.get('lon'),
-                lat=coord_data.get('lat'),
-                
-                # Informações do tempo
-                weather_id=weather_info.get('id'),
-                weather_main=weather_info.get('main'),
-                weather_description=weather_info.get('description'),
-                weather_icon=weather_info.get('icon'),
-                
-                # Base
-                base=weather_data.get('base'),
-                
-                # Dados principais
-                temp=main_data.get('temp'),
-                feels_like=main_data.get('feels_like'),
-                temp_min=main_data.get('temp_min'),
-                temp_max=main_data.get('temp_max'),
-                pressure=main_data.get('pressure'),
-                humidity=main_data.get('humidity'),
-                sea_level=main_data.get('sea_level'),
-                grnd_level=main_data.get('grnd_level'),
-                
-                # Visibilidade
-                visibility=weather_data.get('visibility'),
-                
-                # Vento
-                wind_speed=wind_data.get('speed'),
-                wind_deg=wind_data.get('deg'),
-                wind_gust=wind_data.get('gust'),
-                
-                # Chuva
-                rain_1h=rain_data.get('1h'),
-                
-                # Nuvens
-                clouds_all=clouds_data.get('all'),
-                
-                # Timestamp
-                dt=weather_data.get('dt'),
-                
-                # Sistema
-                sys_type=sys_data.get('type'),
-                sys_id=sys_data.get('id'),
-                country=sys_data.get('country'),
-                sunrise=sys_data.get('sunrise'),
-                sunset=sys_data.get('sunset'),
-                
-                # Timezone
-                timezone=weather_data.get('timezone'),
-                
-                # ID e nome da cidade
-                city_id=weather_data.get('id'),
-                name=weather_data.get('name'),
-                
-                # Código
-                cod=weather_data.get('cod')
-            )
-            
-            db.session.add(weather)
+            after_commit = self.apply_weather_write(weather_data)
             db.session.commit()
-            
-            print(f"Dados salvos para {weather_data.get('name')}")
+            after_commit()
             return True
             
         except Exception as e:
@@ -169,26 +191,125 @@ class WeatherService:
             db.session.rollback()
             return False
     
-    def collect_all_cities_data(self):
-        """Coletar dados para todas as cidades"""
+    def apply_weather_write(self, weather_data: Dict, replayed: bool = False):
+        """
+        Adicionar uma observação à sessão, sem commit
+        
+        Args:
+            weather_data (Dict): Dados da API OpenWeatherMap
+            replayed (bool): Reaplicada do journal da escrita diferida
+                (ignorada se já foi gravada)
+            
+        Returns:
+            Callable: Ações a fazer depois do commit
+        """
+        weather = Weather.from_api(weather_data)
+        if replayed and Weather.query.filter_by(name=weather.name, dt=weather.dt).first():
+            return None
+        
+        db.session.add(weather)
+        db.session.flush()
+        record = weather.to_dict()
+        return lambda: self._on_weather_saved(record)
+    
+    def _on_weather_saved(self, record: Dict):
+        """Atualizar métricas, histórico em memória e arquivo após o commit"""
+        metrics.WEATHER_ROWS_WRITTEN.inc()
+        metrics.recent_weather_rows.add()
+        
+        if self.history_store is not None:
+            self.history_store.append(record)
+        if self.history_archive is not None:
+            self.history_archive.append(record)
+        if self.current_conditions is not None:
+            self.current_conditions.invalidate()
+        
+        print(f"Dados salvos para {record['name']}")
+    
+    def collect_all_cities_data(self, deadline_seconds: Optional[float] = None):
+        """
+        Coletar dados para todas as estações
+        
+        Estações com owm_id (definido pelo operador) são pedidas em grupos
+        de até 20 IDs; as restantes por coordenadas. O ID devolvido numa
+        pesquisa por coordenadas é o da cidade mais próxima e não é
+        guardado: usá-lo no /group trocaria os dados da estação pelos
+        dessa cidade.
+        
+        Args:
+            deadline_seconds (float, optional): Duração máxima do ciclo; os
+                pedidos ainda não feitos quando o prazo acaba são saltados
+        """
         collected_data = []
+        cycle_started = time.perf_counter()
+        # Tempo que resta do ciclo (None sem prazo), passado como prazo de cada pedido
+        remaining = lambda: (None if deadline_seconds is None
+                             else deadline_seconds - (time.perf_counter() - cycle_started))
+        expired = lambda: deadline_seconds is not None and remaining() <= 0
         
-        for city in self.cities:
-            weather_data = self.fetch_weather_data(city)
+        # Aplicar alterações ao registo de estações feitas desde o último ciclo
+        self.station_registry.refresh_if_changed()
+        cities = list(self.cities)
+        grouped = [city for city in cities if city.get('owm_id')]
+        individual = [city for city in cities if not city.get('owm_id')]
+        
+        for start in range(0, len(grouped), self.group_size):
+            batch = grouped[start:start + self.group_size]
+            if expired():
+                print(f"Prazo da coleta esgotado: {len(batch)} estações do grupo saltadas")
+                continue
+            # Um trace por estação; o fetch é partilhado pelo grupo
+            traces = [tracer.start_trace(city['name']) for city in batch]
+            with ExitStack() as stack:
+                for trace in traces:
+                    stack.enter_context(trace.span('fetch'))
+                results = self.fetch_group_weather(batch, deadline=remaining())
+            
+            for city, trace in zip(batch, traces):
+                item = results.get(city['owm_id'])
+                if item is None:
+                    print(f"Sem dados no grupo para {city['name']} (owm_id {city['owm_id']})")
+                    continue
+                # Cópia: várias estações podem partilhar o mesmo owm_id
+                weather_data = dict(item, name=city['name'], region=city['region'])
+                if self._process_observation(city, weather_data, trace):
+                    collected_data.append(weather_data)
+        
+        for city in individual:
+            if expired():
+                print(f"Prazo da coleta esgotado: {city['name']} saltada")
+                continue
+            # Trace da observação desde o fetch até ao envio aos clientes
+            trace = tracer.start_trace(city['name'])
+            with trace.span('fetch'):
+                weather_data = self.fetch_weather_data(city, deadline=remaining())
             if weather_data:
-                success = self.save_weather_to_db(weather_data)
-                if success:
+                if self._process_observation(city, weather_data, trace):
                     collected_data.append(weather_data)
-                    # Notificar observadores
-                    self.notify_observers({
-                        'type': 'weather_update',
-                        'city': city['name'],
-                        'data': weather_data,
-                        'timestamp': datetime.utcnow().isoformat()
-                    })
+        
+        metrics.COLLECTION_CYCLE_SECONDS.observe(time.perf_counter() - cycle_started)
+        metrics.COLLECTION_ROWS_LAST_CYCLE.set(len(collected_data))
         
         return collected_data
     
+    def _process_observation(self, city: Dict, weather_data: Dict, trace) -> bool:
+        """Gravar uma observação e notificar os observadores"""
+        trace.observed_at = weather_data.get('dt')
+        with trace.span('save'):
+            success = self.save_weather_to_db(weather_data)
+        if success:
+            # Notificar observadores
+            with trace.span('notify'):
+                self.notify_observers({
+                    'type': 'weather_update',
+                    'city': city['name'],
+                    'data': weather_data,
+                    'timestamp': datetime.utcnow().isoformat(),
+                    'trace': trace
+                })
+            tracer.record(trace)
+        return success
+    
     def start_periodic_collection(self, interval_minutes: int = 30):
         """
         Iniciar coleta periódica de dados
@@ -210,6 +331,9 @@ class WeatherService:
                     # IMPORTANTE: Usar o contexto da aplicação na thread
                     with self.app.app_context():
                         self.collect_all_cities_data()
+                        # Só pede à API as previsões com mais de FORECAST_REFRESH_MINUTES
+                        if self.forecast_service:
+                            self.forecast_service.refresh_stale(self.cities)
                     
                     print(f"Coleta concluída - {datetime.now()}")
                     
@@ -235,6 +359,9 @@ class WeatherService:
         """
         Obter dados meteorológicos mais recentes
         
+        Com o snapshot das condições atuais ativo, devolve o último
+        resultado bom mesmo que a BD esteja lenta ou indisponível.
+        
         Args:
             city_name (str, optional): Nome da cidade específica
             
@@ -242,20 +369,35 @@ class WeatherService:
             List[Dict]: Lista de dados meteorológicos
         """
         try:
-            query = Weather.query
-            
-            if city_name:
-                query = query.filter_by(name=city_name)
-            
-            # Obter registros mais recentes (últimas 24 horas)
-            yesterday = datetime.utcnow() - timedelta(hours=24)
-            query = query.filter(Weather.created_at >= yesterday)
-            
-            # Ordenar por data de criação (mais recente primeiro)
-            weather_records = query.order_by(Weather.created_at.desc()).all()
-            
-            return [record.to_dict() for record in weather_records]
+            if self.current_conditions is not None:
+                return self.current_conditions.get(city_name)["data"]
+            return self.query_latest_weather(city_name)
             
         except Exception as e:
             print(f"Erro ao buscar dados da BD: {e}")
-            return []
\ No newline at end of file
+            return []
+    
+    def query_latest_weather(self, city_name: str = None) -> List[Dict]:
+        """
+        Consultar na BD as observações das últimas 24 horas
+        
+        Args:
+            city_name (str, optional): Nome da cidade específica
+            
+        Returns:
+            List[Dict]: Observações, mais recentes primeiro (erros da BD
+            são propagados)
+        """
+        query = Weather.query
+        
+        if city_name:
+            query = query.filter_by(name=city_name)
+        
+        # Obter registros mais recentes (últimas 24 horas)
+        yesterday = datetime.utcnow() - timedelta(hours=24)
+        query = query.filter(Weather.created_at >= yesterday)
+        
+        # Ordenar por data de criação (mais recente primeiro)
+        weather_records = query.order_by(Weather.created_at.desc()).all()
+        
+        return [record.to_dict() for record in weather_records]
@@ -0,0 +1,347 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app.models import db
+from app import metrics
+
+# Garantias de durabilidade de uma escrita aceite (ver WriteBehindQueue)
+DURABILITY_MODES = ("memory", "journal", "fsync")
+
+JOURNAL_FILE = "write_behind.journal"
+CHECKPOINT_FILE = "write_behind.checkpoint"
+DEAD_LETTER_FILE = "write_behind.dead"
+
+
+class WriteQueueFull(Exception):
+    """A fila de escrita diferida continuou cheia durante enqueue_timeout"""
+
+
+@dataclass
+class WriteOperation:
+    seq: int
+    kind: str
+    payload: Dict
+    enqueued_at: float
+    replayed: bool = False
+
+
+class WriteBehindQueue:
+    """
+    Escrita diferida na base de dados
+
+    As rotas e a coleta põem operações (tipo e dados JSON) numa fila
+    limitada a max_size e seguem sem esperar pelo commit. Um único
+    writer aplica as operações pela ordem de chegada, com os handlers
+    registados por tipo, e faz um commit por lote de até batch_size
+    operações (espera no máximo flush_interval segundos por um lote
+    cheio). O que depende do commit (id gerado, histórico em memória,
+    eventos WebSocket) é feito pelo callback devolvido pelo handler.
+
+    Durabilidade de uma operação aceite:
+        memory: só em memória; perde-se se o processo terminar sem
+            close() (o fecho normal do interpretador faz flush)
+        journal: escrita no journal antes de enqueue() devolver;
+            sobrevive à queda do processo e é reaplicada no arranque
+        fsync: como journal, com fsync; sobrevive à queda da máquina
+
+    Com a fila cheia, enqueue() espera até enqueue_timeout segundos e
+    depois lança WriteQueueFull. Se a BD estiver indisponível o writer
+    repete o lote (as operações não se perdem) e a fila enche. Uma
+    operação que falha sozinha com a BD a responder (ex.: tabela
+    inexistente) é descartada para DEAD_LETTER_FILE em journal_dir, para
+    não bloquear o writer.
+    """
+
+    def __init__(self, app, max_size: int = 10000, batch_size: int = 200,
+                 flush_interval: float = 0.05, durability: str = "memory",
+                 journal_dir: str = "write_behind", enqueue_timeout: float = 5.0,
+                 shutdown_timeout: float = 30.0, max_retries: int = 5):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Durabilidade inválida: {durability} (esperado: {', '.join(DURABILITY_MODES)})")
+        self.app = app
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self.journal_dir = journal_dir
+        self.enqueue_timeout = enqueue_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self.max_retries = max_retries
+
+        self._handlers: Dict[str, Callable] = {}
+        self._queue: "queue.Queue[Optional[WriteOperation]]" = queue.Queue()
+        # Lugares livres na fila (backpressure)
+        self._slots = threading.BoundedSemaphore(max_size)
+        # Número de sequência e escrita no journal pela mesma ordem da fila
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._committed_seq = 0
+        self._journal = None
+        self._thread = None
+        self._closed = False
+        self._dead_lettered = 0
+
+    def register(self, kind: str, handler: Callable):
+        """
+        Registar o handler de um tipo de operação
+
+        O handler recebe (payload, replayed), aplica a operação na sessão
+        sem fazer commit e pode devolver um callback chamado depois do
+        commit. replayed é True para operações reaplicadas do journal,
+        que podem já ter sido gravadas antes da queda.
+        """
+        self._handlers[kind] = handler
+
+    def start(self):
+        """Reaplicar o journal pendente e iniciar o writer"""
+        if self._thread is not None:
+            return
+        if self.durability != "memory":
+            os.makedirs(self.journal_dir, exist_ok=True)
+            self._recover()
+            self._journal = open(os.path.join(self.journal_dir, JOURNAL_FILE), 'a', encoding='utf-8')
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _recover(self):
+        """Pôr na fila as operações do journal posteriores ao último commit"""
+        self._committed_seq = self._read_checkpoint()
+        self._seq = self._committed_seq
+        path = os.path.join(self.journal_dir, JOURNAL_FILE)
+        if not os.path.exists(path):
+            return
+
+        pending = 0
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # última linha incompleta (escrita interrompida)
+                self._seq = max(self._seq, entry["seq"])
+                if entry["seq"] > self._committed_seq:
+                    # Fora do limite da fila (não ocupam lugares)
+                    self._queue.put(WriteOperation(entry["seq"], entry["kind"], entry["payload"],
+                                                   time.time(), replayed=True))
+                    pending += 1
+        if pending:
+            print(f"Escrita diferida: {pending} operações do journal por aplicar")
+        metrics.WRITE_BEHIND_QUEUE_DEPTH.set(self._queue.qsize())
+
+    def _read_checkpoint(self) -> int:
+        try:
+            with open(os.path.join(self.journal_dir, CHECKPOINT_FILE), encoding='utf-8') as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _write_checkpoint(self, seq: int):
+        path = os.path.join(self.journal_dir, CHECKPOINT_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(str(seq))
+            if self.durability == "fsync":
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+    def enqueue(self, kind: str, payload: Dict):
+        """
+        Aceitar uma operação para escrita diferida
+
+        Args:
+            kind (str): Tipo de operação (handler registado)
+            payload (Dict): Dados da operação (serializáveis em JSON)
+
+        Raises:
+            WriteQueueFull: Fila cheia durante enqueue_timeout segundos
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Tipo de escrita sem handler: {kind}")
+        if self._closed:
+            raise RuntimeError("Fila de escrita diferida fechada")
+        if not self._slots.acquire(timeout=self.enqueue_timeout):
+            metrics.WRITE_BEHIND_REJECTED.inc(kind=kind)
+            raise WriteQueueFull(f"Fila de escrita cheia ({self.max_size} operações)")
+
+        with self._lock:
+            self._seq += 1
+            operation = WriteOperation(self._seq, kind, payload, time.time())
+            if self._journal is not None:
+                self._journal.write(json.dumps({"seq": operation.seq, "kind": kind, "payload": payload},
+                                               ensure_ascii=False) + '\n')
+                self._journal.flush()
+                if self.durability == "fsync":
+                    os.fsync(self._journal.fileno())
+            self._queue.put(operation)
+        metrics.WRITE_BEHIND_QUEUE_DEPTH.set(self._queue.qsize())
+
+    def _take_batch(self) -> Optional[List[WriteOperation]]:
+        """Próximo lote (None depois de close() com a fila vazia)"""
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                operation = self._queue.get(timeout=max(remaining, 0)) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if operation is None:
+                # Fecho: escrever o que já foi recolhido e terminar a seguir
+                self._queue.put(None)
+                break
+            batch.append(operation)
+        return batch
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                batch = self._take_batch()
+                if batch is None:
+                    return
+                self._write_batch(batch)
+                for operation in batch:
+                    if not operation.replayed:
+                        self._slots.release()
+                metrics.WRITE_BEHIND_QUEUE_DEPTH.set(self._queue.qsize())
+
+    def _apply(self, operations: List[WriteOperation]) -> List[Callable]:
+        """Aplicar as operações na sessão e fazer commit (devolve os callbacks)"""
+        callbacks = []
+        for operation in operations:
+            after_commit = self._handlers[operation.kind](operation.payload, operation.replayed)
+            if after_commit is not None:
+                callbacks.append(after_commit)
+        db.session.commit()
+        return callbacks
+
+    def _write_batch(self, batch: List[WriteOperation]):
+        """
+        Gravar um lote numa transação
+
+        Se o lote falhar por uma operação inválida, as operações são
+        repetidas uma a uma e só as que falham são descartadas. Erros de
+        ligação (OperationalError) repetem o lote com espera crescente;
+        depois de max_retries tentativas, se a BD responder a um SELECT 1
+        o erro é tratado como uma operação inválida.
+        """
+        delay = 0.5
+        attempts = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                callbacks = self._apply(batch)
+                break
+            except OperationalError as e:
+                db.session.rollback()
+                attempts += 1
+                if attempts < self.max_retries or not self._database_available():
+                    print(f"Escrita diferida: BD indisponível, nova tentativa em {delay:.1f}s ({e})")
+                    metrics.WRITE_BEHIND_RETRIES.inc()
+                    time.sleep(delay)
+                    delay = min(delay * 2, 30.0)
+                    continue
+                # A BD responde: o erro vem das operações (ex.: esquema), não da ligação
+                error = e
+            except Exception as e:
+                db.session.rollback()
+                error = e
+            if len(batch) == 1:
+                self._dead_letter(batch[0], error)
+                callbacks = []
+                break
+            for operation in batch:
+                self._write_batch([operation])
+            return
+        metrics.WRITE_BEHIND_BATCH_SIZE.observe(len(batch))
+        metrics.WRITE_BEHIND_COMMIT_SECONDS.observe(time.perf_counter() - started)
+
+        now = time.time()
+        for operation in batch:
+            metrics.WRITE_BEHIND_LAG_SECONDS.observe(now - operation.enqueued_at)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Erro após escrita diferida: {e}")
+
+        self._mark_committed(batch[-1].seq)
+
+    def _database_available(self) -> bool:
+        """True se a BD responde (distingue uma queda de uma operação inválida)"""
+        try:
+            db.session.execute(text('SELECT 1'))
+            return True
+        except Exception:
+            return False
+        finally:
+            db.session.rollback()
+
+    def _dead_letter(self, operation: WriteOperation, error: Exception):
+        """Descartar uma operação que não pode ser gravada (guardada em DEAD_LETTER_FILE)"""
+        print(f"Escrita diferida: operação {operation.kind} descartada: {error}")
+        metrics.WRITE_BEHIND_FAILED.inc(kind=operation.kind)
+        self._dead_lettered += 1
+        try:
+            os.makedirs(self.journal_dir, exist_ok=True)
+            with open(os.path.join(self.journal_dir, DEAD_LETTER_FILE), 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"seq": operation.seq, "kind": operation.kind, "payload": operation.payload,
+                                    "error": str(error), "failed_at": time.time()}, ensure_ascii=False) + '\n')
+        except OSError as e:
+            print(f"Erro ao guardar operação descartada: {e}")
+
+    def _mark_committed(self, seq: int):
+        """Avançar o checkpoint e esvaziar o journal quando tudo está gravado"""
+        self._committed_seq = max(self._committed_seq, seq)
+        if self._journal is None:
+            return
+        self._write_checkpoint(self._committed_seq)
+        with self._lock:
+            if self._committed_seq == self._seq:
+                self._journal.truncate(0)
+                self._journal.seek(0)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Esperar que as operações aceites até agora estejam gravadas"""
+        target = self._seq
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._committed_seq < target:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self):
+        """Gravar as operações em fila e parar o writer (registado em atexit)"""
+        if self._closed or self._thread is None:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=self.shutdown_timeout)
+        if self._thread.is_alive():
+            # O que ficar por gravar continua no journal (exceto em memory)
+            print(f"Escrita diferida: {self._queue.qsize()} operações por gravar no fecho")
+        elif self._journal is not None:
+            with self._lock:
+                self._journal.close()
+                self._journal = None
+
+    def get_stats(self) -> Dict:
+        return {
+            "durability": self.durability,
+            "queued": self._queue.qsize(),
+            "max_size": self.max_size,
+            "last_seq": self._seq,
+            "committed_seq": self._committed_seq,
+            "dead_lettered": self._dead_lettered
+        }
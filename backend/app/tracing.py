@@ -0,0 +1,161 @@
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    """Percentil por interpolação linear sobre uma lista ordenada"""
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+class Trace:
+    """
+    Trace de uma observação ao longo do pipeline de ingestão
+
+    Cada etapa (fetch, save, notify, websocket_emit) fica registada como
+    span com início relativo e duração em milissegundos.
+    """
+
+    def __init__(self, station: str):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.station = station
+        self.started_at = time.time()
+        self.observed_at: Optional[int] = None
+        self.spans: List[Dict] = []
+        self._started = time.perf_counter()
+        self._finished = None
+
+    @contextmanager
+    def span(self, stage: str):
+        """Medir uma etapa do pipeline"""
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            end = time.perf_counter()
+            self.spans.append({
+                "stage": stage,
+                "start_ms": round((start - self._started) * 1000, 3),
+                "duration_ms": round((end - start) * 1000, 3)
+            })
+
+    def finish(self):
+        self._finished = time.perf_counter()
+
+    @property
+    def pipeline_ms(self) -> float:
+        """Do início do fetch ao fim do trace"""
+        end = self._finished or time.perf_counter()
+        return round((end - self._started) * 1000, 3)
+
+    @property
+    def observation_age_ms(self) -> Optional[float]:
+        """Da hora da observação (dt da API) ao fim do trace"""
+        if self.observed_at is None:
+            return None
+        finished_at = self.started_at + self.pipeline_ms / 1000
+        return round((finished_at - self.observed_at) * 1000, 3)
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "station": self.station,
+            "started_at": self.started_at,
+            "observed_at": self.observed_at,
+            "pipeline_ms": self.pipeline_ms,
+            "observation_age_ms": self.observation_age_ms,
+            "spans": self.spans
+        }
+
+
+class TraceCollector:
+    """
+    Recolhe traces concluídos num anel em memória e, opcionalmente,
+    num ficheiro JSON Lines
+    """
+
+    def __init__(self, buffer_size: int = 5000, file_path: Optional[str] = None, enabled: bool = True):
+        self.enabled = enabled
+        self.file_path = file_path
+        self._ring = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+
+    def configure(self, buffer_size: int = None, file_path: Optional[str] = None, enabled: bool = None):
+        """Aplicar a configuração da app"""
+        with self._lock:
+            if buffer_size is not None and buffer_size != self._ring.maxlen:
+                self._ring = deque(self._ring, maxlen=buffer_size)
+            if enabled is not None:
+                self.enabled = enabled
+            self.file_path = file_path
+
+    def start_trace(self, station: str) -> Trace:
+        return Trace(station)
+
+    def record(self, trace: Trace):
+        """Guardar um trace concluído"""
+        if not self.enabled:
+            return
+        trace.finish()
+        entry = trace.to_dict()
+        with self._lock:
+            self._ring.append(entry)
+            if self.file_path:
+                with open(self.file_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def recent(self, station: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Traces mais recentes primeiro"""
+        with self._lock:
+            entries = list(self._ring)
+        if station:
+            entries = [entry for entry in entries if entry['station'] == station]
+        return entries[::-1][:limit]
+
+    def latency_summary(self, station: Optional[str] = None) -> Dict:
+        """
+        Percentis por estação de cada etapa, do pipeline completo e da
+        idade da observação quando chega aos clientes
+
+        Returns:
+            Dict: {estação: {métrica: {count, p50_ms, p95_ms, p99_ms, max_ms}}}
+        """
+        with self._lock:
+            entries = list(self._ring)
+
+        samples: Dict[str, Dict[str, List[float]]] = {}
+        for entry in entries:
+            if station and entry['station'] != station:
+                continue
+            metrics = samples.setdefault(entry['station'], {})
+            metrics.setdefault('pipeline', []).append(entry['pipeline_ms'])
+            if entry['observation_age_ms'] is not None:
+                metrics.setdefault('observation_to_client', []).append(entry['observation_age_ms'])
+            for span in entry['spans']:
+                metrics.setdefault(span['stage'], []).append(span['duration_ms'])
+
+        summary = {}
+        for station_name, metrics in samples.items():
+            summary[station_name] = {}
+            for name, values in metrics.items():
+                ordered = sorted(values)
+                summary[station_name][name] = {
+                    "count": len(ordered),
+                    "p50_ms": round(_percentile(ordered, 50), 3),
+                    "p95_ms": round(_percentile(ordered, 95), 3),
+                    "p99_ms": round(_percentile(ordered, 99), 3),
+                    "max_ms": round(ordered[-1], 3)
+                }
+        return summary
+
+
+tracer = TraceCollector()
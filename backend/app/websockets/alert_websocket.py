@@ -0,0 +1,231 @@
+import heapq
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+from flask_socketio import SocketIO, emit, join_room, leave_room
+from app import metrics
+
+# Ordem de entrega quando há eventos em espera (crítico primeiro)
+LEVEL_PRIORITY = {"crítico": 0, "alto": 1, "médio": 2, "baixo": 3}
+
+# Eventos entregues sempre de imediato (ações do utilizador e fim do alerta)
+UNTHROTTLED_EVENTS = {"acknowledged", "deactivated", "expired"}
+
+ALL_ALERTS_ROOM = "alerts"
+
+
+class AlertWebSocket:
+    """
+    Canal WebSocket dos eventos do ciclo de vida dos alertas
+
+    Eventos (`alert_event`): created, escalated, updated, acknowledged,
+    deactivated e expired, emitidos para a sala da cidade (`city_<nome>`)
+    e para a sala de todos os alertas (`alerts`). Cada evento entregue
+    tem um número de sequência; os últimos buffer_size ficam em memória
+    para os clientes pedirem os que perderam (`replay_alerts`).
+
+    Eventos iguais ao último enviado para o mesmo alerta (cidade e
+    tipo) são descartados e, num alerta que oscila, é entregue no
+    máximo um evento a cada min_interval segundos (o mais recente; os
+    intermédios são descartados). Alertas críticos e os eventos em
+    UNTHROTTLED_EVENTS não esperam. A fila de entrega é ordenada pelo
+    nível do alerta.
+    """
+
+    def __init__(self, socketio: SocketIO, app=None, buffer_size: int = 1000,
+                 min_interval: float = 30.0, expiry_check_seconds: float = 60.0):
+        self.socketio = socketio
+        self.app = app
+        self.min_interval = min_interval
+        self.expiry_check_seconds = expiry_check_seconds
+
+        self._lock = threading.Condition()
+        self._queue: List = []  # heap (prioridade, ordem, evento)
+        self._order = 0
+        self._sequence = 0
+        self._history = deque(maxlen=buffer_size)
+        self._last_signature: Dict[tuple, tuple] = {}
+        self._last_sent: Dict[tuple, float] = {}
+        self._pending: Dict[tuple, Dict] = {}
+        self._worker_started = False
+        self._next_expiry_check = 0.0
+
+        self._register_events()
+
+    def _register_events(self):
+        """Registrar eventos WebSocket"""
+
+        @self.socketio.on('subscribe_alerts')
+        def handle_subscribe_alerts(data=None):
+            """Receber todos os alertas; com since_seq, reenviar os perdidos"""
+            data = data or {}
+            join_room(ALL_ALERTS_ROOM)
+            self._ensure_worker()
+            emit('alerts_subscribed', {'last_seq': self._sequence})
+            if data.get('since_seq') is not None:
+                self._replay(data['since_seq'], data.get('city_name'))
+
+        @self.socketio.on('unsubscribe_alerts')
+        def handle_unsubscribe_alerts():
+            leave_room(ALL_ALERTS_ROOM)
+
+        @self.socketio.on('replay_alerts')
+        def handle_replay_alerts(data=None):
+            """Reenviar os eventos posteriores a since_seq (por exemplo após reconexão)"""
+            data = data or {}
+            self._replay(data.get('since_seq', 0), data.get('city_name'))
+
+    def _replay(self, since_seq, city_name: Optional[str] = None):
+        """Enviar ao cliente atual os eventos com sequência superior a since_seq"""
+        try:
+            since_seq = int(since_seq)
+        except (TypeError, ValueError):
+            since_seq = 0
+
+        with self._lock:
+            history = list(self._history)
+            last_seq = self._sequence
+        oldest = history[0]['seq'] if history else last_seq + 1
+
+        if since_seq < oldest - 1:
+            # Eventos já fora do buffer: o cliente deve recarregar /api/alerts
+            emit('alerts_resync', {'since_seq': since_seq, 'oldest_seq': oldest, 'last_seq': last_seq})
+            metrics.ALERT_EVENTS_REPLAYED.inc(result='resync')
+            return
+
+        missed = [event for event in history
+                  if event['seq'] > since_seq and (city_name is None or event['alert']['city_name'] == city_name)]
+        for event in missed:
+            emit('alert_event', {**event, 'replayed': True})
+        metrics.ALERT_EVENTS_REPLAYED.inc(result='ok')
+
+    def publish(self, event: str, alert: Dict, previous_level: Optional[str] = None):
+        """
+        Publicar um evento de um alerta (chamado pelo AlertManager)
+
+        Args:
+            event (str): created, escalated, updated, acknowledged, deactivated ou expired
+            alert (Dict): Alerta (AlertModel.to_dict())
+            previous_level (str): Nível anterior (escalated/updated)
+        """
+        key = (alert['city_id'], alert['alert_type'])
+        signature = (event, alert['level'], alert['message'], alert['is_active'], alert['is_acknowledged'])
+        payload = {
+            'event': event,
+            'alert': alert,
+            'previous_level': previous_level,
+            'published_at': time.time()
+        }
+
+        with self._lock:
+            if self._last_signature.get(key) == signature:
+                # Igual ao último posto na fila: um evento adiado deixa de fazer sentido
+                self._pending.pop(key, None)
+                metrics.ALERT_EVENTS_SUPPRESSED.inc(reason='duplicate')
+                return
+
+            now = time.monotonic()
+            immediate = event in UNTHROTTLED_EVENTS or alert['level'] == 'crítico'
+            if not immediate and now - self._last_sent.get(key, float('-inf')) < self.min_interval:
+                # Oscilação: guardar só o evento mais recente do alerta
+                if key in self._pending:
+                    metrics.ALERT_EVENTS_SUPPRESSED.inc(reason='coalesced')
+                self._pending[key] = payload
+            else:
+                if self._pending.pop(key, None) is not None:
+                    metrics.ALERT_EVENTS_SUPPRESSED.inc(reason='coalesced')
+                self._enqueue(key, payload)
+            self._lock.notify()
+
+        self._ensure_worker()
+
+    def _enqueue(self, key: tuple, payload: Dict):
+        """Pôr um evento na fila de entrega (chamado com o lock)"""
+        self._order += 1
+        priority = LEVEL_PRIORITY.get(payload['alert']['level'], len(LEVEL_PRIORITY))
+        heapq.heappush(self._queue, (priority, self._order, key, payload))
+        self._last_sent[key] = time.monotonic()
+        alert = payload['alert']
+        self._last_signature[key] = (payload['event'], alert['level'], alert['message'],
+                                     alert['is_active'], alert['is_acknowledged'])
+
+    def _ensure_worker(self):
+        if self._worker_started:
+            return
+        with self._lock:
+            if self._worker_started:
+                return
+            self._worker_started = True
+        # Thread do sistema (como a coleta e a escrita diferida): com eventlet sem
+        # monkey-patching, uma green thread bloqueada no Condition.wait parava o hub
+        threading.Thread(target=self._run, name='alert-events', daemon=True).start()
+
+    def _run(self):
+        """Entregar os eventos em fila e libertar os adiados quando o intervalo passa"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                for key, payload in list(self._pending.items()):
+                    if now - self._last_sent.get(key, float('-inf')) >= self.min_interval:
+                        del self._pending[key]
+                        self._enqueue(key, payload)
+
+                if not self._queue:
+                    # Acordar para o próximo evento adiado ou verificação de expiração
+                    waits = [self.min_interval - (now - self._last_sent[key]) for key in self._pending]
+                    self._lock.wait(timeout=min(waits + [1.0]))
+                    batch = []
+                else:
+                    batch = [heapq.heappop(self._queue) for _ in range(len(self._queue))]
+
+            for _, _, key, payload in batch:
+                self._deliver(payload)
+
+            if time.monotonic() >= self._next_expiry_check:
+                self._next_expiry_check = time.monotonic() + self.expiry_check_seconds
+                self._expire_alerts()
+
+    def _deliver(self, payload: Dict):
+        alert = payload['alert']
+        with self._lock:
+            self._sequence += 1
+            event = {
+                'seq': self._sequence,
+                'event': payload['event'],
+                'alert': alert,
+                'previous_level': payload['previous_level'],
+                'timestamp': datetime.utcnow().isoformat()
+            }
+            self._history.append(event)
+
+        try:
+            self.socketio.emit('alert_event', event, room=ALL_ALERTS_ROOM)
+            self.socketio.emit('alert_event', event, room=f"city_{alert['city_name']}")
+        except Exception as e:
+            print(f"Erro ao emitir evento de alerta: {e}")
+            return
+        metrics.WEBSOCKET_EMITS.inc(event='alert_event')
+        metrics.ALERT_EVENTS.inc(event=payload['event'], level=alert['level'])
+        metrics.ALERT_EVENT_DELAY_SECONDS.observe(time.time() - payload['published_at'])
+
+    def _expire_alerts(self):
+        """Desativar os alertas expirados (gera os eventos expired)"""
+        if self.app is None:
+            return
+        from app.services.alert_manager import AlertManager
+        try:
+            with self.app.app_context():
+                AlertManager(events=self).cleanup_expired_alerts()
+        except Exception as e:
+            print(f"Erro ao expirar alertas: {e}")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'last_seq': self._sequence,
+                'buffered': len(self._history),
+                'queued': len(self._queue),
+                'pending': len(self._pending)
+            }
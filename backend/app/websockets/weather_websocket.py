@@ -1,6 +1,8 @@
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask import request
+from contextlib import nullcontext
 from datetime import datetime
+from app import metrics
 import json
 
 class WeatherWebSocket:
@@ -8,17 +10,27 @@ class WeatherWebSocket:
     Classe para gerenciar conexões WebSocket para dados meteorológicos
     """
     
-    def __init__(self, socketio: SocketIO, weather_service):
+    def __init__(self, socketio: SocketIO, weather_service=None):
         self.socketio = socketio
-        self.weather_service = weather_service
+        self._weather_service = weather_service
         self.active_connections = {}
         
-        # Registrar como observador do serviço meteorológico
-        self.weather_service.add_observer(self)
+        # Registrar como observador do serviço meteorológico; sem serviço,
+        # o registo é feito por get_weather_service() quando o cria
+        if weather_service is not None:
+            weather_service.add_observer(self)
         
         # Registrar eventos WebSocket
         self._register_events()
     
+    @property
+    def weather_service(self):
+        """Serviço meteorológico, resolvido no primeiro uso"""
+        if self._weather_service is None:
+            from app import get_weather_service
+            self._weather_service = get_weather_service()
+        return self._weather_service
+    
     def _register_events(self):
         """Registrar eventos WebSocket"""
         
@@ -29,6 +41,7 @@ class WeatherWebSocket:
                 'connected_at': datetime.utcnow(),
                 'subscribed_cities': []
             }
+            metrics.WEBSOCKET_CONNECTIONS.set(len(self.active_connections))
             
             emit('connection_established', {
                 'client_id': client_id,
@@ -43,6 +56,7 @@ class WeatherWebSocket:
             client_id = request.sid
             if client_id in self.active_connections:
                 del self.active_connections[client_id]
+            metrics.WEBSOCKET_CONNECTIONS.set(len(self.active_connections))
             
             print(f"Cliente desconectado: {client_id}")
         
@@ -119,26 +133,33 @@ class WeatherWebSocket:
             data (Dict): Dados meteorológicos atualizados
         """
         city_name = data.get('city')
+        trace = data.get('trace')
+        trace_id = trace.trace_id if trace else None
         
         if city_name:
-            # Enviar para todos os clientes subscritos à cidade
-            self.socketio.emit('weather_update', {
-                'city': city_name,
-                'data': data['data'],
-                'timestamp': data['timestamp'],
-                'type': 'real_time'
-            }, room=f"city_{city_name}")
-            
-            # Enviar para todos os clientes conectados (broadcast geral)
-            self.socketio.emit('general_weather_update', {
-                'city': city_name,
-                'summary': {
-                    'temperature': data['data']['main']['temp'],
-                    'humidity': data['data']['main']['humidity'],
-                    'description': data['data']['weather'][0]['description']
-                },
-                'timestamp': data['timestamp']
-            })
+            with trace.span('websocket_emit') if trace else nullcontext():
+                # Enviar para todos os clientes subscritos à cidade
+                self.socketio.emit('weather_update', {
+                    'city': city_name,
+                    'data': data['data'],
+                    'timestamp': data['timestamp'],
+                    'type': 'real_time',
+                    'trace_id': trace_id
+                }, room=f"city_{city_name}")
+                metrics.WEBSOCKET_EMITS.inc(event='weather_update')
+                
+                # Enviar para todos os clientes conectados (broadcast geral)
+                self.socketio.emit('general_weather_update', {
+                    'city': city_name,
+                    'summary': {
+                        'temperature': data['data']['main']['temp'],
+                        'humidity': data['data']['main']['humidity'],
+                        'description': data['data']['weather'][0]['description']
+                    },
+                    'timestamp': data['timestamp'],
+                    'trace_id': trace_id
+                })
+                metrics.WEBSOCKET_EMITS.inc(event='general_weather_update')
     
     def broadcast_system_message(self, message: str, message_type: str = 'info'):
         """Enviar mensagem do sistema para todos os clientes conectados"""
@@ -147,6 +168,7 @@ class WeatherWebSocket:
             'type': message_type,
             'timestamp': datetime.utcnow().isoformat()
         })
+        metrics.WEBSOCKET_EMITS.inc(event='system_message')
     
     def get_connection_stats(self):
         """Obter estatísticas das conexões"""
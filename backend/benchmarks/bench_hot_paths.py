@@ -0,0 +1,317 @@
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+# Adicionar o diretório backend ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from faker import Faker
+from flask import Flask, jsonify
+
+from app.factories.weather_factory import WeatherDataFactory
+from app.models import db, Weather
+from app.services.weather_service import WeatherService
+from app.services.vineyard_analyzer import VineyardAnalyzer, VineyardAlert, AlertType, AlertLevel
+from app.services.alert_manager import AlertManager
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+DEFAULT_OUTPUT = os.path.join(RESULTS_DIR, 'latest.json')
+# Baseline de referência guardada no repositório (parâmetros por omissão, SQLite em
+# memória). Regenerar na máquina de referência, depois de uma alteração de desempenho
+# intencional, com: python benchmarks/bench_hot_paths.py --save-baseline --runs 10
+DEFAULT_BASELINE = os.path.join(RESULTS_DIR, 'baseline.json')
+
+
+def create_bench_app(database_uri):
+    """Criar uma app Flask mínima (sem coletor nem SocketIO) para os benchmarks"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def generate_records(factory, stations, days, samples_per_day):
+    """Gerar registos por estação, do mais antigo para o mais recente"""
+    records = {}
+    for station in stations:
+        station_records = []
+        for step in range(days * samples_per_day, 0, -1):
+            station_records.append(factory.generate_weather_data(
+                city=station,
+                days_ago=step / samples_per_day
+            ))
+        records[station["id"]] = station_records
+    return records
+
+
+# Duração mínima de cada amostra dos benchmarks só de leitura: abaixo disto
+# o ruído do sistema (agendamento, caches) domina a medição
+MIN_SAMPLE_SECONDS = 0.1
+
+
+def timed(func, repeat=1, min_sample_seconds=0.0):
+    """
+    Executar func em repeat amostras
+
+    Com min_sample_seconds, cada amostra chama func as vezes necessárias
+    (calibrado numa primeira chamada, não medida) para durar pelo menos
+    esse tempo; só para funções sem efeitos secundários.
+
+    Returns:
+        Tuple: (durações por amostra, último resultado, chamadas por amostra)
+    """
+    calls = 1
+    if min_sample_seconds > 0:
+        start = time.perf_counter()
+        func()
+        calls = max(1, math.ceil(min_sample_seconds / max(time.perf_counter() - start, 1e-9)))
+
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            result = func()
+        durations.append(time.perf_counter() - start)
+    return durations, result, calls
+
+
+def summarize(durations, ops):
+    """Resumo estatístico de um benchmark"""
+    median = statistics.median(durations)
+    return {
+        "ops": ops,
+        "repeat": len(durations),
+        "min_s": min(durations),
+        "median_s": median,
+        "mean_s": statistics.mean(durations),
+        "ops_per_sec": ops / median if median > 0 else None
+    }
+
+
+def run_benchmarks(stations_count, days, samples_per_day, database_uri, repeat, seed):
+    """Executar todos os benchmarks e devolver os resultados"""
+    random.seed(seed)
+    Faker.seed(seed)
+
+    factory = WeatherDataFactory()
+    stations = factory.generate_stations(stations_count)
+    records = generate_records(factory, stations, days, samples_per_day)
+    all_records = [record for station_records in records.values() for record in station_records]
+
+    app = create_bench_app(database_uri)
+    results = {}
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        weather_service = WeatherService(app=app)
+        analyzer = VineyardAnalyzer()
+        alert_manager = AlertManager()
+
+        # save_weather_to_db: um commit por registo (caminho de ingestão atual)
+        def save_all():
+            for record in all_records:
+                weather_service.save_weather_to_db(record)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            durations, _, _ = timed(save_all)
+        results["save_weather_to_db"] = summarize(durations, len(all_records))
+
+        # analyze_all_conditions: uma análise por estação
+        analyses = {
+            station_id: [analyzer.analyze_weather_data(record) for record in station_records]
+            for station_id, station_records in records.items()
+        }
+        window = 3 * samples_per_day
+
+        def analyze_all():
+            alerts = []
+            for station in stations:
+                history = analyses[station["id"]]
+                alerts.extend(analyzer.analyze_all_conditions(
+                    current_weather=history[-1],
+                    recent_weather=history[-window:],
+                    forecast_weather=history[-5:],
+                    city_id=station["id"],
+                    city_name=station["name"]
+                ))
+            return alerts
+
+        durations, generated_alerts, calls = timed(analyze_all, repeat, MIN_SAMPLE_SECONDS)
+        results["analyze_all_conditions"] = summarize(durations, len(stations) * calls)
+
+        # Weather.to_dict + jsonify sobre todos os registos guardados
+        rows = Weather.query.all()
+
+        def serialize_all():
+            return jsonify([row.to_dict() for row in rows]).get_data()
+
+        durations, _, calls = timed(serialize_all, repeat, MIN_SAMPLE_SECONDS)
+        results["weather_to_dict_jsonify"] = summarize(durations, len(rows) * calls)
+
+        # AlertManager.save_alert: um alerta por estação e tipo
+        alerts = list(generated_alerts)
+        for station in stations:
+            for alert_type in AlertType:
+                alerts.append(VineyardAlert(
+                    alert_type=alert_type,
+                    level=random.choice(list(AlertLevel)),
+                    message=f"Benchmark {alert_type.value}",
+                    recommendation="Sem ação",
+                    timestamp=datetime.utcnow(),
+                    city_id=station["id"],
+                    city_name=station["name"]
+                ))
+
+        def save_alerts():
+            for alert in alerts:
+                alert_manager.save_alert(alert)
+
+        durations, _, _ = timed(save_alerts)
+        results["save_alert"] = summarize(durations, len(alerts))
+
+        # AlertManager.get_alert_statistics
+        durations, _, calls = timed(alert_manager.get_alert_statistics, repeat, MIN_SAMPLE_SECONDS)
+        results["get_alert_statistics"] = summarize(durations, calls)
+
+        db.session.remove()
+
+    return {
+        "meta": {
+            "stations": stations_count,
+            "days": days,
+            "samples_per_day": samples_per_day,
+            "records": len(all_records),
+            "database_uri": database_uri,
+            "seed": seed,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": datetime.utcnow().isoformat()
+        },
+        "benchmarks": results
+    }
+
+
+def merge_runs(runs):
+    """
+    Juntar várias execuções completas dos benchmarks
+
+    Fica, por benchmark, a execução com o menor mínimo por operação e,
+    em noise, a diferença relativa entre o pior e o melhor desses
+    mínimos (ruído entre execuções, usado como margem na comparação).
+    """
+    merged = dict(runs[0], benchmarks={})
+    merged["meta"] = dict(runs[0]["meta"], runs=len(runs))
+    for name in runs[0]["benchmarks"]:
+        candidates = [run["benchmarks"][name] for run in runs]
+        per_op = [candidate["min_s"] / candidate["ops"] for candidate in candidates]
+        best = min(range(len(candidates)), key=per_op.__getitem__)
+        merged["benchmarks"][name] = dict(
+            candidates[best],
+            runs=len(runs),
+            noise=(max(per_op) - per_op[best]) / per_op[best] if per_op[best] else 0.0
+        )
+    return merged
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    Comparar resultados com a baseline
+
+    Compara o mínimo das amostras por operação (o valor menos afetado
+    por interferências do sistema), não a mediana. A regressão aceite
+    por benchmark é tolerance mais o ruído medido na baseline (noise).
+
+    Returns:
+        List[str]: Benchmarks com regressão acima da tolerância
+    """
+    regressions = []
+    print(f"\n{'benchmark':<28}{'baseline s/op':>14}{'atual s/op':>14}{'variação':>12}{'limite':>12}")
+    for name, current in results["benchmarks"].items():
+        reference = baseline.get("benchmarks", {}).get(name)
+        if not reference:
+            print(f"{name:<28}{'-':>14}{current['min_s'] / current['ops']:>14.9f}{'novo':>12}")
+            continue
+
+        # Normalizar por operação para permitir escalas diferentes
+        reference_per_op = reference["min_s"] / reference["ops"]
+        current_per_op = current["min_s"] / current["ops"]
+        change = (current_per_op - reference_per_op) / reference_per_op if reference_per_op else 0.0
+        limit = tolerance + reference.get("noise", 0.0)
+        flag = " !" if change > limit else ""
+        print(f"{name:<28}{reference_per_op:>14.9f}{current_per_op:>14.9f}{change:>+11.1%}{limit:>+11.1%}{flag}")
+
+        if change > limit:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks dos caminhos críticos do WineCast")
+    parser.add_argument('--stations', type=int, default=20, help="Número de estações sintéticas")
+    parser.add_argument('--days', type=int, default=3, help="Dias de histórico por estação")
+    parser.add_argument('--samples-per-day', type=int, default=24, help="Observações por dia")
+    parser.add_argument('--db', default='sqlite://', help="URI da base de dados (por omissão SQLite em memória)")
+    parser.add_argument('--repeat', type=int, default=5, help="Amostras dos benchmarks só de leitura")
+    parser.add_argument('--runs', type=int, default=3,
+                        help="Execuções completas (fica o melhor mínimo; com --save-baseline mede o ruído)")
+    parser.add_argument('--seed', type=int, default=42, help="Seed para dados determinísticos")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Ficheiro JSON de resultados")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Ficheiro JSON da baseline")
+    parser.add_argument('--save-baseline', action='store_true', help="Guardar os resultados como nova baseline")
+    parser.add_argument('--tolerance', type=float, default=0.20, help="Regressão máxima aceite (0.20 = 20%%)")
+    args = parser.parse_args()
+
+    results = merge_runs([
+        run_benchmarks(
+            stations_count=args.stations,
+            days=args.days,
+            samples_per_day=args.samples_per_day,
+            database_uri=args.db,
+            repeat=args.repeat,
+            seed=args.seed
+        )
+        for _ in range(args.runs)
+    ])
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Resultados guardados em {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline atualizada em {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"Baseline não encontrada ({args.baseline}). Use --save-baseline para a criar.")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = compare_with_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\nRegressões detetadas: {', '.join(regressions)}")
+        return 1
+
+    print("\nSem regressões face à baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,171 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from bench_hot_paths import RESULTS_DIR, compare_with_baseline, summarize
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_OUTPUT = os.path.join(RESULTS_DIR, 'startup_latest.json')
+DEFAULT_BASELINE = os.path.join(RESULTS_DIR, 'startup_baseline.json')
+
+# Cada cenário corre num processo novo e imprime a duração medida em segundos
+SCENARIOS = {
+    "import_models": """
+import time
+start = time.perf_counter()
+import app.models
+print(time.perf_counter() - start)
+""",
+    "import_app": """
+import time
+start = time.perf_counter()
+import app
+print(time.perf_counter() - start)
+""",
+    "create_app": """
+import time
+start = time.perf_counter()
+from app import create_app
+create_app(start_collector=False)
+print(time.perf_counter() - start)
+""",
+    "first_request": """
+import time
+from app import create_app, db
+app = create_app(start_collector=False)
+with app.app_context():
+    db.create_all()
+client = app.test_client()
+start = time.perf_counter()
+response = client.get('/api/dashboard')
+assert response.status_code == 200, response.status_code
+print(time.perf_counter() - start)
+""",
+    "create_app_to_first_response": """
+import time
+start = time.perf_counter()
+from app import create_app, db
+app = create_app(start_collector=False)
+created = time.perf_counter()
+with app.app_context():
+    db.create_all()
+schema = time.perf_counter() - created
+response = app.test_client().get('/api/dashboard')
+assert response.status_code == 200, response.status_code
+print(time.perf_counter() - start - schema)
+"""
+}
+
+
+def child_env():
+    """Ambiente dos processos filho: SQLite em memória, sem coletor nem rede"""
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": "sqlite://",
+        "COLLECTOR_AUTOSTART": "false",
+        "AUTO_CREATE_SCHEMA": "false",
+        "OPENWEATHER_BASE_URL": "http://127.0.0.1:1",
+        "OPENWEATHER_TIMEOUT": "1"
+    })
+    env.pop("TRACE_FILE", None)
+    return env
+
+
+def run_scenario(code, env):
+    """
+    Executar um cenário num interpretador novo
+
+    Returns:
+        tuple: (duração medida no processo, duração total do processo)
+    """
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr else "falhou")
+    # A última linha é a duração (prints da app podem aparecer antes)
+    return float(completed.stdout.strip().splitlines()[-1]), wall
+
+
+def run_benchmarks(runs, scenarios):
+    """Executar cada cenário runs vezes e devolver os resultados"""
+    env = child_env()
+    # Aquecer a cache de bytecode para medir arranques a frio do processo, não a compilação
+    run_scenario(SCENARIOS["first_request"], env)
+
+    results = {}
+    for name in scenarios:
+        measured, wall = [], []
+        for _ in range(runs):
+            inner, total = run_scenario(SCENARIOS[name], env)
+            measured.append(inner)
+            wall.append(total)
+        results[name] = summarize(measured, 1)
+        results[name]["process_median_s"] = sorted(wall)[len(wall) // 2]
+        print(f"{name:<32}{results[name]['median_s'] * 1000:>10.1f} ms"
+              f"{results[name]['process_median_s'] * 1000:>12.1f} ms (processo)")
+
+    return {
+        "meta": {
+            "runs": runs,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "timestamp": datetime.utcnow().isoformat()
+        },
+        "benchmarks": results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de arranque a frio do WineCast")
+    parser.add_argument('--runs', type=int, default=7, help="Processos por cenário")
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help="Cenário a executar (repetível; por omissão todos)")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Ficheiro JSON de resultados")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Ficheiro JSON da baseline")
+    parser.add_argument('--save-baseline', action='store_true', help="Guardar os resultados como nova baseline")
+    parser.add_argument('--tolerance', type=float, default=0.20, help="Regressão máxima aceite (0.20 = 20%%)")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.runs, args.scenario or list(SCENARIOS))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Resultados guardados em {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline atualizada em {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"Baseline não encontrada ({args.baseline}). Use --save-baseline para a criar.")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = compare_with_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\nRegressões detetadas: {', '.join(regressions)}")
+        return 1
+
+    print("\nSem regressões face à baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,11 @@
 import sys
 import os
+import argparse
+import random
+import time
+from datetime import datetime
+from multiprocessing import Pool
+import numpy as np
 
 # Adicionar o diretório backend ao path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
@@ -11,12 +17,13 @@ from app import create_app
 
 def populate_database():
     """Popular a base de dados com dados meteorológicos simulados"""
-    app = create_app()
+    app = create_app(start_collector=False)
     factory = WeatherDataFactory()
 
     with app.app_context():
+        db.create_all()
         print("Iniciando população da base de dados...")
-        
+
         # Limpar dados existentes (opcional)
         # Weather.query.delete()
         # db.session.commit()
@@ -25,76 +32,7 @@ def populate_database():
         print("Gerando dados atuais...")
         for city in factory.cities:
             weather_data = factory.generate_weather_data(city=city)
-            
-            # Extrair dados do JSON gerado
-            weather_info = weather_data['weather'][0]
-            main_data = weather_data['main']
-            wind_data = weather_data['wind']
-            clouds_data = weather_data['clouds']
-            rain_data = weather_data.get('rain', {})
-            sys_data = weather_data['sys']
-            coord_data = weather_data['coord']
-            
-            weather = Weather(
-                # Coordenadas
-                lon=coord_data['lon'],
-                lat=coord_data['lat'],
-                
-                # Informações do tempo
-                weather_id=weather_info['id'],
-                weather_main=weather_info['main'],
-                weather_description=weather_info['description'],
-                weather_icon=weather_info['icon'],
-                
-                # Base
-                base=weather_data['base'],
-                
-                # Dados principais
-                temp=main_data['temp'],
-                feels_like=main_data['feels_like'],
-                temp_min=main_data['temp_min'],
-                temp_max=main_data['temp_max'],
-                pressure=main_data['pressure'],
-                humidity=main_data['humidity'],
-                sea_level=main_data.get('sea_level'),
-                grnd_level=main_data.get('grnd_level'),
-                
-                # Visibilidade
-                visibility=weather_data['visibility'],
-                
-                # Vento
-                wind_speed=wind_data['speed'],
-                wind_deg=wind_data['deg'],
-                wind_gust=wind_data.get('gust'),
-                
-                # Chuva
-                rain_1h=rain_data.get('1h'),
-                
-                # Nuvens
-                clouds_all=clouds_data['all'],
-                
-                # Timestamp
-                dt=weather_data['dt'],
-                
-                # Sistema
-                sys_type=sys_data['type'],
-                sys_id=sys_data['id'],
-                country=sys_data['country'],
-                sunrise=sys_data['sunrise'],
-                sunset=sys_data['sunset'],
-                
-                # Timezone
-                timezone=weather_data['timezone'],
-                
-                # ID e nome da cidade
-                city_id=weather_data['id'],
-                name=weather_data['name'],
-                
-                # Código
-                cod=weather_data['cod']
-            )
-            
-            db.session.add(weather)
+            db.session.add(Weather.from_api(weather_data))
             print(f"Dados atuais adicionados para {city['name']}")
 
         # Gerar dados históricos (últimos 7 dias) para cada cidade
@@ -102,82 +40,13 @@ def populate_database():
         for city in factory.cities:
             for days_ago in range(1, 8):
                 weather_data = factory.generate_weather_data(city=city, days_ago=days_ago)
-                
-                # Extrair dados do JSON gerado
-                weather_info = weather_data['weather'][0]
-                main_data = weather_data['main']
-                wind_data = weather_data['wind']
-                clouds_data = weather_data['clouds']
-                rain_data = weather_data.get('rain', {})
-                sys_data = weather_data['sys']
-                coord_data = weather_data['coord']
-                
-                weather = Weather(
-                    # Coordenadas
-                    lon=coord_data['lon'],
-                    lat=coord_data['lat'],
-                    
-                    # Informações do tempo
-                    weather_id=weather_info['id'],
-                    weather_main=weather_info['main'],
-                    weather_description=weather_info['description'],
-                    weather_icon=weather_info['icon'],
-                    
-                    # Base
-                    base=weather_data['base'],
-                    
-                    # Dados principais
-                    temp=main_data['temp'],
-                    feels_like=main_data['feels_like'],
-                    temp_min=main_data['temp_min'],
-                    temp_max=main_data['temp_max'],
-                    pressure=main_data['pressure'],
-                    humidity=main_data['humidity'],
-                    sea_level=main_data.get('sea_level'),
-                    grnd_level=main_data.get('grnd_level'),
-                    
-                    # Visibilidade
-                    visibility=weather_data['visibility'],
-                    
-                    # Vento
-                    wind_speed=wind_data['speed'],
-                    wind_deg=wind_data['deg'],
-                    wind_gust=wind_data.get('gust'),
-                    
-                    # Chuva
-                    rain_1h=rain_data.get('1h'),
-                    
-                    # Nuvens
-                    clouds_all=clouds_data['all'],
-                    
-                    # Timestamp
-                    dt=weather_data['dt'],
-                    
-                    # Sistema
-                    sys_type=sys_data['type'],
-                    sys_id=sys_data['id'],
-                    country=sys_data['country'],
-                    sunrise=sys_data['sunrise'],
-                    sunset=sys_data['sunset'],
-                    
-                    # Timezone
-                    timezone=weather_data['timezone'],
-                    
-                    # ID e nome da cidade
-                    city_id=weather_data['id'],
-                    name=weather_data['name'],
-                    
-                    # Código
-                    cod=weather_data['cod']
-                )
-                
-                db.session.add(weather)
-            
+                db.session.add(Weather.from_api(weather_data))
+
             print(f"Dados históricos adicionados para {city['name']}")
 
         # Confirmar todas as alterações
         db.session.commit()
-        
+
         # Contar registros criados
         total_records = Weather.query.count()
         print(f"Base de dados populada com sucesso!")
@@ -186,5 +55,135 @@ def populate_database():
         print(f"Registros por cidade: {total_records // len(factory.cities)}")
 
 
+# Factory de cada processo de trabalho (criada uma vez por processo)
+_worker_factory = None
+
+# Colunas gravadas pelo modo bulk
+BULK_COLUMNS = WeatherDataFactory.COLUMNS + ("created_at",)
+
+
+def _init_worker():
+    global _worker_factory
+    _worker_factory = WeatherDataFactory()
+
+
+def _generate_rows(task):
+    """
+    Gerar as linhas de um grupo de estações com a API colunar da factory
+
+    Args:
+        task (tuple): (estações, dias, amostras por dia, fim do intervalo, seed)
+
+    Returns:
+        List[tuple]: Linhas prontas para executemany, na ordem de BULK_COLUMNS
+    """
+    stations, days, samples_per_day, end_time, seed = task
+    columns = _worker_factory.generate_columns(
+        stations=stations,
+        days=days,
+        samples_per_day=samples_per_day,
+        end_time=end_time,
+        seed=seed
+    )
+    # created_at coincide com a hora da observação para queries por intervalo realistas
+    created_at = np.datetime_as_string(columns["dt"].astype("datetime64[s]"))
+    columns["created_at"] = np.char.replace(created_at, "T", " ")
+    return WeatherDataFactory.columns_to_rows(columns, BULK_COLUMNS)
+
+
+def _insert_sql():
+    """INSERT com os placeholders do driver da base de dados configurada"""
+    placeholder = {"qmark": "?", "numeric": ":{}", "named": ":{}"}.get(db.engine.dialect.paramstyle, "%s")
+    values = ", ".join(placeholder.format(i + 1) if "{}" in placeholder else placeholder
+                       for i in range(len(BULK_COLUMNS)))
+    return f"INSERT INTO {Weather.__tablename__} ({', '.join(BULK_COLUMNS)}) VALUES ({values})"
+
+
+def bulk_populate(stations, days, samples_per_day, workers, chunk_size, seed):
+    """
+    Popular a base de dados em grande volume
+
+    Os registos são gerados em colunas NumPy por processos paralelos e
+    gravados em lotes com executemany do driver, sem objetos ORM.
+
+    Args:
+        stations (int): Número de estações
+        days (int): Dias de histórico por estação
+        samples_per_day (int): Observações por dia
+        workers (int): Número de processos de geração
+        chunk_size (int): Linhas por transação
+        seed (int): Seed para dados reprodutíveis
+    """
+    random.seed(seed)
+    station_list = WeatherDataFactory().generate_stations(stations)
+    rows_per_station = days * samples_per_day
+    total_rows = stations * rows_per_station
+    end_time = datetime.utcnow()
+
+    # Agrupar estações para que cada tarefa gere cerca de chunk_size linhas
+    per_task = max(1, chunk_size // rows_per_station)
+    tasks = [
+        (station_list[start:start + per_task], days, samples_per_day, end_time, [seed, start])
+        for start in range(0, stations, per_task)
+    ]
+
+    print(f"A gerar {total_rows:,} registos ({stations} estações × {days} dias × {samples_per_day}/dia) "
+          f"com {workers} processos...")
+
+    # Criar os processos antes da app para não herdarem ligações à BD
+    with Pool(processes=workers, initializer=_init_worker) as pool:
+        app = create_app(start_collector=False)
+        with app.app_context():
+            db.create_all()
+            insert_sql = _insert_sql()
+            written = 0
+            start_time = last_report = time.perf_counter()
+
+            for rows in pool.imap_unordered(_generate_rows, tasks):
+                for offset in range(0, len(rows), chunk_size):
+                    chunk = rows[offset:offset + chunk_size]
+                    db.session.connection().exec_driver_sql(insert_sql, chunk)
+                    db.session.commit()
+                    written += len(chunk)
+
+                now = time.perf_counter()
+                if now - last_report < 1.0:
+                    continue
+                last_report = now
+                elapsed = now - start_time
+                print(f"  {written:,}/{total_rows:,} ({written / total_rows:.1%}) - "
+                      f"{written / elapsed:,.0f} linhas/s", flush=True)
+
+            elapsed = time.perf_counter() - start_time
+            print(f"Concluído: {written:,} registos em {elapsed:.1f}s ({written / elapsed:,.0f} linhas/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Popular a base de dados com dados meteorológicos simulados")
+    subparsers = parser.add_subparsers(dest='command')
+
+    bulk = subparsers.add_parser('bulk', help="População em grande volume")
+    bulk.add_argument('--stations', type=int, default=100, help="Número de estações")
+    bulk.add_argument('--days', type=int, default=365, help="Dias de histórico por estação")
+    bulk.add_argument('--samples-per-day', type=int, default=24, help="Observações por dia")
+    bulk.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processos de geração")
+    bulk.add_argument('--chunk-size', type=int, default=5000, help="Linhas por transação")
+    bulk.add_argument('--seed', type=int, default=42, help="Seed para dados reprodutíveis")
+
+    args = parser.parse_args()
+
+    if args.command == 'bulk':
+        bulk_populate(
+            stations=args.stations,
+            days=args.days,
+            samples_per_day=args.samples_per_day,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            seed=args.seed
+        )
+    else:
+        populate_database()
+
+
 if __name__ == '__main__':
-    populate_database()
\ No newline at end of file
+    main()
@@ -0,0 +1,156 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Adicionar o diretório backend ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import requests
+from flask import Flask
+
+from app import metrics
+from app.models import db
+from app.services.weather_service import WeatherService
+from loadtest.fake_owm_server import FakeOWMServer, add_fault_arguments, fault_profile_from_args
+from loadtest.stats import summarize_latencies, format_summary
+
+
+def create_loadtest_app(database_uri):
+    """Criar uma app Flask mínima (sem coletor nem SocketIO)"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def build_stations(base_cities, count, seed):
+    """Gerar estações simuladas espalhadas à volta das cidades monitorizadas"""
+    rng = random.Random(seed)
+    stations = []
+    for index in range(count):
+        base = base_cities[index % len(base_cities)]
+        stations.append({
+            "name": f"{base['name']} #{index + 1}",
+            "lat": round(base["lat"] + rng.uniform(-0.5, 0.5), 4),
+            "lon": round(base["lon"] + rng.uniform(-0.5, 0.5), 4),
+            "region": base["region"]
+        })
+    return stations
+
+
+def run_collection(service, stations, concurrency, save):
+    """
+    Executar um ciclo de coleta completo e medir cada fase
+
+    Os pedidos recusados pelo circuito aberto (sem contactar a API) são
+    contados à parte e ficam fora das latências de fetch.
+
+    Returns:
+        Dict: Latências de fetch/save, erros, recusas do circuito e duração total
+    """
+    fetch_latencies, save_latencies = [], []
+    errors = 0
+    short_circuited = 0
+
+    def refused(station):
+        return metrics.OWM_FETCH_ERRORS.value(station=station['name'], reason='CircuitOpenError')
+
+    def fetch(station):
+        refused_before = refused(station)
+        start = time.perf_counter()
+        data = service.fetch_weather_data(station)
+        return data, time.perf_counter() - start, refused(station) > refused_before
+
+    cycle_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for data, elapsed, circuit_open in pool.map(fetch, stations):
+            if circuit_open:
+                short_circuited += 1
+                continue
+            fetch_latencies.append(elapsed)
+            if data is None:
+                errors += 1
+                continue
+            if save:
+                start = time.perf_counter()
+                service.save_weather_to_db(data)
+                save_latencies.append(time.perf_counter() - start)
+    cycle_seconds = time.perf_counter() - cycle_start
+
+    return {
+        "stations": len(stations),
+        "errors": errors,
+        "short_circuited": short_circuited,
+        "cycle_seconds": round(cycle_seconds, 3),
+        "stations_per_second": round(len(stations) / cycle_seconds, 2) if cycle_seconds else None,
+        "fetch": summarize_latencies(fetch_latencies),
+        "save": summarize_latencies(save_latencies)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do coletor contra o servidor OWM falso")
+    parser.add_argument('--stations', type=int, default=1000, help="Número de estações simuladas")
+    parser.add_argument('--cycles', type=int, default=1, help="Número de ciclos de coleta")
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help="Pedidos em paralelo (1 = coletor série atual)")
+    parser.add_argument('--no-save', action='store_true', help="Medir só os fetches, sem gravar na BD")
+    parser.add_argument('--db', default='sqlite://', help="URI da base de dados")
+    parser.add_argument('--base-url', default=None,
+                        help="Usar um servidor já em execução em vez de arrancar um local")
+    parser.add_argument('--client-timeout', type=float, default=None, help="Timeout do cliente (s)")
+    parser.add_argument('--output', default=None, help="Ficheiro JSON de resultados")
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = FakeOWMServer(faults=fault_profile_from_args(args), seed=args.seed).start()
+        base_url = server.base_url
+
+    os.environ['OPENWEATHER_BASE_URL'] = base_url
+    if args.client_timeout is not None:
+        os.environ['OPENWEATHER_TIMEOUT'] = str(args.client_timeout)
+
+    app = create_loadtest_app(args.db)
+    cycles = []
+    with app.app_context():
+        db.create_all()
+        service = WeatherService(app=app)
+        stations = build_stations(service.cities, args.stations, args.seed)
+
+        print(f"Coleta de {len(stations)} estações em {base_url} "
+              f"(concorrência {args.concurrency}, {args.cycles} ciclo(s))")
+        for cycle in range(args.cycles):
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = run_collection(service, stations, args.concurrency, not args.no_save)
+            cycles.append(result)
+            print(f"\nCiclo {cycle + 1}: {result['cycle_seconds']}s, "
+                  f"{result['stations_per_second']} estações/s, {result['errors']} erros, "
+                  f"{result['short_circuited']} recusados pelo circuito")
+            print(format_summary("fetch_weather_data", result['fetch']))
+            if not args.no_save:
+                print(format_summary("save_weather_to_db", result['save']))
+
+    report = {"base_url": base_url, "concurrency": args.concurrency, "cycles": cycles}
+    if server:
+        report["server_responses"] = requests.get(f"{base_url.split('/data/')[0]}/__stats", timeout=5).json()
+        print(f"\nRespostas do servidor: {report['server_responses']}")
+        server.stop()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Resultados guardados em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
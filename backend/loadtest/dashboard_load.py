@@ -0,0 +1,260 @@
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+# Adicionar o diretório backend ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import requests
+import socketio
+
+from loadtest.stats import summarize_latencies, format_summary
+
+SCENARIOS_DIR = os.path.join(os.path.dirname(__file__), 'scenarios')
+
+
+class LoadRecorder:
+    """Registo thread-safe de latências, erros e atraso de mensagens"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.messages = defaultdict(int)
+        self.delivery_lag = []
+
+    def record(self, operation, elapsed, ok=True):
+        with self._lock:
+            self.latencies[operation].append(elapsed)
+            if not ok:
+                self.errors[operation] += 1
+
+    def record_error(self, operation):
+        with self._lock:
+            self.errors[operation] += 1
+
+    def record_message(self, event, server_timestamp=None):
+        with self._lock:
+            self.messages[event] += 1
+            if server_timestamp:
+                lag = (datetime.utcnow() - datetime.fromisoformat(server_timestamp)).total_seconds()
+                self.delivery_lag.append(max(lag, 0.0))
+
+    def report(self, duration):
+        with self._lock:
+            operations = {
+                name: {
+                    "requests": len(values),
+                    "errors": self.errors.get(name, 0),
+                    "throughput_rps": round(len(values) / duration, 2),
+                    **summarize_latencies(values)
+                }
+                for name, values in sorted(self.latencies.items())
+            }
+            return {
+                "duration_seconds": round(duration, 2),
+                "operations": operations,
+                "messages": dict(self.messages),
+                "delivery_lag": summarize_latencies(self.delivery_lag)
+            }
+
+
+def _timed_request(session, recorder, operation, method, url):
+    """Executar um pedido HTTP e registar a latência; devolve o JSON ou None"""
+    start = time.perf_counter()
+    try:
+        response = session.request(method, url, timeout=30)
+        elapsed = time.perf_counter() - start
+        recorder.record(operation, elapsed, ok=response.ok)
+        return response.json() if response.ok else None
+    except (requests.RequestException, ValueError):
+        recorder.record(operation, time.perf_counter() - start, ok=False)
+        return None
+
+
+def _think(rng, stop_event, seconds):
+    """Pausa entre ações com ±20% de variação reprodutível"""
+    stop_event.wait(seconds * rng.uniform(0.8, 1.2))
+
+
+def dashboard_poller(ctx, config, rng):
+    """Perfil: tablet no dashboard a atualizar periodicamente"""
+    session = requests.Session()
+    ctx.stop_event.wait(rng.uniform(0, config.get('think_seconds', 30)))
+    while not ctx.stop_event.is_set():
+        _timed_request(session, ctx.recorder, 'GET /api/dashboard', 'GET', f"{ctx.api_url}/dashboard")
+        _think(rng, ctx.stop_event, config.get('think_seconds', 30))
+
+
+def analyzer(ctx, config, rng):
+    """Perfil: utilizador a pedir análises de cidades"""
+    session = requests.Session()
+    while not ctx.stop_event.is_set():
+        city = rng.choice(ctx.cities)
+        _timed_request(session, ctx.recorder, 'GET /api/weather/analyze', 'GET',
+                       f"{ctx.api_url}/weather/analyze/{requests.utils.quote(city)}")
+        _think(rng, ctx.stop_event, config.get('think_seconds', 20))
+
+
+def alert_acker(ctx, config, rng):
+    """Perfil: utilizador a consultar e reconhecer alertas"""
+    session = requests.Session()
+    while not ctx.stop_event.is_set():
+        data = _timed_request(session, ctx.recorder, 'GET /api/alerts', 'GET', f"{ctx.api_url}/alerts")
+        pending = [alert for alert in (data or {}).get('alerts', []) if not alert['is_acknowledged']]
+        if pending:
+            alert = rng.choice(pending)
+            _timed_request(session, ctx.recorder, 'POST /api/alerts/acknowledge', 'POST',
+                           f"{ctx.api_url}/alerts/{alert['id']}/acknowledge")
+        _think(rng, ctx.stop_event, config.get('think_seconds', 30))
+
+
+def city_subscriber(ctx, config, rng):
+    """Perfil: cliente Socket.IO subscrito a algumas cidades"""
+    recorder = ctx.recorder
+    client = socketio.Client(reconnection=False)
+    pending_subscriptions = {}
+
+    @client.on('subscription_confirmed')
+    def on_subscription_confirmed(data):
+        started = pending_subscriptions.pop(data.get('city_name'), None)
+        if started:
+            recorder.record('WS subscribe_city', time.perf_counter() - started)
+
+    @client.on('weather_update')
+    def on_weather_update(data):
+        recorder.record_message('weather_update', data.get('timestamp'))
+
+    @client.on('general_weather_update')
+    def on_general_weather_update(data):
+        recorder.record_message('general_weather_update')
+
+    @client.on('weather_data')
+    def on_weather_data(data):
+        recorder.record_message('weather_data')
+
+    ctx.stop_event.wait(rng.uniform(0, 2))
+    start = time.perf_counter()
+    try:
+        client.connect(ctx.base_url, wait_timeout=30)
+    except socketio.exceptions.ConnectionError:
+        recorder.record('WS connect', time.perf_counter() - start, ok=False)
+        return
+    recorder.record('WS connect', time.perf_counter() - start)
+
+    count = min(config.get('cities_per_user', 1), len(ctx.cities))
+    for city in rng.sample(ctx.cities, count):
+        pending_subscriptions[city] = time.perf_counter()
+        client.emit('subscribe_city', {'city_name': city})
+
+    ctx.stop_event.wait()
+    client.disconnect()
+
+
+def collection_trigger(ctx, interval):
+    """Forçar coletas periódicas para gerar mensagens weather_update"""
+    session = requests.Session()
+    while not ctx.stop_event.wait(interval):
+        _timed_request(session, ctx.recorder, 'POST /api/weather/collect', 'POST',
+                       f"{ctx.api_url}/weather/collect")
+
+
+PROFILES = {
+    'dashboard_poller': dashboard_poller,
+    'city_subscriber': city_subscriber,
+    'analyzer': analyzer,
+    'alert_acker': alert_acker,
+}
+
+
+class LoadContext:
+    """Estado partilhado entre os utilizadores virtuais"""
+
+    def __init__(self, base_url, cities):
+        self.base_url = base_url.rstrip('/')
+        self.api_url = f"{self.base_url}/api"
+        self.cities = cities
+        self.recorder = LoadRecorder()
+        self.stop_event = threading.Event()
+
+
+def load_scenario(name_or_path):
+    """Carregar cenário por nome (loadtest/scenarios/<nome>.json) ou caminho"""
+    path = name_or_path
+    if not os.path.exists(path):
+        path = os.path.join(SCENARIOS_DIR, f"{name_or_path}.json")
+    with open(path) as f:
+        return json.load(f)
+
+
+def run_scenario(base_url, scenario, duration=None):
+    """
+    Executar um cenário contra uma instância em execução
+
+    Returns:
+        Dict: Relatório com throughput, percentis e atraso de entrega
+    """
+    cities = [city['name'] for city in requests.get(f"{base_url.rstrip('/')}/api/weather/cities", timeout=30).json()['cities']]
+    ctx = LoadContext(base_url, cities)
+    seed = scenario.get('seed', 0)
+    duration = duration or scenario['duration_seconds']
+
+    threads = []
+    for profile_name, config in scenario['profiles'].items():
+        profile = PROFILES[profile_name]
+        for index in range(config.get('users', 0)):
+            # Cada utilizador tem o seu RNG para que o cenário seja reprodutível
+            rng = random.Random(f"{seed}:{profile_name}:{index}")
+            threads.append(threading.Thread(target=profile, args=(ctx, config, rng), daemon=True))
+
+    interval = scenario.get('collect_interval_seconds', 0)
+    if interval:
+        threads.append(threading.Thread(target=collection_trigger, args=(ctx, interval), daemon=True))
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    ctx.stop_event.wait(duration)
+    ctx.stop_event.set()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    report = ctx.recorder.report(time.perf_counter() - start)
+    report["scenario"] = scenario.get('name')
+    report["users"] = {name: config.get('users', 0) for name, config in scenario['profiles'].items()}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga HTTP + WebSocket do dashboard")
+    parser.add_argument('scenario', nargs='?', default='smoke',
+                        help="Nome do cenário em loadtest/scenarios ou caminho para JSON")
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000', help="URL da instância a testar")
+    parser.add_argument('--duration', type=float, default=None, help="Sobrepor a duração do cenário (s)")
+    parser.add_argument('--output', default=None, help="Ficheiro JSON de resultados")
+    args = parser.parse_args()
+
+    scenario = load_scenario(args.scenario)
+    print(f"Cenário '{scenario.get('name')}' contra {args.base_url}")
+    report = run_scenario(args.base_url, scenario, args.duration)
+
+    print(f"\nDuração: {report['duration_seconds']}s")
+    for name, stats in report['operations'].items():
+        print(f"{format_summary(name, stats)} erros={stats['errors']} {stats['throughput_rps']} req/s")
+    print(f"\nMensagens recebidas: {report['messages']}")
+    print(format_summary("atraso weather_update", report['delivery_lag']))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Resultados guardados em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
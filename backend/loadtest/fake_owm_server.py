@@ -0,0 +1,292 @@
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Adicionar o diretório backend ao path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.factories.weather_factory import WeatherDataFactory
+
+KELVIN = 273.15
+
+
+class FaultProfile:
+    """
+    Perfil de latência e falhas injetadas pelo servidor falso
+
+    Latências em milissegundos. As taxas são probabilidades entre 0 e 1.
+    """
+
+    DISTRIBUTIONS = ('none', 'fixed', 'uniform', 'normal', 'lognormal', 'exponential')
+
+    def __init__(self, distribution='none', latency_ms=0.0, jitter_ms=0.0,
+                 timeout_rate=0.0, hang_seconds=15.0, rate_429=0.0, rate_5xx=0.0, seed=None):
+        if distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"Distribuição desconhecida: {distribution}")
+        self.distribution = distribution
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.timeout_rate = timeout_rate
+        self.hang_seconds = hang_seconds
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample_latency(self) -> float:
+        """Latência a injetar, em segundos"""
+        with self._lock:
+            if self.distribution == 'none':
+                value = 0.0
+            elif self.distribution == 'fixed':
+                value = self.latency_ms
+            elif self.distribution == 'uniform':
+                value = self._random.uniform(self.latency_ms - self.jitter_ms, self.latency_ms + self.jitter_ms)
+            elif self.distribution == 'normal':
+                value = self._random.gauss(self.latency_ms, self.jitter_ms)
+            elif self.distribution == 'lognormal':
+                # latency_ms é a mediana; jitter_ms/latency_ms controla a cauda
+                sigma = self.jitter_ms / self.latency_ms if self.latency_ms else 0.0
+                value = self.latency_ms * math.exp(self._random.gauss(0, sigma))
+            else:
+                value = self._random.expovariate(1.0 / self.latency_ms) if self.latency_ms else 0.0
+        return max(value, 0.0) / 1000.0
+
+    def sample_fault(self):
+        """Falha a injetar: 'timeout', 429, 5xx ou None"""
+        with self._lock:
+            roll = self._random.random()
+            if roll < self.timeout_rate:
+                return 'timeout'
+            roll -= self.timeout_rate
+            if roll < self.rate_429:
+                return 429
+            roll -= self.rate_429
+            if roll < self.rate_5xx:
+                return self._random.choice([500, 502, 503])
+        return None
+
+
+class FakeOWMServer:
+    """
+    Servidor HTTP local que imita a API OpenWeatherMap
+
+    Responde em /data/2.5/weather (por coordenadas), /data/2.5/group (até
+    20 IDs) e /data/2.5/forecast (5 dias / 3 horas) com dados gerados pela
+    WeatherDataFactory. Os IDs conhecidos são
+    os das cidades da factory e os devolvidos por /weather. Expõe contadores
+    de respostas em /__stats.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, faults: FaultProfile = None, seed=None):
+        self.factory = WeatherDataFactory()
+        self.faults = faults or FaultProfile(seed=seed)
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+        self._factory_lock = threading.Lock()
+        self._thread = None
+        # Cidades por ID, para o endpoint /group
+        self.known_cities = {city["id"]: dict(city) for city in self.factory.cities}
+
+        if seed is not None:
+            random.seed(seed)
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                server.handle_request(self)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/data/2.5"
+
+    def start(self):
+        """Arrancar o servidor numa thread em segundo plano"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Parar o servidor"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def handle_request(self, handler):
+        """Processar um pedido GET"""
+        url = urlparse(handler.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if url.path == '/__stats':
+            with self._stats_lock:
+                self._send_json(handler, 200, dict(self.stats))
+            return
+
+        routes = {
+            '/data/2.5/weather': self._weather_response,
+            '/data/2.5/group': self._group_response,
+            '/data/2.5/forecast': self._forecast_response,
+        }
+        route = routes.get(url.path)
+        if route is None:
+            self._count(404)
+            self._send_json(handler, 404, {"cod": "404", "message": "Not found"})
+            return
+
+        time.sleep(self.faults.sample_latency())
+
+        fault = self.faults.sample_fault()
+        if fault == 'timeout':
+            self._count('timeout')
+            time.sleep(self.faults.hang_seconds)
+            fault = 504
+        if fault == 429:
+            self._count(429)
+            self._send_json(handler, 429, {"cod": 429, "message": "Your account is temporary blocked"})
+            return
+        if fault:
+            self._count(fault)
+            self._send_json(handler, fault, {"cod": fault, "message": "Internal error"})
+            return
+
+        try:
+            body = route(params)
+        except (KeyError, ValueError) as e:
+            self._count(400)
+            self._send_json(handler, 400, {"cod": "400", "message": str(e)})
+            return
+
+        self._count(200)
+        self._send_json(handler, 200, body)
+
+    def _station_for(self, lat: float, lon: float):
+        """Cidade sintética para as coordenadas, baseada na cidade da factory mais próxima"""
+        nearest = min(self.factory.cities, key=lambda c: (c["lat"] - lat) ** 2 + (c["lon"] - lon) ** 2)
+        station_id = abs(hash((round(lat, 4), round(lon, 4)))) % 10_000_000
+        is_exact = nearest["lat"] == lat and nearest["lon"] == lon
+        city = {
+            "id": nearest["id"] if is_exact else station_id,
+            "name": nearest["name"] if is_exact else f"{nearest['name']} ({lat:.4f}, {lon:.4f})",
+            "country": nearest["country"],
+            "lat": lat,
+            "lon": lon
+        }
+        self.known_cities.setdefault(city["id"], city)
+        return city
+
+    def _generate(self, city, units, days_ago=0):
+        """Gerar uma observação (a factory gera Celsius; Kelvin sem units=metric, como a API)"""
+        with self._factory_lock:
+            data = self.factory.generate_weather_data(city=city, days_ago=days_ago)
+        if units != 'metric':
+            for key in ('temp', 'feels_like', 'temp_min', 'temp_max'):
+                data['main'][key] = round(data['main'][key] + KELVIN, 2)
+        return data
+
+    def _weather_response(self, params):
+        city = self._station_for(float(params['lat']), float(params['lon']))
+        return self._generate(city, params.get('units'))
+
+    def _forecast_response(self, params):
+        city = self._station_for(float(params['lat']), float(params['lon']))
+        now = int(time.time())
+        first_step = now - now % 10800 + 10800
+        items = []
+        for step in range(40):
+            dt = first_step + step * 10800
+            item = self._generate(city, params.get('units'), days_ago=(now - dt) / 86400)
+            item['dt'] = dt
+            rain = item.pop('rain', None)
+            if rain:
+                item['rain'] = {'3h': round(rain.get('1h', 0.0) * 3, 2)}
+            item['pop'] = 1.0 if rain else 0.0
+            items.append(item)
+        return {"cod": "200", "cnt": len(items), "list": items,
+                "city": {"id": city["id"], "name": city["name"],
+                         "coord": {"lat": city["lat"], "lon": city["lon"]}}}
+
+    def _group_response(self, params):
+        ids = [int(value) for value in params['id'].split(',') if value]
+        if len(ids) > 20:
+            raise ValueError("Demasiados IDs (máximo 20)")
+        # IDs desconhecidos são ignorados, como na API real
+        items = [self._generate(self.known_cities[city_id], params.get('units'))
+                 for city_id in ids if city_id in self.known_cities]
+        return {"cnt": len(items), "list": items}
+
+    def _send_json(self, handler, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        try:
+            handler.send_response(status)
+            handler.send_header('Content-Type', 'application/json; charset=utf-8')
+            handler.send_header('Content-Length', str(len(payload)))
+            handler.end_headers()
+            handler.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # O cliente desistiu (ex.: timeout do lado do cliente)
+            pass
+
+
+def add_fault_arguments(parser):
+    """Argumentos de linha de comandos partilhados para o perfil de falhas"""
+    parser.add_argument('--latency', choices=FaultProfile.DISTRIBUTIONS, default='none',
+                        help="Distribuição da latência injetada")
+    parser.add_argument('--latency-ms', type=float, default=50.0, help="Latência média/mediana (ms)")
+    parser.add_argument('--jitter-ms', type=float, default=20.0, help="Dispersão da latência (ms)")
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help="Fração de pedidos que ficam pendurados")
+    parser.add_argument('--hang-seconds', type=float, default=15.0, help="Duração de um pedido pendurado")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="Fração de respostas 429")
+    parser.add_argument('--rate-5xx', type=float, default=0.0, help="Fração de respostas 5xx")
+    parser.add_argument('--seed', type=int, default=None, help="Seed para respostas reprodutíveis")
+
+
+def fault_profile_from_args(args) -> FaultProfile:
+    return FaultProfile(
+        distribution=args.latency,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        timeout_rate=args.timeout_rate,
+        hang_seconds=args.hang_seconds,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        seed=args.seed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor OpenWeatherMap falso para testes offline")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeOWMServer(args.host, args.port, faults=fault_profile_from_args(args), seed=args.seed)
+    print(f"Servidor OWM falso em {server.base_url}")
+    print(f"Use OPENWEATHER_BASE_URL={server.base_url} para apontar o WeatherService")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+from typing import Dict, List
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentil por interpolação linear (valores não precisam de estar ordenados)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def summarize_latencies(values: List[float]) -> Dict:
+    """Resumo de latências em milissegundos (valores recebidos em segundos)"""
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(max(values) * 1000, 2) if values else 0.0
+    }
+
+
+def format_summary(name: str, summary: Dict) -> str:
+    """Linha de relatório para um resumo de latências"""
+    return (f"{name:<28} n={summary['count']:<7} p50={summary['p50_ms']:>9.2f}ms "
+            f"p95={summary['p95_ms']:>9.2f}ms p99={summary['p99_ms']:>9.2f}ms max={summary['max_ms']:>9.2f}ms")
@@ -1,5 +1,10 @@
 // Configuração da API
 const API_BASE = 'http://127.0.0.1:5000/api';
+const SOCKET_URL = 'http://127.0.0.1:5000';
+
+// Alertas ativos mostrados (por id) e último evento de alerta recebido
+let activeAlerts = new Map();
+let lastAlertSeq = null;
 
 // Função para buscar dados do sistema
 async function fetchSystemStatus() {
@@ -8,24 +13,7 @@ async function fetchSystemStatus() {
         const data = await response.json();
         
         if (data.success) {
-            document.getElementById('system-status').innerHTML = `
-                <div class="weather-item">
-                    <span class="status-indicator ${data.status.collecting ? 'status-online' : 'status-offline'}"></span>
-                    <span>Coleta: ${data.status.collecting ? 'Ativa' : 'Inativa'}</span>
-                </div>
-                <div class="weather-item">
-                    <span class="weather-icon">🏙️</span>
-                    <span>Cidades: ${data.status.cities_monitored}</span>
-                </div>
-                <div class="weather-item">
-                    <span class="weather-icon">📊</span>
-                    <span>Registos recentes: ${data.status.recent_records}</span>
-                </div>
-                <div class="weather-item">
-                    <span class="weather-icon">🔑</span>
-                    <span>API: ${data.status.api_key_configured ? 'Configurada' : 'Não configurada'}</span>
-                </div>
-            `;
+            renderSystemStatus(data.status);
         }
     } catch (error) {
         document.getElementById('system-status').innerHTML = `
@@ -34,6 +22,28 @@ async function fetchSystemStatus() {
     }
 }
 
+// Função para renderizar o status do sistema
+function renderSystemStatus(status) {
+    document.getElementById('system-status').innerHTML = `
+        <div class="weather-item">
+            <span class="status-indicator ${status.collecting ? 'status-online' : 'status-offline'}"></span>
+            <span>Coleta: ${status.collecting ? 'Ativa' : 'Inativa'}</span>
+        </div>
+        <div class="weather-item">
+            <span class="weather-icon">🏙️</span>
+            <span>Cidades: ${status.cities_monitored}</span>
+        </div>
+        <div class="weather-item">
+            <span class="weather-icon">📊</span>
+            <span>Registos recentes: ${status.recent_records}</span>
+        </div>
+        <div class="weather-item">
+            <span class="weather-icon">🔑</span>
+            <span>API: ${status.api_key_configured ? 'Configurada' : 'Não configurada'}</span>
+        </div>
+    `;
+}
+
 // Função para buscar cidades e dados meteorológicos
 async function fetchCitiesWeather() {
     try {
@@ -128,44 +138,7 @@ async function fetchAlerts() {
         const data = await response.json();
         
         if (data.success) {
-            // Resumo dos alertas
-            const summary = document.getElementById('alerts-summary');
-            summary.innerHTML = `
-                <div class="weather-item">
-                    <span class="weather-icon">🚨</span>
-                    <span>Total: ${data.count}</span>
-                </div>
-                <div class="weather-item">
-                    <span class="weather-icon">🔴</span>
-                    <span>Alto: ${data.alerts.filter(a => a.level === 'alto').length}</span>
-                </div>
-                <div class="weather-item">
-                    <span class="weather-icon">🟡</span>
-                    <span>Médio: ${data.alerts.filter(a => a.level === 'médio').length}</span>
-                </div>
-            `;
-
-            // Alertas detalhados
-            const detailed = document.getElementById('detailed-alerts');
-            if (data.alerts.length === 0) {
-                detailed.innerHTML = '<div style="color: #68d391;">✅ Nenhum alerta ativo</div>';
-            } else {
-                const alertsHTML = data.alerts.map(alert => `
-                    <div class="alert ${alert.level === 'alto' ? 'high' : alert.level === 'médio' ? 'medium' : 'low'}">
-                        <div style="font-weight: bold; margin-bottom: 5px;">
-                            ${alert.city_name} - ${alert.alert_type.replace('_', ' ').toUpperCase()}
-                        </div>
-                        <div style="margin-bottom: 10px;">${alert.message}</div>
-                        <div style="font-style: italic; color: #666;">
-                            💡 ${alert.recommendation}
-                        </div>
-                        <div style="margin-top: 10px;">
-                            <button class="btn" onclick="acknowledgeAlert(${alert.id})">✅ Reconhecer</button>
-                        </div>
-                    </div>
-                `).join('');
-                detailed.innerHTML = alertsHTML;
-            }
+            renderAlerts(data.alerts);
         }
     } catch (error) {
         document.getElementById('alerts-summary').innerHTML = `
@@ -174,6 +147,88 @@ async function fetchAlerts() {
     }
 }
 
+// Função para renderizar alertas
+function renderAlerts(alerts) {
+    activeAlerts = new Map(alerts.map(a => [a.id, a]));
+    // Resumo dos alertas
+    const summary = document.getElementById('alerts-summary');
+    summary.innerHTML = `
+        <div class="weather-item">
+            <span class="weather-icon">🚨</span>
+            <span>Total: ${alerts.length}</span>
+        </div>
+        <div class="weather-item">
+            <span class="weather-icon">🔴</span>
+            <span>Alto: ${alerts.filter(a => a.level === 'alto').length}</span>
+        </div>
+        <div class="weather-item">
+            <span class="weather-icon">🟡</span>
+            <span>Médio: ${alerts.filter(a => a.level === 'médio').length}</span>
+        </div>
+    `;
+
+    // Alertas detalhados
+    const detailed = document.getElementById('detailed-alerts');
+    if (alerts.length === 0) {
+        detailed.innerHTML = '<div style="color: #68d391;">✅ Nenhum alerta ativo</div>';
+    } else {
+        const alertsHTML = alerts.map(alert => `
+            <div class="alert ${alert.level === 'alto' ? 'high' : alert.level === 'médio' ? 'medium' : 'low'}">
+                <div style="font-weight: bold; margin-bottom: 5px;">
+                    ${alert.city_name} - ${alert.alert_type.replace('_', ' ').toUpperCase()}
+                </div>
+                <div style="margin-bottom: 10px;">${alert.message}</div>
+                <div style="font-style: italic; color: #666;">
+                    💡 ${alert.recommendation}
+                </div>
+                <div style="margin-top: 10px;">
+                    <button class="btn" onclick="acknowledgeAlert(${alert.id})">✅ Reconhecer</button>
+                </div>
+            </div>
+        `).join('');
+        detailed.innerHTML = alertsHTML;
+    }
+}
+
+// Aplicar um evento de alerta recebido por WebSocket
+function applyAlertEvent(data) {
+    if (lastAlertSeq !== null && data.seq <= lastAlertSeq) {
+        return; // já aplicado
+    }
+    lastAlertSeq = data.seq;
+
+    if (data.event === 'deactivated' || data.event === 'expired') {
+        activeAlerts.delete(data.alert.id);
+    } else {
+        activeAlerts.set(data.alert.id, data.alert);
+    }
+    renderAlerts(Array.from(activeAlerts.values()));
+}
+
+// Receber alertas em tempo real (a atualização periódica continua como alternativa)
+function connectAlertEvents() {
+    if (typeof io === 'undefined') {
+        return;
+    }
+    const socket = io(SOCKET_URL);
+
+    socket.on('connect', () => {
+        // Na reconexão, pedir os eventos perdidos desde o último recebido
+        socket.emit('subscribe_alerts', lastAlertSeq === null ? {} : { since_seq: lastAlertSeq });
+    });
+    socket.on('alerts_subscribed', data => {
+        if (lastAlertSeq === null) {
+            lastAlertSeq = data.last_seq;
+        }
+    });
+    socket.on('alert_event', applyAlertEvent);
+    socket.on('alerts_resync', data => {
+        // Eventos já fora do buffer do servidor: recarregar a lista
+        lastAlertSeq = data.last_seq;
+        fetchAlerts();
+    });
+}
+
 // Função para reconhecer alerta
 async function acknowledgeAlert(alertId) {
     try {
@@ -193,17 +248,27 @@ async function acknowledgeAlert(alertId) {
     }
 }
 
-// Inicializar dashboard
+// Inicializar dashboard (um único pedido com todas as secções)
 async function initDashboard() {
-    await Promise.all([
-        fetchSystemStatus(),
-        fetchCitiesWeather(),
-        fetchAlerts()
-    ]);
+    try {
+        const response = await fetch(`${API_BASE}/dashboard`);
+        const data = await response.json();
+        
+        if (data.success) {
+            renderSystemStatus(data.status);
+            renderCities(data.cities, data.current);
+            renderAlerts(data.alerts);
+        }
+    } catch (error) {
+        document.getElementById('system-status').innerHTML = `
+            <div style="color: #f56565;">❌ Erro ao carregar dashboard</div>
+        `;
+    }
 }
 
 // Carregar dados na inicialização
 document.addEventListener('DOMContentLoaded', initDashboard);
+document.addEventListener('DOMContentLoaded', connectAlertEvents);
 
 // Atualizar dados a cada 30 segundos
 setInterval(initDashboard, 30000);
\ No newline at end of file